@@ -0,0 +1,56 @@
+"""
+Compares the duration of the perceptual hash of :mod:`hapycolor.dedup` to
+the duration of the extraction of the palette, for each provided image, then
+measures the grouping of random hashes with the multi-index.
+
+Usage: python3 benchmarks/dedup.py IMAGES ... [-n NUMBERS ...]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor import dedup
+from hapycolor import raw_colors
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("images", nargs="+")
+    ap.add_argument("-n", "--numbers", type=int, nargs="+",
+                    default=[1000, 10000, 50000])
+    args = ap.parse_args()
+
+    print("{:>30} {:>10} {:>16}".format("image", "hash (ms)",
+                                        "extraction (ms)"))
+    for image in args.images:
+        print("{:>30} {:>10.1f} {:>16.1f}".format(
+            os.path.basename(image)[-30:],
+            measure(dedup.perceptual_hash, image) * 1e3,
+            measure(raw_colors.get, image, 150) * 1e3))
+
+    print()
+    print("{:>8} {:>13}".format("hashes", "grouping (s)"))
+    random = np.random.RandomState(0)
+    for number in args.numbers:
+        hashes = [int(h) for h in random.randint(0, 2**62, number)]
+        images = [str(i) for i in range(number)]
+        print("{:>8} {:>13.2f}".format(
+            number, measure(dedup.group, images, hashes, dedup.MAX_DISTANCE)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the extraction of the palettes of the provided images at full
+resolution and after the downsampling pre-pass of
+:func:`hapycolor.raw_colors.downsample`.
+
+For each image, the script displays the extraction time of both runs, and the
+palette drift, i.e. the mean CIEDE2000 distance between each color of the
+downsampled palette and its closest color in the full resolution palette.
+
+Usage: python3 benchmarks/downsampling.py [-n NUM_COLORS] [-m MAX_PIXELS]
+    [IMAGES ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from colormath.color_conversions import convert_color
+from colormath.color_diff_matrix import delta_e_cie2000
+from colormath.color_objects import LabColor, sRGBColor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor import raw_colors
+
+
+def to_lab(colors):
+    labs = [convert_color(sRGBColor(*c, is_upscaled=True), LabColor)
+            for c in colors]
+    return np.array([(c.lab_l, c.lab_a, c.lab_b) for c in labs])
+
+
+def drift(reference, colors):
+    """
+    Mean CIEDE2000 distance between each color of `colors` and its closest
+    color in `reference`
+    """
+    reference = to_lab(reference)
+    return np.mean([delta_e_cie2000(c, reference).min()
+                    for c in to_lab(colors)])
+
+
+def extract(image, num_colors, max_pixels, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        colors, scale = raw_colors.extract_native(image, num_colors,
+                                                  max_pixels)
+        timings.append(time.perf_counter() - start)
+    return colors, scale, min(timings)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("images", nargs="*",
+                    default=sorted(glob.glob("images/*.jpg")))
+    ap.add_argument("-n", "--num-colors", type=int, default=150)
+    ap.add_argument("-m", "--max-pixels", type=int,
+                    default=raw_colors.MAX_PIXELS)
+    ap.add_argument("-r", "--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print("{:<30} {:>8} {:>10} {:>10} {:>8} {:>8}".format(
+        "image", "scale", "full (s)", "down (s)", "speedup", "mean dE"))
+    for image in args.images:
+        full, _, full_time = extract(image, args.num_colors, 0, args.repeat)
+        down, scale, down_time = extract(image, args.num_colors,
+                                         args.max_pixels, args.repeat)
+        print("{:<30} {:>8.3f} {:>10.3f} {:>10.3f} {:>7.1f}x {:>8.2f}".format(
+            os.path.basename(image), scale, full_time, down_time,
+            full_time / down_time, drift(full, down)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the evaluation of the luminosity filter color by color, with
+:func:`hapycolor.filters.lum_filter.LumFilter.analyze`, to the evaluation of
+the whole array of colors with
+:func:`hapycolor.filters.lum_filter.LumFilter.mask`, with and without the
+lookup table of the filter's verdicts.
+
+Usage: python3 benchmarks/lum_filter.py [-s SIZES ...] [--max-scalar N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor import config
+from hapycolor.filters import lum_table
+from hapycolor.filters.lum_filter import LumFilter
+
+
+def scalar(colors):
+    return [[bool(LumFilter.analyze(tuple(int(e) for e in c), kind))
+             for kind in lum_table.ANALYSES] for c in colors]
+
+
+def measure(function, colors, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(colors)
+        timings.append(time.perf_counter() - start)
+    return np.array(result, dtype=bool), min(timings)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes", type=int, nargs="+",
+                    default=[150, 1000, 5000, 20000])
+    ap.add_argument("--max-scalar", type=int, default=5000,
+                    help="largest size evaluated color by color")
+    ap.add_argument("-r", "--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    config.create_config()
+    LumFilter.initialization()
+    start = time.perf_counter()
+    table = LumFilter.lookup_table()
+    print("Lookup table loaded in {:.3f}s".format(time.perf_counter() - start))
+
+    print("{:>8} {:>12} {:>12} {:>12} {:>10}".format(
+        "colors", "scalar (s)", "vector (s)", "table (s)", "speedup"))
+    random = np.random.RandomState(0)
+    for size in args.sizes:
+        colors = random.randint(0, 256, (size, 3))
+        vector, vector_time = measure(lum_table.evaluate, colors,
+                                      args.repeat)
+        if table is not None:
+            lookup, table_time = measure(table, colors, args.repeat)
+            assert (lookup == vector).all()
+        else:
+            table_time = float("nan")
+
+        if size <= args.max_scalar:
+            reference, scalar_time = measure(scalar, colors, 1)
+            assert (reference == vector).all()
+        else:
+            scalar_time = float("nan")
+        speedup = scalar_time / np.nanmin([vector_time, table_time])
+        print("{:>8} {:>12.4f} {:>12.4f} {:>12.5f} {:>9.0f}x".format(
+            size, scalar_time, vector_time, table_time, speedup))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Compares the former implementation of :class:`hapycolor.targets.pam.PAM`,
+which calls the distance function in the loops of the build and swap phases,
+with the current one, which computes the distance matrix once and evaluates
+the swaps with FastPAM1, either from the distance function or from a
+vectorized distance matrix, and with :class:`hapycolor.targets.pam.CLARA`,
+which clusters samples of the colors.
+
+The colors are random rgb colors, the distance is the CIEDE2000 distance
+used by :class:`hapycolor.filters.reducer.Reducer`, and the number of
+clusters is the number of Vim's syntax groups. For each size, the script
+displays the durations and the total dissimilarities (TD) of the
+clusterings, so that the quality lost by CLARA's sampling can be measured.
+
+Usage: python3 benchmarks/pam.py [-s SIZES ...] [-k K] [--max-legacy N]
+    [--max-distance N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor.filters import reducer
+from hapycolor.filters.reducer import Reducer
+from hapycolor.targets.pam import CLARA, PAM
+
+
+class LegacyPAM:
+    """ The former implementation, without the comments """
+    def __init__(self, colors, K, distance):
+        self.colors = colors
+        self.K = K
+        self.selected = []
+        self.unselected = self.colors[:]
+        self.distance = distance
+
+    def __call__(self):
+        self._build()
+        self._swap()
+        clusters = dict([(m, [m]) for m in self.selected])
+        for c in self.unselected:
+            distance_c = [self.distance(c, s) for s in self.selected]
+            medoid_index = distance_c.index(min(distance_c))
+            clusters[self.selected[medoid_index]].append(c)
+        return clusters
+
+    def _build(self):
+        mean_distances = [np.mean([self.distance(c_1, c_2)
+                                   for c_2 in self.colors])
+                          for c_1 in self.colors]
+        min_index = mean_distances.index(min(mean_distances))
+        self.selected.append(self.colors[min_index])
+        del self.unselected[min_index]
+
+        for _ in range(self.K - 1):
+            g = []
+            for i in self.unselected:
+                g_i = 0
+                for j in self.unselected:
+                    if i != j:
+                        g_i += max(self._d_p(j) - self.distance(i, j), 0)
+                g.append((i, g_i))
+            max_i = max(g, key=lambda _: _[1])[0]
+            self.selected.append(max_i)
+            del self.unselected[self.unselected.index(max_i)]
+
+    def _swap(self):
+        T = -1
+        while T < 0 and self.unselected:
+            swaps = [(i, h) for i in self.selected for h in self.unselected]
+            contributions = [((i, h), self._swap_i_h(i, h)) for i, h in swaps]
+            (i, h), T = min(contributions, key=lambda _: _[1])
+            if T < 0:
+                del self.selected[self.selected.index(i)]
+                del self.unselected[self.unselected.index(h)]
+                self.unselected.append(i)
+                self.selected.append(h)
+
+    def _swap_i_h(self, i, h):
+        T_i_h = 0
+        for j in self.unselected:
+            if h != j:
+                d_j_i = self.distance(j, i)
+                D_j = self._d_p(j)
+                d_j_h = self.distance(j, h)
+                if d_j_i > D_j:
+                    K_j_i_h = min(d_j_h - D_j, 0)
+                elif d_j_i == D_j:
+                    K_j_i_h = min(d_j_h, self._e_p(j)) - D_j
+                T_i_h += K_j_i_h
+        return T_i_h
+
+    def _d_p(self, p):
+        return min(self.distance(p, c) for c in self.selected)
+
+    def _e_p(self, p):
+        dist = sorted(self.distance(c, p) for c in self.selected)
+        return dist[1] if len(dist) > 1 else dist[0]
+
+
+def distance(c_1, c_2):
+    return float(reducer.cie2000(*reducer.rgb_to_lab([c_1, c_2])))
+
+
+def metric(colors_1, colors_2):
+    lab_1 = reducer.rgb_to_lab(colors_1)
+    lab_2 = reducer.rgb_to_lab(colors_2)
+    return reducer.cie2000(lab_1[:, np.newaxis], lab_2[np.newaxis])
+
+
+def run(pam, *args, **kwargs):
+    start = time.perf_counter()
+    clusters = pam(*args, **kwargs)()
+    return clusters, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes", type=int, nargs="+",
+                    default=[20, 50, 100, 150, 300, 1000, 3000])
+    ap.add_argument("-k", type=int, default=7, help="number of clusters")
+    ap.add_argument("--max-legacy", type=int, default=50,
+                    help="largest size clustered by the former implementation")
+    ap.add_argument("--max-distance", type=int, default=300,
+                    help="largest size clustered from the distance function")
+    args = ap.parse_args()
+
+    print("{:>7} {:>11} {:>13} {:>11} {:>10} {:>10} {:>9} {:>9}".format(
+        "colors", "legacy (s)", "distance (s)", "matrix (s)", "CLARA (s)",
+        "legacy TD", "TD", "CLARA TD"))
+    random = np.random.RandomState(0)
+    for size in args.sizes:
+        colors = [tuple(c) for c in random.randint(0, 256, (size, 3))]
+
+        legacy_time, legacy_td = float("nan"), float("nan")
+        if size <= args.max_legacy:
+            clusters, legacy_time = run(LegacyPAM, colors, args.k, distance)
+            legacy_td = sum(distance(m, c) for m in clusters
+                            for c in clusters[m])
+
+        distance_time = float("nan")
+        if size <= args.max_distance:
+            _, distance_time = run(PAM, colors, args.k, distance)
+
+        # The duration includes the computation of the matrix
+        start = time.perf_counter()
+        matrix = Reducer.distance_matrix(colors)
+        clustering = PAM(colors, args.k, matrix=matrix)
+        clustering()
+        matrix_time = time.perf_counter() - start
+
+        clara = CLARA(colors, args.k, metric=metric)
+        _, clara_time = run(lambda: clara)
+        print("{:>7} {:>11.3f} {:>13.3f} {:>11.3f} {:>10.3f} {:>10.1f} "
+              "{:>9.1f} {:>9.1f}".format(
+                  size, legacy_time, distance_time, matrix_time, clara_time,
+                  legacy_td, clustering.total_dissimilarity(),
+                  clara.total_dissimilarity()))
+
+
+if __name__ == '__main__':
+    main()
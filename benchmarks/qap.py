@@ -0,0 +1,120 @@
+"""
+Compares the former branch and bound solver of the quadratic assignment
+problem, :class:`hapycolor.targets.vim.qap.QAP`, with
+:class:`hapycolor.targets.vim.qap.ExactQAP`, which evaluates all the
+permutations of small problems at once, and searches larger ones with a
+branch and bound bounded by the Gilmore-Lawler bound.
+
+The problems assign random hues to the frequencies of Vim's syntactic groups
+(see :func:`hapycolor.targets.vim.ColorManager.load_frequencies`), completed by random
+frequencies beyond the 7 groups. For each size, the script displays the
+durations of both solvers and whether their assignments have the same cost.
+
+Then, for random palettes, the script displays the duration of Vim's
+:class:`hapycolor.targets.vim.ColorManager`, and the cost of the assignment
+of the colors to the minor syntactic groups, distributed cyclically and
+optimized by :class:`hapycolor.targets.vim.qap.HeuristicQAP`.
+
+Usage: python3 benchmarks/qap.py [-s SIZES ...] [-r REPEAT] [--max-legacy N]
+    [-p PALETTE_SIZES ...]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor import helpers
+from hapycolor.targets.vim import ColorManager, Vim, qap
+
+
+def frequencies(size, rng):
+    values = list(ColorManager.load_frequencies().values())
+    values += [rng.randint(100, 20000) for _ in range(size - len(values))]
+    return values[:size]
+
+
+def run(solver, colors, freqs):
+    start = time.perf_counter()
+    result = solver(colors, freqs)()
+    return result, time.perf_counter() - start
+
+
+def minor_cost(color_manager, minor_colors):
+    """ Cost of the colors assigned to the minor groups """
+    frequencies = ColorManager.load_minor_frequencies()
+    minor_groups = [g for group in Vim.groups for g in Vim.groups[group]]
+    lab_colors = [helpers.rgb_to_lab(c) for c in minor_colors]
+    distances = ColorManager.distances(lab_colors, lab_colors)
+    distances = (distances + distances.T) / 2
+    flow = qap.flows([frequencies.get(g, 1) for g in minor_groups])
+    return qap.assignment_cost(flow, distances, range(len(minor_colors)))
+
+
+def minor_groups(palette_sizes, rng):
+    print()
+    print("{:>7} {:>15} {:>12} {:>12} {:>12}".format(
+        "colors", "manager (ms)", "cyclic", "tabu", "improvement"))
+    for size in palette_sizes:
+        colors = [(rng.randint(0, 255), rng.randint(0, 255),
+                   rng.randint(0, 255)) for _ in range(size)]
+        start = time.perf_counter()
+        color_manager = ColorManager(colors)
+        duration = time.perf_counter() - start
+
+        cyclic, optimized = [], []
+        for group in Vim.groups:
+            cluster = color_manager.groups_colors[group]
+            cyclic += [cluster[i % len(cluster)]
+                       for i in range(len(Vim.groups[group]))]
+            optimized += color_manager.cast(group)
+        costs = [minor_cost(color_manager, c) for c in (cyclic, optimized)]
+        print("{:>7} {:>15.1f} {:>12.4g} {:>12.4g} {:>11.1%}".format(
+            size, duration * 1000, costs[0], costs[1],
+            1 - costs[1] / costs[0]))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes", type=int, nargs="+",
+                    default=[4, 5, 6, 7, 8, 9, 10])
+    ap.add_argument("-r", "--repeat", type=int, default=3,
+                    help="number of problems of each size")
+    ap.add_argument("--max-legacy", type=int, default=8,
+                    help="largest size solved by the former solver")
+    ap.add_argument("-p", "--palette-sizes", type=int, nargs="+",
+                    default=[10, 20, 40, 80],
+                    help="sizes of the palettes distributed to Vim's groups")
+    args = ap.parse_args()
+
+    print("{:>5} {:>11} {:>10} {:>8} {:>10}".format(
+        "size", "legacy (s)", "exact (s)", "speedup", "same cost"))
+    rng = random.Random(0)
+    for size in args.sizes:
+        legacy_time, exact_time, same = 0, 0, True
+        for _ in range(args.repeat):
+            colors = [(h, 0.5, 0.5) for h in rng.sample(range(360), size)]
+            freqs = frequencies(size, rng)
+            result, duration = run(qap.ExactQAP, colors, freqs)
+            exact_time += duration
+            if size <= args.max_legacy:
+                expected, duration = run(qap.QAP, colors, freqs)
+                legacy_time += duration
+                solver = qap.ExactQAP(colors, freqs)
+                costs = [solver.cost([colors.index(c) for c, _ in r])
+                         for r in (expected, result)]
+                same &= abs(costs[0] - costs[1]) <= 1e-9 * costs[0]
+
+        if size > args.max_legacy:
+            legacy_time, same = float("nan"), "-"
+        print("{:>5} {:>11.3f} {:>10.3f} {:>8.1f} {:>10}".format(
+            size, legacy_time / args.repeat, exact_time / args.repeat,
+            legacy_time / exact_time, str(same)))
+
+    minor_groups(args.palette_sizes, rng)
+
+
+if __name__ == '__main__':
+    main()
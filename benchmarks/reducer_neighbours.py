@@ -0,0 +1,86 @@
+"""
+Compares the methods searching the couples of colors closer than the
+reducer's threshold (see :class:`hapycolor.filters.reducer.Neighbours`): the
+whole distance matrix and the sweep over the colors sorted by lightness.
+
+For each number of random colors, the script displays the duration of both
+methods, the fraction of the couples whose distance has been computed by
+the sweep, the number of close couples, and the growth exponent of the
+sweep's duration between two consecutive sizes (2 means quadratic). Since
+the colors are drawn from a fixed gamut, the number of close couples itself
+grows quadratically, so the exponent tends to 2 for large sizes.
+
+Usage: python3 benchmarks/reducer_neighbours.py [-s SIZES ...]
+    [-t THRESHOLD] [--max-matrix N]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor.filters import reducer
+from hapycolor.filters.reducer import Neighbours, Reducer
+
+
+def close_pairs(colors, neighbours):
+    with mock.patch.object(Reducer, "neighbours", neighbours):
+        start = time.perf_counter()
+        pairs = Reducer.close_pairs(colors)
+        return pairs, time.perf_counter() - start
+
+
+def evaluated(colors, threshold):
+    """ Number of couples compared by the sweep """
+    lab = reducer.rgb_to_lab(colors)
+    order = np.argsort(lab[:, 0], kind="mergesort")
+    lightness = lab[order, 0]
+    high = lightness + reducer.lightness_windows(lab[order], threshold)
+    ends = np.searchsorted(lightness, high, side="right")
+    return int(np.sum(ends - np.arange(len(colors)) - 1))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes", type=int, nargs="+",
+                    default=[150, 500, 1000, 2000, 5000, 10000, 20000])
+    ap.add_argument("-t", "--threshold", type=float,
+                    default=Reducer.threshold)
+    ap.add_argument("--max-matrix", type=int, default=5000,
+                    help="largest size whose distance matrix is computed")
+    args = ap.parse_args()
+
+    print("{:>7} {:>11} {:>10} {:>10} {:>11} {:>9}".format(
+        "colors", "matrix (s)", "sweep (s)", "evaluated", "close", "exponent"))
+    random = np.random.RandomState(0)
+    previous = None
+    with mock.patch.object(Reducer, "threshold", args.threshold):
+        for size in args.sizes:
+            colors = random.randint(0, 256, (size, 3))
+            pairs, sweep_time = close_pairs(colors, Neighbours.SWEEP)
+
+            matrix_time = float("nan")
+            if size <= args.max_matrix:
+                expected, matrix_time = close_pairs(colors, Neighbours.MATRIX)
+                assert set(zip(*expected)) == set(zip(*pairs))
+
+            exponent = float("nan")
+            if previous is not None:
+                exponent = math.log(sweep_time / previous[1]) \
+                    / math.log(size / previous[0])
+            previous = (size, sweep_time)
+
+            couples = size * (size - 1) / 2
+            print("{:>7} {:>11.3f} {:>10.3f} {:>9.1%} {:>11} {:>9.2f}".format(
+                size, matrix_time, sweep_time,
+                evaluated(colors, args.threshold) / couples, len(pairs[0]),
+                exponent))
+
+
+if __name__ == '__main__':
+    main()
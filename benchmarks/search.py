@@ -0,0 +1,109 @@
+"""
+Measures the build of the palette search index of :mod:`hapycolor.search`
+from random palettes, and the duration of its k-nearest queries. Then, over
+a smaller collection of palettes of the same size, compares the neighbours
+found by the index to the ones of the exact Earth Mover's Distance in the
+Lab space, computed as an assignment problem.
+
+Usage: python3 benchmarks/search.py [-n NUMBERS ...] [-k K] [-r RECALL]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scipy.optimize
+import scipy.spatial
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor import color
+from hapycolor import palette as pltte
+from hapycolor import search
+
+
+def make_palettes(number, random, sizes=(10, 40)):
+    palettes = []
+    for i in range(number):
+        size = random.randint(*sizes) if sizes[0] < sizes[1] else sizes[0]
+        palette = pltte.Palette(random.randint(0, 256, (size, 3)))
+        # Clusters of colors around a few hues, as in real palettes
+        center = random.randint(0, 256, 3)
+        palette.colors = (palette.array // 2 + center // 2).astype(np.uint8)
+        palettes.append((str(i), palette))
+    return palettes
+
+
+def exact_distance(lab_1, lab_2):
+    costs = scipy.spatial.distance.cdist(lab_1, lab_2)
+    rows, columns = scipy.optimize.linear_sum_assignment(costs)
+    return costs[rows, columns].mean()
+
+
+def recall(number, k, random):
+    """
+    Returns the mean fraction of the `k` exact nearest palettes found by
+    the index.
+    """
+    palettes = make_palettes(number, random, (20, 20))
+    directory = tempfile.mkdtemp()
+    try:
+        index = search.PaletteIndex.build(os.path.join(directory, "index"),
+                                          palettes)
+        labs = [color.rgb_to_lab(p.array) for _, p in palettes]
+        found = []
+        for q in range(0, number, max(1, number // 20)):
+            exact = [exact_distance(labs[q], lab) for lab in labs]
+            expected = {str(i) for i in np.argsort(exact)[:k]}
+            results = {l for l, _ in index.query(palettes[q][1], k)}
+            found.append(len(expected & results) / k)
+    finally:
+        shutil.rmtree(directory)
+    return np.mean(found)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--numbers", type=int, nargs="+",
+                    default=[1000, 10000, 50000])
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("-r", "--recall", type=int, default=300,
+                    help="number of palettes compared to the exact distance")
+    args = ap.parse_args()
+    random = np.random.RandomState(0)
+
+    print("{:>8} {:>10} {:>10} {:>11}".format("palettes", "build (s)",
+                                               "size (MB)", "query (ms)"))
+    for number in args.numbers:
+        palettes = make_palettes(number, random)
+        queries = [p for _, p in make_palettes(20, random)]
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "index")
+            start = time.perf_counter()
+            search.PaletteIndex.build(path, palettes)
+            build = time.perf_counter() - start
+
+            index = search.PaletteIndex(path).load()
+            start = time.perf_counter()
+            for query in queries:
+                index.query(query, args.k)
+            query = (time.perf_counter() - start) / len(queries)
+            size = os.path.getsize(path)
+            del index
+        finally:
+            shutil.rmtree(directory)
+        print("{:>8} {:>10.2f} {:>10.1f} {:>11.2f}".format(
+            number, build, size / 2**20, query * 1e3))
+
+    print()
+    print("Recall@{} of the exact Earth Mover's Distance over {} palettes:"
+          " {:.2f}".format(args.k, args.recall,
+                           recall(args.recall, args.k, random)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Compares the palettes saved as json files, one per image, to the palettes
+appended to a :class:`hapycolor.store.PaletteStore`: duration of the
+writing of random palettes, of the loading of each palette by its image's
+hash, and of the scan of the whole collection, and size on disk.
+
+Usage: python3 benchmarks/store.py [-n NUMBERS ...] [-c COLORS]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor import palette as pltte
+from hapycolor import store
+
+
+def make_palettes(number, num_colors):
+    random = np.random.RandomState(0)
+    palettes = []
+    for i in range(number):
+        palette = pltte.Palette(random.randint(0, 256, (num_colors, 3)))
+        palette.foreground = (255, 255, 255)
+        palette.background = (0, 0, 0)
+        palette.weights = random.rand(num_colors)
+        palettes.append((hashlib.sha256(str(i).encode()).hexdigest(),
+                         palette))
+    return palettes
+
+
+def size(directory):
+    return sum(os.path.getsize(os.path.join(directory, f))
+               for f in os.listdir(directory))
+
+
+def measure_json(palettes, directory):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for image_hash, palette in palettes:
+            palette.to_json(os.path.join(directory, image_hash + ".json"))
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for image_hash, _ in palettes:
+        pltte.Palette.from_json(os.path.join(directory, image_hash + ".json"))
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for f in os.listdir(directory):
+        pltte.Palette.from_json(os.path.join(directory, f))
+    scan = time.perf_counter() - start
+    return write, load, scan, size(directory)
+
+
+def measure_store(palettes, directory):
+    path = os.path.join(directory, "palettes.hps")
+    start = time.perf_counter()
+    with store.PaletteStore(path) as palette_store:
+        for image_hash, palette in palettes:
+            palette_store.put(palette, image_hash, "/" + image_hash)
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with store.PaletteStore(path) as palette_store:
+        for image_hash, _ in palettes:
+            palette_store.get(image_hash)
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with store.PaletteStore(path) as palette_store:
+        for _ in palette_store:
+            pass
+    scan = time.perf_counter() - start
+    return write, load, scan, size(directory)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--numbers", type=int, nargs="+",
+                    default=[100, 1000, 10000])
+    ap.add_argument("-c", "--colors", type=int, default=40,
+                    help="number of colors of each palette")
+    args = ap.parse_args()
+
+    print("{:>7} {:>6} {:>10} {:>10} {:>10} {:>10}".format(
+        "images", "format", "write (s)", "load (s)", "scan (s)", "size (KB)"))
+    for number in args.numbers:
+        palettes = make_palettes(number, args.colors)
+        for name, measure in [("json", measure_json),
+                              ("store", measure_store)]:
+            directory = tempfile.mkdtemp()
+            try:
+                write, load, scan, total = measure(palettes, directory)
+            finally:
+                shutil.rmtree(directory)
+            print("{:>7} {:>6} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.0f}"
+                  .format(number, name, write, load, scan, total / 1024))
+
+
+if __name__ == '__main__':
+    main()
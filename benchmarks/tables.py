@@ -0,0 +1,72 @@
+"""
+Measures the generation of the lookup tables of
+:mod:`hapycolor.color.tables`, then compares, for each table, the conversion
+of arrays of random colors by :mod:`hapycolor.color` to the lookup in the
+memory mapped table. The tables are generated in a temporary cache
+directory, unless `--cache-dir` is provided.
+
+Usage: python3 benchmarks/tables.py [-s SIZES ...] [--cache-dir DIR]
+"""
+import argparse
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from hapycolor.color import tables
+
+
+def measure(function, colors, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(colors)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes", type=int, nargs="+",
+                    default=[100, 10000, 1000000])
+    ap.add_argument("--cache-dir", help="directory of the tables")
+    args = ap.parse_args()
+
+    directory = args.cache_dir or tempfile.mkdtemp()
+    with mock.patch("hapycolor.config.get_cache_dir",
+                    lambda: pathlib.Path(directory)):
+        print("{:>6} {:>15} {:>10}".format("table", "generation (s)",
+                                           "size (MB)"))
+        for name, table in sorted(tables.TABLES.items()):
+            start = time.perf_counter()
+            table.load()
+            print("{:>6} {:>15.2f} {:>10.1f}".format(
+                name, time.perf_counter() - start,
+                table.path().stat().st_size / 2**20))
+
+        print()
+        print("{:>6} {:>9} {:>14} {:>11} {:>8}".format(
+            "table", "colors", "computed (ms)", "table (ms)", "speedup"))
+        random = np.random.RandomState(0)
+        for name, table in sorted(tables.TABLES.items()):
+            for size in args.sizes:
+                colors = random.randint(0, 256, (size, 3))
+                computed = measure(table.function, colors)
+                looked_up = measure(table, colors)
+                print("{:>6} {:>9} {:>14.3f} {:>11.3f} {:>8.1f}".format(
+                    name, size, computed * 1e3, looked_up * 1e3,
+                    computed / looked_up))
+
+    if args.cache_dir is None:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,8 @@
 
 """
 
-from hapycolor import config, visual, helpers, targets, raw_colors, filters, imgur
+from hapycolor import config, visual, helpers, targets, imgur
+from hapycolor import cache, batch, search, store
 from hapycolor import exceptions
 from hapycolor import palette as pltte
 
@@ -24,9 +25,12 @@ from hapycolor.__version__ import __version__
 help_msg = """Hapycolor.
 
 Usage:
-  hapycolor (--imgur URL | -f FILE) [--json OUTPUT_DIR]
-  hapycolor --export-from-json FILE
-  hapycolor --dir DIRECTORY -o OUTPUT_DIR
+  hapycolor (--imgur URL | -f FILE) [--json OUTPUT_DIR] [--no-cache] [--cache-stats]
+  hapycolor --export-from-json FILE [KEY]
+  hapycolor --dir DIRECTORY (-o OUTPUT_DIR | --store STORE | --jsonl OUTPUT) [--jobs N] [--dedup] [--no-cache] [--cache-stats]
+  hapycolor --build-index INDEX SOURCE
+  hapycolor --search INDEX QUERY [-k K] [--no-cache]
+  hapycolor --cache-stats
   hapycolor --reconfigure TARGETS ...
   hapycolor --print-config TARGETS ...
   hapycolor [-e EN_TARGETS ... | -d DIS_TARGETS ...] ...
@@ -42,10 +46,32 @@ Options:
   -f, --file     The path of the source image from which the palette will be generated.
   --dir          Generates a palette for each image in the provided directory, without exporting them.
   -o, --output   Target directory where the palettes will be saved.
+  --store        Palette store where the palettes will be appended, instead of
+                 saving one json file per image.
+  --jsonl        File where a compact json record (path, hash, palette and
+                 timings) is written on a line for each image, as soon as
+                 it is processed, instead of saving one json file per image.
+  --jobs N       Number of processes generating the palettes of the directory [default: 1].
+  --dedup        Generates the palette of a group of near-duplicate images of
+                 the directory once, and saves it for each image of the group.
   --imgur        The url of an image from imgur.com from which the palette will be generated.
   --json         Save image's palette into the provided directory, without exporting it.
   --export-from-json
-                 Export json palette to enabled targets.
+                 Export json palette to enabled targets. If a KEY (the sha256
+                 of an image, or its path) is provided, FILE is a palette
+                 store, and the palette of the image is exported. A json-lines
+                 file written by --jsonl is read line by line, until the
+                 palette of the image KEY, or the first palette, is found.
+  --build-index  Embeds the palettes of SOURCE, a palette store, a json-lines
+                 file written by --jsonl or a directory of json palettes, in
+                 the search index INDEX.
+  --search       Prints the palettes of the search index INDEX closest to
+                 QUERY: an image, a json palette, or a text file, such as a
+                 Vim colorscheme, whose hexadecimal colors form a palette.
+  -k K           Number of palettes printed by --search [default: 5].
+  --no-cache     Neither load the palettes from the cache nor store them in it.
+  --cache-stats  Print the statistics of the palette cache, and its hits and
+                 misses when palettes are generated.
 
   -r, --reconfigure
                  Reconfigure every target passed in arguments.
@@ -102,6 +128,69 @@ def display_palette(palette):
     # palette.to_json("palette.json")
 
 
+def print_cache_stats(palette_cache, counters=True):
+    """
+    Prints the statistics of the palette cache, and its hits and misses if
+    `counters` is set, i.e. if the cache has been used by this run.
+    """
+    stats = palette_cache.stats()
+    helpers.bold("Palette cache ({}):".format(stats["directory"]))
+    print("\t- entries: {}".format(stats["entries"]))
+    print("\t- size: {:.2f} / {:.2f} MiB".format(stats["size"] / 2**20,
+                                                 stats["max_size"] / 2**20))
+    if counters:
+        print("\t- hits: {}, misses: {}".format(stats["hits"],
+                                                stats["misses"]))
+
+
+def load_palette(path, key=None):
+    """
+    Loads a palette to be exported: from a json palette, from a palette
+    store, or from a json-lines file written by `--dir`.
+
+    :arg key: the sha256 of the image whose palette is loaded, or its path
+    :return: a tuple holding the palette, and the path of its image, if it
+        is known
+    """
+    if os.path.splitext(path)[1] == ".jsonl":
+        source = pathlib.Path(key).resolve().as_posix() if key else None
+        for record, palette in pltte.read_jsonl(path):
+            if key is None or key in (record["path"], record["hash"]) \
+                    or source == record["path"]:
+                return palette, record["path"]
+        msg = "ERROR: No palette found for '{}' in {}".format(key, path)
+        raise exceptions.PaletteFormatError(msg)
+    if key:
+        with store.PaletteStore(path) as palette_store:
+            entry = palette_store.get(key)
+        return entry.palette, entry.source
+    if store.is_store(path):
+        msg = "ERROR: {} is a palette store, the sha256 or the path of the" \
+            " image whose palette is exported must be provided".format(path)
+        raise exceptions.PaletteFormatError(msg)
+    return pltte.Palette.from_json(path), None
+
+
+def search_palettes(index_path, query, k, num_colors, palette_cache=None):
+    if not k.isdigit() or int(k) < 1:
+        msg = "ERROR: The number of palettes must be positive"
+        raise exceptions.WrongInputError(msg)
+    for path in [index_path, query]:
+        if not pathlib.Path(path).is_file():
+            msg = "ERROR: The provided file '{}' does not exist".format(path)
+            raise exceptions.InvalidFileError(msg)
+
+    if os.path.splitext(query)[1].lower() in [".jpg", ".jpeg", ".png"]:
+        print("Processing file {}".format(query))
+        palette = batch.generate_palette(query, num_colors, palette_cache)
+    else:
+        palette = search.palette_from_file(query)
+    results = search.PaletteIndex(index_path).query(palette, int(k))
+    helpers.bold("Palettes closest to {}:".format(query))
+    for label, distance in results:
+        print("\t- {:6.2f} {}".format(distance, label))
+
+
 def add_palette_json(img_name, palette, filename):
     hexcolors = palette.hexcolors()
     data_dict = {foreground: hexcolors[0],
@@ -195,6 +284,12 @@ def main(args=None):
             helpers.bold("Reconfiguring target {}".format(t.__name__))
             targets.reconfigure(t)
 
+    palette_cache = None
+    if (args['--file'] or args['--dir'] or args['--imgur']
+            or args['--search']) \
+            and not args['--no-cache']:
+        palette_cache = cache.PaletteCache()
+
     try:
         max_colors = 150
         img_list = []
@@ -207,11 +302,22 @@ def main(args=None):
             img_list.append(args['FILE'])
 
         if args['--json'] or args['--dir']:
-            if not pathlib.Path(args['OUTPUT_DIR']).exists():
+            if args['OUTPUT_DIR'] is not None \
+                    and not pathlib.Path(args['OUTPUT_DIR']).exists():
                 msg = "ERROR: The provided output directory does not exist"
                 raise exceptions.InvalidDirectoryException(msg)
             if args['--dir']:
-                for f in os.listdir(args['DIRECTORY']):
+                jobs = int(args['--jobs']) \
+                    if args['--jobs'].isdigit() else 0
+                if jobs < 1:
+                    msg = "ERROR: The number of jobs must be positive"
+                    raise exceptions.WrongInputError(msg)
+                if args['--jsonl'] and not os.path.isdir(os.path.dirname(
+                        os.path.abspath(args['OUTPUT']))):
+                    msg = "ERROR: The directory of the provided json-lines" \
+                        " file does not exist"
+                    raise exceptions.InvalidFileError(msg)
+                for f in sorted(os.listdir(args['DIRECTORY'])):
                     if os.path.splitext(f)[1] in [".jpg", ".jpeg", ".png"]:
                         img_list.append(os.path.join(args['DIRECTORY'], f))
 
@@ -220,24 +326,56 @@ def main(args=None):
         if args['--imgur']:
             local_path = imgur.download(args['URL'])
             print("Processing file {}".format(local_path))
-            palettes.append(raw_colors.get(local_path,
-                                           num_colors=max_colors))
-            palettes[-1] = filters.apply(palettes[-1])
+            palettes.append(batch.generate_palette(local_path, max_colors,
+                                                   palette_cache))
             img_list.append(local_path)
-        if args['--file'] or args['--dir']:
+        if args['--file']:
             for img in img_list:
                 print("Processing file {}".format(img))
-                palettes.append(raw_colors.get(img, num_colors=max_colors))
-                palettes[-1] = filters.apply(palettes[-1])
+                palettes.append(batch.generate_palette(img, max_colors,
+                                                       palette_cache))
+        if args['--dir']:
+            palette_store = jsonl_file = None
+            if args['--jsonl']:
+                try:
+                    jsonl_file = open(args['OUTPUT'], "w",
+                                      buffering=1 << 16)
+                except OSError as e:
+                    msg = "ERROR: Unable to write the json-lines file: {}" \
+                        .format(e)
+                    raise exceptions.InvalidFileError(msg)
+            if args['--store']:
+                palette_store = store.PaletteStore(args['STORE'])
+            try:
+                batch.run(img_list, args['OUTPUT_DIR'], max_colors, jobs,
+                          palette_cache, palette_store, args['--dedup'],
+                          jsonl_file)
+            finally:
+                if palette_store is not None:
+                    palette_store.close()
+                if jsonl_file is not None:
+                    jsonl_file.close()
+        if args['--build-index']:
+            if not pathlib.Path(args['SOURCE']).exists():
+                msg = "ERROR: The provided palettes do not exist"
+                raise exceptions.InvalidFileError(msg)
+            index = search.PaletteIndex.build(
+                args['INDEX'], search.palettes_from(args['SOURCE']))
+            print("Indexed {} palettes in {}".format(len(index),
+                                                     args['INDEX']))
+        if args['--search']:
+            search_palettes(args['INDEX'], args['QUERY'], args['-k'],
+                            max_colors, palette_cache)
         if args['--export-from-json']:
-            palettes.append(pltte.Palette.from_json(img_list[0]))
+            palette, image = load_palette(img_list[0], args['KEY'])
+            palettes.append(palette)
+            if image is not None and pathlib.Path(image).exists():
+                img_list[0] = image
 
         # Saving palettes in a json file
-        if args['--json'] or args['--dir']:
+        if args['--json']:
             for i in range(len(img_list)):
-                name = pathlib.Path(img_list[i]).with_suffix('.json').name
-                output_dir = pathlib.Path(args['OUTPUT_DIR']).expanduser()
-                path = (output_dir / name).resolve().as_posix()
+                path = batch.output_path(img_list[i], args['OUTPUT_DIR'])
                 palettes[i].to_json(path)
         # Exporting the first palette
         elif args['--imgur'] or args['--file'] or args['--export-from-json']:
@@ -251,6 +389,15 @@ def main(args=None):
         print(pfe.msg)
     except exceptions.InvalidImageException as iie:
         print(iie.msg)
+    except exceptions.WrongInputError as wie:
+        print(wie.msg)
+    except exceptions.InvalidFileError as ife:
+        print(ife.msg)
+
+    if args['--cache-stats']:
+        # The hits and misses are only counted while generating palettes
+        print_cache_stats(palette_cache or cache.PaletteCache(),
+                          palette_cache is not None)
 
 
 if __name__ == '__main__':
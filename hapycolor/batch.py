@@ -0,0 +1,354 @@
+"""
+Generation of the palettes of a collection of images.
+
+The images can be distributed to a pool of processes. Each worker initializes
+the filters once, then, for each image, extracts its palette and saves it as
+soon as it is generated, so that no palette is kept in memory. The palettes
+are either saved as json files, or encoded by the workers and written by the
+parent process, as records appended to a
+:class:`hapycolor.store.PaletteStore`, or as the lines of a json-lines file,
+see :func:`jsonl_record`. The results
+are reported in the order of the provided images, while the batch is being
+processed. A failure, e.g. a grayscale image, is reported without aborting
+the batch.
+"""
+import collections
+import json
+import multiprocessing
+import os
+import pathlib
+import shutil
+import sys
+import time
+
+from hapycolor import cache
+from hapycolor import dedup
+from hapycolor import exceptions
+from hapycolor import filters
+from hapycolor import palette as pltte
+from hapycolor import raw_colors
+from hapycolor import store
+from hapycolor.color import tables
+from hapycolor.filters import lum_filter
+
+
+Result = collections.namedtuple("Result", ["image", "output", "error",
+                                           "cached", "record"])
+
+# State of the current worker, see :func:`initialize`
+_worker = {}
+
+
+def generate_palette(image_path, num_colors, palette_cache=None,
+                     timings=None):
+    """
+    Extracts and filters the colors of an image. If a cache is provided, the
+    palette is loaded from it when possible, and stored in it otherwise.
+
+    :arg palette_cache: an instance of :class:`hapycolor.cache.PaletteCache`
+    :arg timings: if provided, a dictionary where the durations of the
+        extraction and of the filters are stored, in seconds
+    """
+    if palette_cache is not None:
+        settings = cache.pipeline_settings(num_colors)
+        palette = palette_cache.get(image_path, settings)
+        if palette is not None:
+            print("Loaded palette from cache")
+            return palette
+
+    start = time.perf_counter()
+    palette = raw_colors.get(image_path, num_colors=num_colors)
+    extracted = time.perf_counter()
+    palette = filters.apply(palette)
+    if timings is not None:
+        timings["extraction"] = extracted - start
+        timings["filters"] = time.perf_counter() - extracted
+
+    if palette_cache is not None:
+        try:
+            palette_cache.put(image_path, settings, palette)
+        except OSError as e:
+            print("Failed to cache the palette: {}".format(e))
+    return palette
+
+
+def output_path(image_path, output_dir):
+    """
+    Returns the path of the json file where the palette of the image will be
+    saved.
+    """
+    name = pathlib.Path(image_path).with_suffix('.json').name
+    output_dir = pathlib.Path(output_dir).expanduser()
+    return (output_dir / name).resolve().as_posix()
+
+
+def initialize(output_dir, num_colors, cache_settings=None, quiet=False,
+               hyperplans=None, output_format="json"):
+    """
+    Initializes the state of a worker.
+
+    :arg output_dir: the directory of the json files
+    :arg cache_settings: a tuple containing the directory and the maximal
+        size of the palette cache, or `None` if the cache is disabled
+    :arg quiet: if `True`, the worker's outputs are discarded, otherwise the
+        outputs of the processes would be interleaved.
+    :arg hyperplans: the interpolated hyperplans of the luminosity filter
+        (see :class:`hapycolor.filters.lum_filter.Hyperplans`), built by the
+        parent process
+    :arg output_format: `json` to save the palettes in the output directory,
+        `store` or `jsonl` to return them as records of a palette store, or
+        as json lines
+    """
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    _worker["output_dir"] = output_dir
+    _worker["output_format"] = output_format
+    _worker["num_colors"] = num_colors
+    _worker["cache"] = None
+    if cache_settings is not None:
+        _worker["cache"] = cache.PaletteCache(*cache_settings)
+    if hyperplans is not None:
+        lum_filter.LumFilter.install(hyperplans)
+    lum_filter.LumFilter.initialization()
+
+
+def describe(error):
+    """
+    Returns the message reporting the failure of an image: the message of
+    hapycolor's errors and of the system's errors, otherwise the type of the
+    unexpected error too.
+    """
+    if isinstance(error, (exceptions.HapycolorError, OSError)):
+        return str(error)
+    return "{}: {}".format(type(error).__name__, error)
+
+
+def process(image_path):
+    """
+    Generates the palette of an image and saves it in the output directory,
+    or encodes it as a record of a palette store or as a json line, according
+    to the worker's output format.
+
+    :return: an instance of :class:`Result`
+    """
+    palette_cache = _worker["cache"]
+    hits = palette_cache.hits if palette_cache is not None else 0
+    path = record = None
+    try:
+        start = time.perf_counter()
+        timings = {}
+        palette = generate_palette(image_path, _worker["num_colors"],
+                                   palette_cache, timings)
+        if _worker["output_format"] == "store":
+            record = pack_palette(image_path, palette, _worker["num_colors"],
+                                  palette_cache)
+        elif _worker["output_format"] == "jsonl":
+            timings["total"] = time.perf_counter() - start
+            record = jsonl_record(image_path, palette, timings,
+                                  palette_cache)
+        else:
+            path = output_path(image_path, _worker["output_dir"])
+            palette.to_json(path)
+    except Exception as e:
+        # Whatever fails on an image is reported as its failure, rather than
+        # aborting the whole batch
+        return Result(image_path, None, describe(e), False, None)
+    cached = palette_cache is not None and palette_cache.hits > hits
+    return Result(image_path, path, None, cached, record)
+
+
+def image_hash(image_path, palette_cache=None):
+    """
+    Returns the sha256 of an image. It is provided by the cache if there is
+    one, since it is usually already known.
+    """
+    if palette_cache is not None:
+        return palette_cache.image_hash(image_path)
+    return cache.hash_file(image_path)
+
+
+def pack_palette(image_path, palette, num_colors, palette_cache=None):
+    """
+    Encodes the palette of an image as a record of a palette store, see
+    :func:`hapycolor.store.pack`.
+    """
+    source = pathlib.Path(image_path).resolve().as_posix()
+    return store.pack(palette, image_hash(image_path, palette_cache), source,
+                      cache.pipeline_settings(num_colors))
+
+
+def jsonl_record(image_path, palette=None, timings=None, palette_cache=None,
+                 error=None, **fields):
+    """
+    Encodes the palette of an image as a compact json line holding the
+    image's path and hash, the palette as written by
+    :meth:`hapycolor.palette.Palette.to_json`, and the durations of the
+    steps of its generation, in seconds. If the image could not be
+    processed, the line only holds its path and the error.
+
+    :arg fields: additional fields of the record
+    """
+    record = collections.OrderedDict()
+    record["path"] = pathlib.Path(image_path).resolve().as_posix()
+    if error is not None:
+        record["error"] = error
+    else:
+        record["hash"] = image_hash(image_path, palette_cache)
+        record["foreground"] = palette.foreground
+        record["background"] = palette.background
+        record["colors"] = palette.array.tolist()
+        if palette.weights is not None:
+            record["weights"] = palette.weights.tolist()
+        if timings is not None:
+            record["timings"] = {k: round(v, 6) for k, v in timings.items()}
+    record.update(fields)
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def copy_result(result, image_path, num_colors, palette_cache=None,
+                palette_store=None, jsonl_file=None):
+    """
+    Saves the palette of the representative of a group of near-duplicates,
+    see :mod:`hapycolor.dedup`, for another image of the group.
+
+    :arg result: the :class:`Result` of the representative
+    :return: the path where the palette has been saved
+    """
+    if palette_store is not None:
+        palette = store.unpack(result.record).palette
+        palette_store.append(pack_palette(image_path, palette, num_colors,
+                                          palette_cache))
+        return palette_store.path
+    if jsonl_file is not None:
+        record = json.loads(result.record)
+        jsonl_file.write(jsonl_record(image_path,
+                                      pltte.Palette.from_dict(record),
+                                      palette_cache=palette_cache,
+                                      duplicate_of=record["path"]))
+        return jsonl_file.name
+    path = output_path(image_path, os.path.dirname(result.output))
+    shutil.copyfile(result.output, path)
+    return path
+
+
+def save_result(result, image_path, num_colors, palette_cache=None,
+                palette_store=None, jsonl_file=None):
+    """
+    Writes the palette of a result which has not been saved by the worker,
+    to the palette store or to the json-lines file. If the image is a
+    near-duplicate of the result's image, the palette is copied, see
+    :func:`copy_result`.
+
+    :return: the path where the palette has been saved
+    """
+    if image_path != result.image:
+        return copy_result(result, image_path, num_colors, palette_cache,
+                           palette_store, jsonl_file)
+    if palette_store is not None:
+        palette_store.append(result.record)
+        return palette_store.path
+    if jsonl_file is not None:
+        jsonl_file.write(result.record)
+        return jsonl_file.name
+    return result.output
+
+
+def run(images, output_dir, num_colors, jobs=1, palette_cache=None,
+        palette_store=None, deduplicate=False, jsonl_file=None):
+    """
+    Generates the palette of each image and saves them in the output
+    directory, or appends them to `palette_store`, an instance of
+    :class:`hapycolor.store.PaletteStore`, or writes them as json lines to
+    `jsonl_file`, a file opened in text mode, with `jobs` processes. The
+    results are printed as soon as they are available, in the order of the
+    provided images, and the cache's statistics are updated with the hits
+    and misses of the workers. The json lines are buffered by the file, and
+    synchronized with the disk once the batch is done.
+
+    If `deduplicate` is `True`, the images are first hashed by the workers
+    to gather the near-duplicates (see :mod:`hapycolor.dedup`), then the
+    palette of each group is only generated from its representative, and
+    saved for each image of the group.
+
+    :return: the list of the images that could not be processed
+    """
+    output_format = "json"
+    if palette_store is not None:
+        output_format = "store"
+    elif jsonl_file is not None:
+        output_format = "jsonl"
+    cache_settings = None
+    if palette_cache is not None:
+        cache_settings = (palette_cache.directory, palette_cache.max_size)
+    if deduplicate:
+        max_distance = dedup.get_max_distance()
+
+    if jobs > 1:
+        # Interpolates the hyperplans, and loads or compiles the filter's
+        # lookup table and the conversions' ones once, before the workers
+        # map them
+        hyperplans = lum_filter.LumFilter.initialization()
+        lum_filter.LumFilter.lookup_table()
+        tables.preload()
+        pool = multiprocessing.Pool(jobs, initialize,
+                                    (output_dir, num_colors, cache_settings,
+                                     True, hyperplans, output_format))
+        mapper = pool.imap
+    else:
+        pool = None
+        initialize(output_dir, num_colors, cache_settings,
+                   output_format=output_format)
+        mapper = map
+
+    failures = []
+    try:
+        if deduplicate:
+            hashes = list(mapper(dedup.perceptual_hash, images))
+            groups = dedup.group(images, hashes, max_distance)
+            print("Found {} near-duplicate images".format(
+                len(images) - len(groups)))
+        else:
+            groups = collections.OrderedDict((i, []) for i in images)
+
+        done = 0
+        for result in mapper(process, list(groups)):
+            for image in [result.image] + groups[result.image]:
+                done += 1
+                progress = "[{}/{}]".format(done, len(images))
+                error = result.error
+                if error is None:
+                    try:
+                        output = save_result(result, image, num_colors,
+                                             palette_cache, palette_store,
+                                             jsonl_file)
+                    except Exception as e:
+                        error = describe(e)
+                if error is not None:
+                    print("{} Failed to process {}: {}".format(
+                        progress, image, error))
+                    failures.append(image)
+                    if jsonl_file is not None:
+                        jsonl_file.write(jsonl_record(image, error=error))
+                    continue
+                if image != result.image:
+                    output = "{} (near-duplicate of {})".format(
+                        output, result.image)
+                print("{} Saved palette of {} to {}".format(
+                    progress, image, output))
+            if palette_cache is not None and result.error is None:
+                if result.cached:
+                    palette_cache.hits += 1
+                else:
+                    palette_cache.misses += 1
+    finally:
+        if pool is not None:
+            # Every task is done, unless the batch has been interrupted
+            pool.terminate()
+            pool.join()
+        if jsonl_file is not None:
+            jsonl_file.flush()
+            os.fsync(jsonl_file.fileno())
+
+    print("Generated {} palettes, {} failures".format(
+        len(images) - len(failures), len(failures)))
+    return failures
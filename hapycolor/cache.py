@@ -0,0 +1,300 @@
+"""
+Persistent cache of the palettes generated by hapycolor.
+
+An entry maps an image's content and the settings of the pipeline that
+processed it (number of extracted colors, extraction engine and pixel budget,
+enabled filters, reducer's threshold and target size, hyperplan files and
+the bits of their lookup table, enabled lookup tables and hapycolor's
+version) to the resulting palette. Hence, changing any of these settings
+invalidates the entries implicitly, since their keys won't match anymore.
+
+Hashing an image requires to read it entirely, so the hash of each image is
+also stored along with its modification time and its size. As long as both
+are unchanged, the stored hash is trusted.
+
+The entries are stored in `~/.cache/hapycolor` (or `$XDG_CACHE_HOME/hapycolor`)
+and the least recently used ones, palettes and stored hashes alike, are
+evicted once the cache exceeds the size defined by the key `max_size` (in
+MiB) of the section `cache` of the configuration file. The size of the cache
+is only measured once per process, then updated with the size of each
+written file.
+"""
+import functools
+import hashlib
+import json
+import os
+import pathlib
+
+from hapycolor import config
+from hapycolor import exceptions
+from hapycolor import filters
+from hapycolor import palette as pltte
+from hapycolor import raw_colors
+from hapycolor.__version__ import __version__
+from hapycolor.color import tables
+from hapycolor.filters import lum_filter
+from hapycolor.filters import lum_table
+from hapycolor.filters import reducer
+
+
+# Default size of the cache in MiB, see :func:`get_max_size`
+MAX_SIZE = 64
+
+# Fraction of the maximal size left by the evictions following a write, so
+# that the cache is not measured again after each write once it is full
+LOW_WATER = 0.9
+
+
+def get_max_size():
+    """
+    Returns the maximal size of the cache in bytes.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value is not a positive number.
+    """
+    try:
+        value = config.ConfigurationManager.load("cache") \
+                .get("max_size", str(MAX_SIZE))
+    except exceptions.InvalidConfigKeyError:
+        value = str(MAX_SIZE)
+    try:
+        max_size = float(value)
+    except ValueError as e:
+        msg = "Invalid value for 'max_size': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg, e)
+    if max_size < 0:
+        msg = "Invalid value for 'max_size': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return int(max_size * 1024 * 1024)
+
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_file(path, mtime_ns, size):
+    return hash_file(path)
+
+
+def pipeline_settings(num_colors):
+    """
+    Returns a dictionary defining all the settings that alter the palette
+    generated from an image.
+    """
+    hyperplans = {}
+    for filter_type in lum_filter.Filter:
+        path = lum_filter.hyperplan_file(filter_type)
+        stat = os.stat(path)
+        hyperplans[filter_type.name] = _hash_file(path, stat.st_mtime_ns,
+                                                  stat.st_size)
+    return {"num_colors": num_colors,
+            "engine": raw_colors.get_engine().value,
+            "max_pixels": raw_colors.get_max_pixels(),
+            "filters": [f.__name__ for f in filters.get()],
+            "threshold": reducer.Reducer.threshold,
+            "target_size": reducer.get_target_size(),
+            "hyperplans": hyperplans,
+            "table_bits": lum_table.get_bits(),
+            "lookup_tables": sorted(tables.enabled()),
+            "version": __version__}
+
+
+class PaletteCache:
+    """
+    Content-addressed palette cache, see the module's documentation.
+
+    :arg directory: the cache's directory, defaults to
+        :func:`hapycolor.config.get_cache_dir`
+    :arg max_size: the cache's maximal size in bytes, defaults to
+        :func:`get_max_size`
+    """
+    def __init__(self, directory=None, max_size=None):
+        self.directory = pathlib.Path(directory or config.get_cache_dir())
+        self.max_size = get_max_size() if max_size is None else max_size
+        self.hits = 0
+        self.misses = 0
+        # Estimated size of the cache, measured by the first write
+        self.size = None
+
+    @property
+    def palettes_dir(self):
+        return self.directory / "palettes"
+
+    @property
+    def images_dir(self):
+        return self.directory / "images"
+
+    def image_hash(self, image_path):
+        """
+        Returns the sha256 of the image's content. The hash is only computed
+        if the image's modification time or size changed since the last
+        call.
+        """
+        path = pathlib.Path(image_path).resolve()
+        stat = path.stat()
+        name = hashlib.sha1(path.as_posix().encode()).hexdigest()
+        hint_file = self.images_dir / (name + ".json")
+        try:
+            with open(hint_file.as_posix()) as f:
+                hint = json.load(f)
+            if hint["mtime"] == stat.st_mtime_ns \
+                    and hint["size"] == stat.st_size:
+                # The modification time marks the last use of the hint
+                os.utime(hint_file.as_posix())
+                return hint["hash"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        image_hash = hash_file(path.as_posix())
+        hint = {"path": path.as_posix(), "mtime": stat.st_mtime_ns,
+                "size": stat.st_size, "hash": image_hash}
+        self.grow(self._write(hint_file, hint))
+        return image_hash
+
+    def key(self, image_path, settings):
+        data = json.dumps({"image": self.image_hash(image_path),
+                           "settings": settings}, sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, image_path, settings):
+        """
+        Returns the cached palette of the image generated with the provided
+        settings, or `None` if there is no such entry.
+        """
+        entry = self.palettes_dir / (self.key(image_path, settings) + ".json")
+        try:
+            with open(entry.as_posix()) as f:
+                data = json.load(f)
+            # The modification time marks the last use of the entry
+            os.utime(entry.as_posix())
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        palette = pltte.Palette()
+        palette.foreground = tuple(data["foreground"])
+        palette.background = tuple(data["background"])
+        palette.colors = [tuple(c) for c in data["colors"]]
+        palette.weights = data.get("weights")
+        palette.metadata = data["metadata"]
+        self.hits += 1
+        return palette
+
+    def put(self, image_path, settings, palette):
+        """
+        Stores the palette of the image generated with the provided settings
+        and evicts the least recently used entries if the cache became too
+        large.
+        """
+        entry = self.palettes_dir / (self.key(image_path, settings) + ".json")
+        weights = palette.weights
+        self.grow(self._write(entry, {"foreground": palette.foreground,
+                                      "background": palette.background,
+                                      "colors": palette.colors,
+                                      "weights": None if weights is None
+                                      else weights.tolist(),
+                                      "metadata": palette.metadata}))
+
+    def grow(self, size):
+        """
+        Adds the growth due to a written file, see :meth:`_write`, to the
+        estimated size of the cache, and evicts the least recently used
+        files, down to :data:`LOW_WATER` of the maximal size, if the cache
+        became too large. The estimate is
+        measured by the first call, and again by each eviction, which also
+        accounts for the files written by the other processes.
+        """
+        if self.size is None:
+            self.size = sum(s for _, s in self.files())
+        else:
+            self.size += size
+        if self.size > self.max_size:
+            self.evict(int(self.max_size * LOW_WATER))
+
+    def entries(self):
+        """
+        Returns the path and the size of each cached palette, from the least
+        recently used to the most recently used.
+        """
+        return self._scan(self.palettes_dir)
+
+    def files(self):
+        """
+        Returns the path and the size of each file of the cache, cached
+        palettes and stored hashes of the images, from the least recently
+        used to the most recently used.
+        """
+        return self._scan(self.palettes_dir, self.images_dir)
+
+    @staticmethod
+    def _scan(*directories):
+        entries = []
+        for directory in directories:
+            try:
+                files = list(os.scandir(directory.as_posix()))
+            except FileNotFoundError:
+                continue
+            for e in files:
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    stat = e.stat()
+                except FileNotFoundError:
+                    # Evicted by a concurrent process
+                    continue
+                entries.append((stat.st_mtime_ns, e.path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(entries)]
+
+    def evict(self, target=None):
+        """
+        Removes the least recently used files of the cache until its size is
+        at most `target` bytes, the maximal size by default.
+        """
+        target = self.max_size if target is None else target
+        files = self.files()
+        self.size = sum(s for _, s in files)
+        for path, file_size in files:
+            if self.size <= target:
+                break
+            self.size -= file_size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """
+        Returns the statistics of the cache. The hits and the misses are the
+        ones of this instance.
+        """
+        return {"directory": self.directory.as_posix(),
+                "entries": len(self.entries()),
+                "size": sum(s for _, s in self.files()),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses}
+
+    def _write(self, path, data):
+        """
+        Writes the data in a temporary file which then replaces the target,
+        so that concurrent readers never see a partially written entry.
+
+        :return: the growth of the cache: the size of the written file,
+            minus the size of the file it replaced, if any
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        tmp = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        with open(tmp.as_posix(), "w") as f:
+            json.dump(data, f)
+            size = f.tell()
+        os.replace(tmp.as_posix(), path.as_posix())
+        return size - old_size
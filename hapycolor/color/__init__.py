@@ -0,0 +1,293 @@
+"""
+Vectorized conversions between the color spaces used by the filters and the
+targets: sRGB, linear RGB, XYZ, Lab, LCh, HSL and OKLab.
+
+Every function takes an `... x 3` array, usually an `N x 3` array of colors,
+and returns a float array of the same shape. Following the rest of the
+package, the `rgb` colors have channels between 0 and 255, while the `srgb`
+ones have channels between 0 and 1. Converting an integer array of `rgb`
+colors to linear RGB only indexes :data:`GAMMA_TABLE`, hence no power is
+computed.
+
+The XYZ and Lab conversions use the same constants as colormath, relatively
+to the D65 reference white, so that :func:`srgb_to_lab` matches colormath's
+conversion of an `sRGBColor` to a `LabColor`.
+
+The scalar functions of :mod:`hapycolor.helpers` are wrappers of these
+functions.
+"""
+import numpy as np
+
+
+# sRGB to XYZ matrix, XYZ to sRGB matrix and D65 reference white, as defined
+# by colormath
+SRGB_TO_XYZ = np.array([[0.412424, 0.357579, 0.180464],
+                        [0.212656, 0.715158, 0.0721856],
+                        [0.0193324, 0.119193, 0.950444]])
+XYZ_TO_SRGB = np.array([[3.24071, -1.53726, -0.498571],
+                        [-0.969258, 1.87599, 0.0415557],
+                        [0.0556352, -0.203996, 1.05707]])
+D65 = np.array([0.95047, 1.0, 1.08883])
+CIE_E = 216 / 24389
+CIE_K = 7.787
+
+# Linear sRGB to LMS, and non linear LMS to OKLab matrices
+# see: `<https://bottosson.github.io/posts/oklab/>`_
+LINEAR_TO_LMS = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                          [0.2119034982, 0.6806995451, 0.1073969566],
+                          [0.0883024619, 0.2817188376, 0.6299787005]])
+LMS_TO_OKLAB = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                         [1.9779984951, -2.4285922050, 0.4505937099],
+                         [0.0259040371, 0.7827717662, -0.8086757660]])
+LMS_TO_LINEAR = np.linalg.inv(LINEAR_TO_LMS)
+OKLAB_TO_LMS = np.linalg.inv(LMS_TO_OKLAB)
+
+
+def _floats(colors):
+    return np.asarray(colors, dtype=np.float64)
+
+
+def _stack(*channels):
+    return np.stack(channels, axis=-1)
+
+
+def srgb_to_linear(srgb):
+    """
+    Removes the gamma compression of sRGB colors.
+
+    :arg srgb: an `... x 3` array of sRGB colors, between 0 and 1
+    :return: an `... x 3` float array of linear RGB colors
+    """
+    srgb = _floats(srgb)
+    return np.where(srgb <= 0.04045, srgb / 12.92,
+                    ((srgb + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(linear):
+    """
+    Applies the gamma compression of the sRGB space to linear RGB colors.
+
+    :arg linear: an `... x 3` array of linear RGB colors, between 0 and 1
+    :return: an `... x 3` float array of sRGB colors
+    """
+    linear = _floats(linear)
+    with np.errstate(invalid="ignore"):
+        return np.where(linear <= 0.0031308, linear * 12.92,
+                        1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+#: Linear value of each 8 bits sRGB channel
+GAMMA_TABLE = srgb_to_linear(np.arange(256) / 255)
+
+
+def rgb_to_linear(colors):
+    """
+    Converts rgb colors to linear RGB: the integer colors are looked up in
+    :data:`GAMMA_TABLE`, the others are divided by 255 and decompressed.
+
+    :arg colors: an `... x 3` array of rgb colors, between 0 and 255
+    :return: an `... x 3` float array of linear RGB colors, between 0 and 1
+    """
+    colors = np.asarray(colors)
+    if np.issubdtype(colors.dtype, np.integer):
+        return GAMMA_TABLE[colors]
+    return srgb_to_linear(colors / 255)
+
+
+def linear_to_rgb(linear):
+    """
+    Converts linear RGB colors to rgb colors, whose channels are not rounded.
+
+    :arg linear: an `... x 3` array of linear RGB colors, between 0 and 1
+    :return: an `... x 3` float array of rgb colors, between 0 and 255
+    """
+    return linear_to_srgb(linear) * 255
+
+
+def linear_to_xyz(linear):
+    """ Converts linear RGB colors to the XYZ space """
+    return _floats(linear) @ SRGB_TO_XYZ.T
+
+
+def xyz_to_linear(xyz):
+    """
+    Converts XYZ colors to linear RGB. As colormath does, the negative
+    channels, which are out of the sRGB gamut, are clamped to 0.
+    """
+    return np.maximum(_floats(xyz) @ XYZ_TO_SRGB.T, 0)
+
+
+def xyz_to_lab(xyz):
+    """
+    Converts XYZ colors to the Lab space.
+
+    :arg xyz: an `... x 3` array of XYZ colors
+    :return: an `... x 3` float array of Lab colors
+    """
+    xyz = _floats(xyz) / D65
+    f = np.where(xyz > CIE_E, np.cbrt(xyz), CIE_K * xyz + 16 / 116)
+    x, y, z = np.moveaxis(f, -1, 0)
+    return _stack(116 * y - 16, 500 * (x - y), 200 * (y - z))
+
+
+def lab_to_xyz(lab):
+    """
+    Converts Lab colors to the XYZ space.
+
+    :arg lab: an `... x 3` array of Lab colors
+    :return: an `... x 3` float array of XYZ colors
+    """
+    L, a, b = np.moveaxis(_floats(lab), -1, 0)
+    y = (L + 16) / 116
+    f = _stack(a / 500 + y, y, y - b / 200)
+    cube = f ** 3
+    return np.where(cube > CIE_E, cube, (f - 16 / 116) / CIE_K) * D65
+
+
+def lab_to_lch(lab):
+    """
+    Converts Lab colors to the LCh space, whose hues are in degrees, between
+    0 and 360.
+    """
+    L, a, b = np.moveaxis(_floats(lab), -1, 0)
+    return _stack(L, np.hypot(a, b), np.degrees(np.arctan2(b, a)) % 360)
+
+
+def lch_to_lab(lch):
+    """ Converts LCh colors, whose hues are in degrees, to the Lab space """
+    L, C, h = np.moveaxis(_floats(lch), -1, 0)
+    h = np.radians(h)
+    return _stack(L, C * np.cos(h), C * np.sin(h))
+
+
+def linear_to_oklab(linear):
+    """ Converts linear RGB colors to the OKLab space """
+    lms = np.cbrt(_floats(linear) @ LINEAR_TO_LMS.T)
+    return lms @ LMS_TO_OKLAB.T
+
+
+def oklab_to_linear(oklab):
+    """ Converts OKLab colors to linear RGB """
+    lms = (_floats(oklab) @ OKLAB_TO_LMS.T) ** 3
+    return lms @ LMS_TO_LINEAR.T
+
+
+def srgb_to_lab(srgb):
+    """
+    Converts sRGB colors, between 0 and 1, to the Lab space, as colormath
+    converts an `sRGBColor` to a `LabColor`.
+    """
+    return xyz_to_lab(linear_to_xyz(srgb_to_linear(srgb)))
+
+
+def lab_to_srgb(lab):
+    """
+    Converts Lab colors to sRGB colors, between 0 and 1, as colormath
+    converts a `LabColor` to an `sRGBColor`.
+    """
+    return linear_to_srgb(xyz_to_linear(lab_to_xyz(lab)))
+
+
+def rgb_to_xyz(colors):
+    """ Converts rgb colors, between 0 and 255, to the XYZ space """
+    return linear_to_xyz(rgb_to_linear(colors))
+
+
+def xyz_to_rgb(xyz):
+    """ Converts XYZ colors to rgb colors, between 0 and 255 """
+    return linear_to_rgb(xyz_to_linear(xyz))
+
+
+def rgb_to_lab(colors):
+    """ Converts rgb colors, between 0 and 255, to the Lab space """
+    return xyz_to_lab(rgb_to_xyz(colors))
+
+
+def lab_to_rgb(lab):
+    """ Converts Lab colors to rgb colors, between 0 and 255 """
+    return xyz_to_rgb(lab_to_xyz(lab))
+
+
+def rgb_to_lch(colors):
+    """ Converts rgb colors, between 0 and 255, to the LCh space """
+    return lab_to_lch(rgb_to_lab(colors))
+
+
+def lch_to_rgb(lch):
+    """ Converts LCh colors to rgb colors, between 0 and 255 """
+    return lab_to_rgb(lch_to_lab(lch))
+
+
+def rgb_to_oklab(colors):
+    """ Converts rgb colors, between 0 and 255, to the OKLab space """
+    return linear_to_oklab(rgb_to_linear(colors))
+
+
+def oklab_to_rgb(oklab):
+    """ Converts OKLab colors to rgb colors, between 0 and 255 """
+    return linear_to_rgb(oklab_to_linear(oklab))
+
+
+def rgb_to_hsl(colors, decimals=None, hues=None):
+    """
+    Converts rgb colors to the HSL space. The hues are in degrees, between 0
+    and 360, and the achromatic colors have a null hue and a null saturation.
+
+    :arg colors: an `... x 3` array of rgb colors, between 0 and 255
+    :arg decimals: if provided, the hues are rounded to this number of
+        decimals, before being brought back between 0 and 360
+    :arg hues: if provided, the hues of the colors, which are then not
+        computed, see :func:`hapycolor.color.tables.rgb_to_hsl`
+    :return: an `... x 3` float array of hsl colors
+    """
+    rgb = _floats(colors) / 255.
+    r, g, b = np.moveaxis(rgb, -1, 0)
+    maxrgb = rgb.max(axis=-1)
+    minrgb = rgb.min(axis=-1)
+    delta = maxrgb - minrgb
+    luminosity = (minrgb + maxrgb) / 2
+    chromatic = delta != 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(luminosity <= 0.5,
+                     delta / (maxrgb + minrgb),
+                     delta / (2 - maxrgb - minrgb))
+        if hues is None:
+            h = np.where(maxrgb == r, (g - b) / delta,
+                         np.where(maxrgb == g, 2 + (b - r) / delta,
+                                  4 + (r - g) / delta))
+    if hues is not None:
+        h = np.asarray(hues, dtype=np.float64)
+    else:
+        h = h * 60
+        if decimals is not None:
+            h = np.round(h, decimals)
+        h = h % 360
+    return _stack(np.where(chromatic, h, 0),
+                  np.where(chromatic, s, 0),
+                  luminosity)
+
+
+def hsl_to_rgb(hsl):
+    """
+    Converts hsl colors, whose hues are in degrees, to rgb colors whose
+    channels are not rounded.
+
+    :arg hsl: an `... x 3` array of hsl colors
+    :return: an `... x 3` float array of rgb colors, between 0 and 255
+    """
+    h, s, lum = np.moveaxis(_floats(hsl), -1, 0)
+    h = h / 360.
+    tmp1 = np.where(lum < 0.5, lum * (1 + s), lum + s - (lum * s))
+    tmp2 = 2 * lum - tmp1
+
+    def channel(tmpc):
+        c = np.select([6 * tmpc < 1, 2 * tmpc < 1, 3 * tmpc < 2],
+                      [tmp2 + tmpc * 6 * (tmp1 - tmp2), tmp1,
+                       tmp2 + (tmp1 - tmp2) * (2 / 3. - tmpc) * 6],
+                      tmp2)
+        return 255 * c
+
+    return _stack(channel(np.where(h <= 2 / 3., h + 1 / 3., h - 2 / 3.)),
+                  channel(h),
+                  channel(np.where(h >= 1 / 3., h - 1 / 3., h + 2 / 3.)))
@@ -0,0 +1,245 @@
+"""
+Lookup tables of the conversions of the 24 bits rgb colors.
+
+The hue and the Lab coordinates of a color only depend on the color, so
+they can be computed once for each of the 16.7M colors of the rgb cube and
+stored in a file of hapycolor's cache directory. A table is
+generated the first time it is used, then memory mapped read only, hence the
+processes converting colors in parallel, like the workers of `--dir`, share
+a single copy of the table in the page cache, and converting an array of
+colors only costs a gather.
+
+The tables are optional: only the ones listed by the key `lookup_tables` of
+the section `cache` of the configuration file, read once per process, are
+used, the conversions of the others are computed as usual. The verdicts of
+:class:`hapycolor.filters.lum_filter.LumFilter` are stored in a similar
+table, see :mod:`hapycolor.filters.lum_table`.
+
+The header of a table stores its name, its layout and a version stamp, so
+that it is regenerated when the conversion it holds changes.
+"""
+import functools
+import os
+import struct
+
+import numpy as np
+
+from hapycolor import color
+from hapycolor import config
+from hapycolor import exceptions
+
+
+# magic, version, name, version of the table's function, bits, channels,
+# dtype
+HEADER = struct.Struct("<4sH8sHBB4s")
+MAGIC = b"HCLT"
+VERSION = 1
+
+# Number of colors converted at once when generating a table
+CHUNK_SIZE = 1 << 20
+
+
+def get_enabled():
+    """
+    Returns the names of the tables enabled by the key `lookup_tables` of
+    the section `cache` of the configuration file: a comma separated list
+    of names among the keys of :data:`TABLES`, empty by default.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if a name
+        is unknown.
+    """
+    try:
+        value = config.ConfigurationManager.load("cache") \
+            .get("lookup_tables", "")
+    except exceptions.InvalidConfigKeyError:
+        value = ""
+    names = {n.strip() for n in value.split(",") if n.strip()}
+    unknown = names - set(TABLES)
+    if unknown:
+        msg = "Invalid value for 'lookup_tables': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def enabled():
+    """
+    Returns the names of the enabled tables, see :func:`get_enabled`, which
+    are only read from the configuration file by the first call.
+    """
+    return frozenset(get_enabled())
+
+
+def cube(bits, start=0, stop=None):
+    """
+    Returns the colors of the rgb cube quantized over `bits` bits per
+    channel whose indices in a table are between `start` and `stop`. The
+    colors of a quantized cube are the centers of its cells.
+    """
+    size = 1 << (3 * bits)
+    indices = np.arange(start, size if stop is None else min(stop, size))
+    mask = (1 << bits) - 1
+    channels = np.stack([indices >> (2 * bits), indices >> bits, indices],
+                        axis=1) & mask
+    shift = 8 - bits
+    return (channels << shift) + ((1 << shift) >> 1)
+
+
+class Table:
+    """
+    A conversion of the rgb colors, precomputed over the rgb cube.
+
+    :arg name: the name of the table, at most 8 characters long
+    :arg function: the vectorized conversion, taking an `N x 3` integer
+        array of rgb colors
+    :arg dtype: the type of the stored values
+    :arg channels: the number of values of each color, 1 if the function
+        returns a one dimensional array
+    :arg version: the version of the function, to be increased when its
+        results change
+    :arg bits: the number of bits per channel of the cube, 8 so that every
+        rgb color is stored
+    """
+    def __init__(self, name, function, dtype, channels, version=1, bits=8):
+        self.name = name
+        self.function = function
+        self.dtype = np.dtype(dtype)
+        self.channels = channels
+        self.version = version
+        self.bits = bits
+        self.values = None
+
+    def path(self):
+        return config.get_cache_dir() / "{}_{}.lut".format(self.name,
+                                                            self.bits)
+
+    def header(self):
+        return HEADER.pack(MAGIC, VERSION, self.name.encode(), self.version,
+                           self.bits, self.channels, self.dtype.str.encode())
+
+    def shape(self):
+        size = 1 << (3 * self.bits)
+        return (size,) if self.channels == 1 else (size, self.channels)
+
+    def load(self):
+        """
+        Memory maps the table, read only, after generating it if it is
+        missing or if its header does not match the table's.
+        """
+        if self.values is not None:
+            return self.values
+
+        path = self.path()
+        try:
+            with open(path.as_posix(), "rb") as f:
+                valid = f.read(HEADER.size) == self.header()
+        except OSError:
+            valid = False
+        if not valid:
+            self.generate(path)
+        self.values = np.memmap(path.as_posix(), dtype=self.dtype, mode="r",
+                                offset=HEADER.size, shape=self.shape())
+        return self.values
+
+    def generate(self, path):
+        """
+        Computes the table by chunks, in a temporary file which then replaces
+        the table, so that the processes loading it concurrently never map
+        an incomplete table.
+        """
+        print("Generating the lookup table '{}'".format(self.name))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        try:
+            with open(tmp.as_posix(), "wb") as f:
+                f.write(self.header())
+            values = np.memmap(tmp.as_posix(), dtype=self.dtype, mode="r+",
+                               offset=HEADER.size, shape=self.shape())
+            for start in range(0, len(values), CHUNK_SIZE):
+                colors = cube(self.bits, start, start + CHUNK_SIZE)
+                values[start:start + CHUNK_SIZE] = self.function(colors)
+            values.flush()
+            del values
+            os.replace(tmp.as_posix(), path.as_posix())
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def indices(self, colors):
+        colors = np.asarray(colors, dtype=np.int64) >> (8 - self.bits)
+        return (colors[..., 0] << (2 * self.bits)) \
+            | (colors[..., 1] << self.bits) | colors[..., 2]
+
+    def __call__(self, colors):
+        """
+        Returns the values of the provided colors.
+
+        :arg colors: an `... x 3` array of rgb colors
+        """
+        return self.load().view(np.ndarray)[self.indices(colors)]
+
+
+def hues(colors):
+    """
+    Returns the hues of the colors rounded to integers, as
+    :func:`hapycolor.helpers.rgb_to_hsl` does.
+    """
+    return color.rgb_to_hsl(colors, decimals=0)[..., 0]
+
+
+#: The available tables, see :func:`get_enabled`
+TABLES = {
+    "hsl": Table("hsl", hues, np.uint16, 1, version=2),
+    "lab": Table("lab", color.rgb_to_lab, np.float32, 3),
+}
+
+
+def lookup(name, function, colors):
+    """
+    Converts the colors with the table `name` if it is enabled and can be
+    loaded, otherwise with the function.
+    """
+    if name in enabled():
+        try:
+            return TABLES[name](colors)
+        except OSError:
+            # The cache directory is not writable
+            pass
+    return function(colors)
+
+
+def preload():
+    """
+    Generates the missing enabled tables, for instance before forking
+    workers, so that they do not generate them concurrently.
+    """
+    for name in sorted(enabled()):
+        TABLES[name].load()
+
+
+def rgb_to_hsl(colors):
+    """
+    Converts rgb colors to the HSL space, whose hues are rounded to integers
+    as :func:`hapycolor.helpers.rgb_to_hsl` does. Only the hues, the costly
+    part of the conversion, are looked up in the table, and since they are
+    integers, the results are exactly the ones of the conversion.
+
+    :arg colors: an `... x 3` integer array of rgb colors
+    :return: an `... x 3` float array of hsl colors
+    """
+    colors = np.asarray(colors)
+    return color.rgb_to_hsl(colors, decimals=0,
+                            hues=lookup("hsl", lambda c: None, colors))
+
+
+def rgb_to_lab(colors):
+    """
+    Converts rgb colors to the Lab space, see
+    :func:`hapycolor.color.rgb_to_lab`. The values looked up in the table
+    are simple precision floats.
+
+    :arg colors: an `... x 3` integer array of rgb colors
+    :return: an `... x 3` float array of Lab colors
+    """
+    return lookup("lab", color.rgb_to_lab, np.asarray(colors))
+
@@ -1,4 +1,5 @@
 import configparser
+import os
 import pathlib
 import shutil
 from . import exceptions
@@ -32,6 +33,16 @@ def get_default_config():
     return (ROOT_DIR / CONFIG).as_posix()
 
 
+def get_cache_dir():
+    """
+    Returns the directory where hapycolor stores the data it generated and
+    that can be regenerated: `$XDG_CACHE_HOME/hapycolor`, or
+    `~/.cache/hapycolor` if the variable is not defined.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or "~/.cache"
+    return pathlib.Path(base).expanduser() / "hapycolor"
+
+
 class ConfigurationManager:
     """
     This class is meant to be inherited by a class that interacts with
@@ -122,11 +122,11 @@ class ConfigurationEditor:
             elif opt == "random":
                 color = next(iter_palette)
             elif opt == "foreground":
-                color = iter_palette.foreground
+                color = iter_palette.palette.foreground
             elif opt == "background":
-                color = iter_palette.background
-            elif opt in iter_palette.other:
-                color = iter_palette.other[opt]
+                color = iter_palette.palette.background
+            elif opt in iter_palette.palette.other:
+                color = iter_palette.palette.other[opt]
             else:
                 msg = "Macro not recognized in line: {}".format(line)
                 raise exceptions.InvalidMacroException(msg)
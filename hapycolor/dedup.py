@@ -0,0 +1,162 @@
+"""
+Detection of the near-duplicate images of a collection.
+
+Wallpaper collections often hold the same picture several times,
+re-encoded, resized or slightly cropped. Since their palettes would be
+almost identical, :func:`group` gathers them so that the palette of each
+group is only generated once, from its first image, its representative.
+
+An image is identified by a perceptual hash: its luminosity is decoded at a
+tiny scale, the low frequencies of its discrete cosine transform are
+compared to their median, and the resulting 64 bits are kept. Two images
+are near-duplicates if their hashes differ by at most `max_distance` bits,
+defined by the section `dedup` of the configuration file. The hashes of the
+representatives are stored in a multi-index (see :class:`MultiIndex`), so
+that the representatives close to an image are found without comparing the
+image to each of them.
+"""
+import collections
+import itertools
+
+import numpy as np
+from PIL import Image
+from scipy import fftpack
+
+from hapycolor import config
+from hapycolor import exceptions
+
+
+MAX_DISTANCE = 8
+
+# Size of the decoded luminosity, and of the low frequencies kept in the hash
+SAMPLE_SIZE = 32
+HASH_SIZE = 8
+
+# Number of chunks of the hashes indexed by :class:`MultiIndex`
+CHUNKS = 4
+CHUNK_BITS = HASH_SIZE ** 2 // CHUNKS
+
+
+def get_max_distance():
+    """
+    Returns the maximal number of bits by which the hashes of two
+    near-duplicate images differ, defined by the key `max_distance` of the
+    section `dedup` of the configuration file.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value is not an integer between 0 and 64.
+    """
+    try:
+        value = config.ConfigurationManager.load("dedup") \
+            .get("max_distance", str(MAX_DISTANCE))
+    except exceptions.InvalidConfigKeyError:
+        value = str(MAX_DISTANCE)
+    try:
+        max_distance = int(value)
+    except ValueError as e:
+        msg = "Invalid value for 'max_distance': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg, e)
+    if not 0 <= max_distance <= HASH_SIZE ** 2:
+        msg = "Invalid value for 'max_distance': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return max_distance
+
+
+def perceptual_hash(image_path):
+    """
+    Returns the perceptual hash of an image, as a 64 bits integer, or `None`
+    if the image cannot be decoded: it is then processed, and its failure
+    reported, as any other image.
+    """
+    try:
+        with Image.open(image_path) as image:
+            # The JPEG decoder only computes an eighth of the image
+            image.draft("L", (SAMPLE_SIZE, SAMPLE_SIZE))
+            image = image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE),
+                                              Image.BOX)
+            pixels = np.asarray(image, dtype=np.float64)
+    except Exception:
+        # Any image that cannot be decoded, e.g. a decompression bomb
+        return None
+
+    frequencies = fftpack.dct(fftpack.dct(pixels, axis=0, norm="ortho"),
+                              axis=1, norm="ortho")[:HASH_SIZE, :HASH_SIZE]
+    # The first coefficient, the mean luminosity, would bias the median
+    bits = frequencies.ravel() > np.median(frequencies.ravel()[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(hash_1, hash_2):
+    return bin(hash_1 ^ hash_2).count("1")
+
+
+def split(image_hash):
+    mask = (1 << CHUNK_BITS) - 1
+    return [(image_hash >> (i * CHUNK_BITS)) & mask for i in range(CHUNKS)]
+
+
+class MultiIndex:
+    """
+    Multi-index hashing of 64 bits hashes under the Hamming distance.
+
+    The hashes are split into :data:`CHUNKS` chunks, and each chunk is
+    indexed in its own table. Since two hashes differing by at most
+    `max_distance` bits have a chunk differing by at most
+    `max_distance // CHUNKS` bits, the candidates close to a hash are found
+    by looking up each of its chunks, flipped by each mask of at most that
+    many bits, then the candidates are checked with the whole hashes.
+    """
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self.masks = [sum(1 << b for b in bits)
+                      for k in range(max_distance // CHUNKS + 1)
+                      for bits in itertools.combinations(range(CHUNK_BITS),
+                                                         k)]
+        self.tables = [{} for _ in range(CHUNKS)]
+        self.entries = []
+
+    def add(self, image_hash, item):
+        for table, chunk in zip(self.tables, split(image_hash)):
+            table.setdefault(chunk, []).append(len(self.entries))
+        self.entries.append((image_hash, item))
+
+    def search(self, image_hash):
+        """
+        Returns a list of tuples holding the distance to the provided hash and
+        the item of each hash closer than `max_distance`.
+        """
+        candidates = set()
+        for table, chunk in zip(self.tables, split(image_hash)):
+            for mask in self.masks:
+                candidates.update(table.get(chunk ^ mask, ()))
+        found = []
+        for i in candidates:
+            distance = hamming(image_hash, self.entries[i][0])
+            if distance <= self.max_distance:
+                found.append((distance, self.entries[i][1]))
+        return found
+
+
+def group(images, hashes, max_distance):
+    """
+    Gathers the near-duplicate images. An image joins the group of the
+    closest representative within `max_distance` bits, or becomes the
+    representative of a new group. The images which could not be hashed
+    are left alone.
+
+    :arg hashes: the perceptual hash of each image, see
+        :func:`perceptual_hash`
+    :return: an ordered dictionary mapping each representative to the list
+        of the other images of its group
+    """
+    groups = collections.OrderedDict()
+    index = MultiIndex(max_distance)
+    for image, image_hash in zip(images, hashes):
+        if image_hash is not None:
+            found = index.search(image_hash)
+            if found:
+                groups[min(found)[1]].append(image)
+                continue
+            index.add(image_hash, image)
+        groups[image] = []
+    return groups
@@ -0,0 +1,315 @@
+"""
+Maximum independent set of a graph, used by
+:class:`hapycolor.filters.reducer.Reducer` to find the largest set of colors
+that are pairwise at least `threshold` apart, i.e. that are not neighbours in
+the graph of the colors that are "too close".
+
+The sets of nodes are represented by bitsets (python integers), where the bit
+`i` stands for the `i`-th node of the graph. Graphs containing at most
+`exact_size` nodes are solved exactly by a branch and bound search. Larger
+graphs are solved by a greedy heuristic, improved by an iterated local
+search until it stops improving, or until the time budget is exhausted.
+"""
+import random
+import time
+
+import numpy as np
+
+
+# Largest graph solved exactly, see :func:`maximum_independent_set`
+EXACT_SIZE = 64
+
+# Maximal duration in seconds of the search of a graph
+TIME_BUDGET = 1.0
+
+# Number of perturbations per node without improvement after which the
+# local search stops, see :func:`local_search`
+STALLS = 1
+
+
+if hasattr(int, "bit_count"):
+    # Python 3.10 and later
+    popcount = int.bit_count
+else:
+    def popcount(bitset):
+        return bin(bitset).count("1")
+
+
+def nodes_of(bitset):
+    """ Returns the indices of the bits set in the provided bitset """
+    indices = []
+    while bitset:
+        low = bitset & -bitset
+        indices.append(low.bit_length() - 1)
+        bitset ^= low
+    return indices
+
+
+class Adjacency:
+    """
+    Lists of the neighbours of each node, computed on demand from their
+    bitsets, since only the neighbours of the nodes of a solution are
+    usually needed.
+    """
+    def __init__(self, masks):
+        self.masks = masks
+        self.lists = {}
+
+    def __getitem__(self, node):
+        if node not in self.lists:
+            self.lists[node] = nodes_of(self.masks[node])
+        return self.lists[node]
+
+
+def neighbourhoods(graph, nodes):
+    """
+    Returns the bitsets of the neighbours of each node, ignoring the self
+    loops.
+    """
+    index = {node: i for i, node in enumerate(nodes)}
+    masks = []
+    for i, node in enumerate(nodes):
+        mask = 0
+        for neighbour in graph[node]:
+            mask |= 1 << index[neighbour]
+        masks.append(mask & ~(1 << i))
+    return masks
+
+
+def matrix_neighbourhoods(adjacency):
+    """
+    Returns the bitsets of the neighbours of each node of a graph defined by
+    its symmetric boolean adjacency matrix, ignoring the self loops, as
+    :func:`neighbourhoods` does.
+    """
+    adjacency = np.array(adjacency, dtype=bool)
+    n = len(adjacency)
+    adjacency[np.arange(n), np.arange(n)] = False
+    # The bit `i` of a mask is the `i`-th column: the columns are reversed so
+    # that the packed bytes are a big-endian integer, padded with zeros
+    padding = -n % 8
+    return [int.from_bytes(np.packbits(row[::-1]).tobytes(), "big")
+            >> padding for row in adjacency]
+
+
+def greedy(masks, candidates):
+    """
+    Builds an independent set by selecting the node that has the fewest
+    neighbours among the candidates, then discarding its neighbours, until
+    there is no candidate left. Ties are broken by the number of neighbours
+    in the whole graph, so that the nodes the least in conflict are kept.
+    """
+    degrees = [popcount(mask) for mask in masks]
+    solution = 0
+    while candidates:
+        node = min(nodes_of(candidates),
+                   key=lambda i: (popcount(masks[i] & candidates),
+                                  degrees[i]))
+        solution |= 1 << node
+        candidates &= ~(masks[node] | (1 << node))
+    return solution
+
+
+def clique_cover(masks, candidates):
+    """
+    Returns the number of cliques of a greedy clique cover of the candidates,
+    which is an upper bound of the size of their independent sets, since an
+    independent set contains at most one node of each clique.
+    """
+    count = 0
+    while candidates:
+        node = (candidates & -candidates).bit_length() - 1
+        candidates &= ~(1 << node)
+        common = candidates & masks[node]
+        while common:
+            other = (common & -common).bit_length() - 1
+            candidates &= ~(1 << other)
+            common &= masks[other]
+        count += 1
+    return count
+
+
+class Timeout(Exception):
+    pass
+
+
+def exact(masks, deadline):
+    """
+    Branch and bound search of a maximum independent set. The search is
+    interrupted at the deadline, and the best set found so far is returned.
+
+    :return: a tuple containing the best independent set and a boolean,
+        `True` if this set is known to be optimal
+    """
+    all_nodes = (1 << len(masks)) - 1
+    best = [greedy(masks, all_nodes)]
+
+    def expand(candidates, solution):
+        if time.monotonic() > deadline:
+            raise Timeout()
+
+        # Isolated candidates belong to a maximum independent set
+        for node in nodes_of(candidates):
+            if not masks[node] & candidates:
+                solution |= 1 << node
+                candidates &= ~(1 << node)
+
+        size = popcount(solution)
+        if not candidates:
+            if size > popcount(best[0]):
+                best[0] = solution
+            return
+        if size + clique_cover(masks, candidates) <= popcount(best[0]):
+            return
+
+        node = max(nodes_of(candidates),
+                   key=lambda i: popcount(masks[i] & candidates))
+        expand(candidates & ~(masks[node] | (1 << node)),
+               solution | (1 << node))
+        expand(candidates & ~(1 << node), solution)
+
+    try:
+        expand(all_nodes, 0)
+    except Timeout:
+        return best[0], False
+    return best[0], True
+
+
+def touched(masks, adjacency, solution, removed):
+    """
+    Returns the nodes to be checked again by :func:`improve` once the nodes
+    of `removed` left the solution: these nodes and their neighbours, which
+    may be free or tight, and the nodes of the solution adjacent to these
+    neighbours.
+    """
+    pending = removed
+    for node in nodes_of(removed):
+        pending |= masks[node]
+        for neighbour in adjacency[node]:
+            pending |= masks[neighbour] & solution
+    return pending
+
+
+def improve(masks, solution, pending=None, adjacency=None):
+    """
+    Local search: adds the free nodes, then applies (1, 2)-swaps, i.e.
+    replaces a node of the solution by two of its non adjacent neighbours
+    whose only neighbour in the solution is this node, until no swap
+    applies.
+
+    Only the nodes of `pending`, every node by default, are checked, then
+    the nodes around each change of the solution, so that improving a
+    solution which only changed locally is cheap.
+
+    :arg adjacency: the lists of the neighbours of each node, an instance of
+        :class:`Adjacency` by default
+    """
+    if pending is None:
+        pending = (1 << len(masks)) - 1
+    if adjacency is None:
+        adjacency = Adjacency(masks)
+    while pending:
+        node = (pending & -pending).bit_length() - 1
+        bit = 1 << node
+        pending ^= bit
+        if not solution & bit:
+            if not masks[node] & solution:
+                solution |= bit
+                pending |= bit
+            continue
+
+        # Neighbours whose only neighbour in the solution is `node`
+        tight = [n for n in adjacency[node]
+                 if masks[n] & solution == bit]
+        swap = next(((u, v) for i, u in enumerate(tight)
+                     for v in tight[i + 1:]
+                     if not masks[u] & (1 << v)), None)
+        if swap is not None:
+            solution &= ~bit
+            solution |= (1 << swap[0]) | (1 << swap[1])
+            pending |= (1 << swap[0]) | (1 << swap[1]) \
+                | touched(masks, adjacency, solution, bit)
+    return solution
+
+
+def local_search(masks, deadline, seed=0, max_stalls=None):
+    """
+    Iterated local search: the greedy solution is improved with
+    :func:`improve`, then perturbed by forcing a random node in the solution,
+    and improved again. The perturbed solution is kept if it is not smaller
+    than the current one.
+
+    The search stops after `max_stalls` perturbations in a row that did not
+    enlarge the best solution, :data:`STALLS` times the number of nodes by
+    default, hence its result only depends on the seed, unless the deadline
+    is reached first.
+    """
+    if max_stalls is None:
+        max_stalls = STALLS * len(masks)
+    rng = random.Random(seed)
+    all_nodes = (1 << len(masks)) - 1
+    adjacency = Adjacency(masks)
+    solution = improve(masks, greedy(masks, all_nodes), None, adjacency)
+    best = solution
+    stalls = 0
+    while stalls < max_stalls and time.monotonic() < deadline:
+        if solution == all_nodes:
+            break
+        node = rng.randrange(len(masks))
+        while solution & (1 << node):
+            node = rng.randrange(len(masks))
+        removed = solution & masks[node]
+        candidate = (solution & ~removed) | (1 << node)
+        pending = (1 << node) | touched(masks, adjacency, candidate, removed)
+        candidate = improve(masks, candidate, pending, adjacency)
+        stalls += 1
+        if popcount(candidate) >= popcount(solution):
+            solution = candidate
+            if popcount(solution) > popcount(best):
+                best = solution
+                stalls = 0
+    return best
+
+
+def solve(masks, deadline, exact_size=EXACT_SIZE, seed=0):
+    """
+    Returns a maximum independent set of the graph defined by the bitsets of
+    the neighbours of its nodes, or a maximal one found by local search, see
+    :func:`maximum_independent_set`.
+
+    :arg deadline: the time, as returned by :func:`time.monotonic`, after
+        which the search stops
+    :return: the bitset of the set
+    """
+    if len(masks) <= exact_size:
+        solution, optimal = exact(masks, deadline)
+        if not optimal:
+            solution = max(solution, improve(masks, solution), key=popcount)
+        return solution
+    return local_search(masks, deadline, seed)
+
+
+def maximum_independent_set(graph, exact_size=EXACT_SIZE,
+                            time_budget=TIME_BUDGET, seed=0, deadline=None):
+    """
+    Returns a maximum independent set of the provided graph, or, for graphs
+    containing more than `exact_size` nodes or whose exact search exceeds the
+    time budget, a maximal independent set found by local search.
+
+    :arg graph: an instance of :class:`networkx.Graph`
+    :arg exact_size: the largest number of nodes solved exactly
+    :arg time_budget: the maximal duration of the search, in seconds
+    :arg seed: the seed of the random perturbations of the local search
+    :arg deadline: the time, as returned by :func:`time.monotonic`, after
+        which the search stops, shared by several graphs; it replaces the
+        time budget if provided
+    :return: the nodes of the set, in the order of the graph's nodes
+    """
+    nodes = list(graph)
+    if not nodes:
+        return []
+    if deadline is None:
+        deadline = time.monotonic() + time_budget
+    masks = neighbourhoods(graph, nodes)
+    solution = solve(masks, deadline, exact_size, seed)
+    return [nodes[i] for i in sorted(nodes_of(solution))]
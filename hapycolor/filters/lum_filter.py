@@ -1,10 +1,13 @@
 import warnings
 import enum
 import math
+import pathlib
+import threading
 from scipy import interpolate
 import numpy as np
 from hapycolor import config, exceptions, helpers
 from . import base
+from . import lum_table
 
 
 class Filter(enum.Enum):
@@ -28,19 +31,46 @@ def hyperplan_file(filter_type):
     return path.as_posix()
 
 
-class LumFilter(base.Filter):
-    # Set up grid
-    dark_interp = None
-    dark_max = None
-
-    bright_interp = None
-    bright_min = None
+def hyperplans_key():
+    """
+    Returns the resolved paths of the hyperplan files, in the order of
+    :class:`Filter`, along with their modification times.
+    """
+    key = []
+    for filter_type in Filter:
+        path = pathlib.Path(hyperplan_file(filter_type)).resolve()
+        key.append((path.as_posix(), path.stat().st_mtime_ns))
+    return tuple(key)
+
+
+class Hyperplans:
+    """
+    Interpolation functions of the luminosity and saturation hyperplans,
+    built from the hyperplan files identified by `key` (see
+    :func:`hyperplans_key`). An instance can be pickled, so that worker
+    processes can reuse the functions built by their parent instead of
+    interpolating the hyperplans again.
+    """
+    def __init__(self, key):
+        self.key = key
+        paths = dict(zip(Filter, [path for path, _ in key]))
+        self.dark_interp, self.dark_max = Hyperplans.interpolate(
+                paths[Filter.DARK], "dark")
+        self.bright_interp, self.bright_min = Hyperplans.interpolate(
+                paths[Filter.BRIGHT], "bright")
+        self.saturation_interp = Hyperplans.gen_sat_interpolation(
+                paths[Filter.SATURATION])
 
-    def interpolate_hyperplans(json_file, filter_type):
+    @staticmethod
+    def interpolate(json_file, filter_type):
         """
         Generates a data structures that represent the interpolated
         luminosity hyperplan (dark or bright).
 
+        :return: a tuple containing the interpolation function, and the
+            minimal (bright) or maximal (dark) luminosity of the hyperplan's
+            points
+
         .. todo::
             This should be replaced by a function that only load a json
             file where that contains the interpolated points instead of
@@ -53,10 +83,11 @@ class LumFilter(base.Filter):
             for c in data[s][filter_type]:
                 hsl_points.append(helpers.rgb_to_hsl(tuple(c)))
 
+        bound = None
         if filter_type == "bright":
-            LumFilter.bright_min = min(hsl_points, key=lambda c: c[2])[2]
+            bound = min(hsl_points, key=lambda c: c[2])[2]
         elif filter_type == "dark":
-            LumFilter.dark_max = max(hsl_points, key=lambda c: c[2])[2]
+            bound = max(hsl_points, key=lambda c: c[2])[2]
 
         hues_step = 22.5
         hues_divisions = 16
@@ -95,8 +126,9 @@ class LumFilter(base.Filter):
         # I don't really know how to avoid that, so I'll just silence it,
         # seems wise enough to me
         with warnings.catch_warnings(record=True) as w:
-            return interpolate.interp2d(x, y, z, kind="linear")
+            return interpolate.interp2d(x, y, z, kind="linear"), bound
 
+    @staticmethod
     def gen_sat_interpolation(json_file):
         # Load the provided points
         data = helpers.load_json(json_file)
@@ -115,6 +147,43 @@ class LumFilter(base.Filter):
             hue_interp[h] = interpolate.interp1d(Z, R, kind="linear")
         return hue_interp
 
+
+# Guards the construction of :attr:`LumFilter.hyperplans`
+_lock = threading.Lock()
+
+
+class LumFilter(base.Filter):
+    # Set up grid
+    dark_interp = None
+    dark_max = None
+
+    bright_interp = None
+    bright_min = None
+
+    saturation_interp = None
+
+    # Instance of :class:`Hyperplans` defining the functions above
+    hyperplans = None
+
+    # Lookup table of the verdicts, see :mod:`hapycolor.filters.lum_table`
+    table = None
+
+    def interpolate_hyperplans(json_file, filter_type):
+        """
+        Generates a data structures that represent the interpolated
+        luminosity hyperplan (dark or bright), see
+        :func:`Hyperplans.interpolate`.
+        """
+        interp, bound = Hyperplans.interpolate(json_file, filter_type)
+        if filter_type == "bright":
+            LumFilter.bright_min = bound
+        elif filter_type == "dark":
+            LumFilter.dark_max = bound
+        return interp
+
+    def gen_sat_interpolation(json_file):
+        return Hyperplans.gen_sat_interpolation(json_file)
+
     @staticmethod
     def polar_to_cartesian(polar_point):
         """
@@ -131,35 +200,90 @@ class LumFilter(base.Filter):
     def initialization():
         """
         Initializes the interpolation functions and the max/min values of
-        the dark/bright surfaces
+        the dark/bright surfaces. They are only built if the hyperplan files
+        changed since the last initialization, or if they have never been
+        built.
+
+        :return: the instance of :class:`Hyperplans` in use
+        """
+        key = hyperplans_key()
+        with _lock:
+            if LumFilter.hyperplans is None \
+                    or LumFilter.hyperplans.key != key:
+                LumFilter.install(Hyperplans(key))
+            return LumFilter.hyperplans
+
+    def install(hyperplans):
         """
-        LumFilter.dark_interp = LumFilter.interpolate_hyperplans(
-                hyperplan_file(Filter.DARK), "dark")
+        Uses the provided interpolation functions, e.g. the ones built by
+        a parent process.
 
-        LumFilter.bright_interp = LumFilter.interpolate_hyperplans(
-                hyperplan_file(Filter.BRIGHT), "bright")
+        :arg hyperplans: an instance of :class:`Hyperplans`
+        """
+        LumFilter.dark_interp = hyperplans.dark_interp
+        LumFilter.dark_max = hyperplans.dark_max
+        LumFilter.bright_interp = hyperplans.bright_interp
+        LumFilter.bright_min = hyperplans.bright_min
+        LumFilter.saturation_interp = hyperplans.saturation_interp
+        LumFilter.hyperplans = hyperplans
 
-        LumFilter.saturation_interp = LumFilter.gen_sat_interpolation(
-                hyperplan_file(Filter.SATURATION))
+    @staticmethod
+    def lookup_table():
+        """
+        Returns the lookup table of the filter's verdicts, loaded or
+        generated if needed, or `None` if the table is disabled.
+        """
+        bits = lum_table.get_bits()
+        if bits == 0:
+            return None
+        table = LumFilter.table
+        if table is None or table.bits != bits or not table.is_valid():
+            LumFilter.table = lum_table.LumTable.load(bits)
+        return LumFilter.table
 
     @staticmethod
-    def apply(palette):
+    def mask(colors):
+        """
+        Analyzes an array of colors at once, as :func:`LumFilter.analyze`
+        would for each of them. The verdicts are looked up in the filter's
+        lookup table if it is enabled, otherwise the hyperplans are
+        evaluated for the whole array.
+
+        :arg colors: an `N x 3` array-like of rgb colors
+        :return: an `N x 3` boolean array, whose columns are respectively
+            'True' if the color is too bright, too dark and not saturated
+            enough
+        """
+        colors = np.asarray(colors)
+        if colors.size == 0:
+            return np.zeros((0, len(lum_table.ANALYSES)), dtype=bool)
+        if colors.ndim != 2 or colors.shape[1] != 3 \
+                or not np.issubdtype(colors.dtype, np.integer) \
+                or colors.min() < 0 or colors.max() > 255:
+            raise exceptions.ColorFormatError("Color must be defined in the"
+                                              + " rgb base")
+
+        table = LumFilter.lookup_table()
+        if table is not None:
+            return table(colors)
         LumFilter.initialization()
+        return lum_table.evaluate(colors)
 
+    @staticmethod
+    def apply(palette):
         # Set background
         hsl_bg = helpers.rgb_to_hsl(palette.background)
         hsl_bg = (hsl_bg[0], hsl_bg[1], hsl_bg[2]*2)
-        if not LumFilter.analyze(helpers.hsl_to_rgb(hsl_bg), "darkness"):
+        colors = [helpers.hsl_to_rgb(hsl_bg)] + list(palette.colors)
+        verdicts = LumFilter.mask(colors)
+
+        if not verdicts[0, lum_table.ANALYSES.index("darkness")]:
             palette.background = (0, 0, 0)
         # if (not LumFilter.is_too_bright(palette.foreground)):
             # palette.background = (255, 255, 255)
 
         # Set colors
-        palette.colors = list(filter(lambda c:
-                              not LumFilter.analyze(c, "brightness")
-                              and not LumFilter.analyze(c, "darkness")
-                              and not LumFilter.analyze(c, "saturation"),
-                              palette.colors))
+        palette.select(~verdicts[1:].any(axis=1))
         return palette
 
     def analyze(rgb_color, kind):
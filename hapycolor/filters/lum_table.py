@@ -0,0 +1,295 @@
+"""
+Lookup table of the verdicts of :class:`hapycolor.filters.lum_filter.LumFilter`.
+
+Evaluating the luminosity and saturation hyperplans of a color requires to
+convert it, then to call several interpolation functions. Since the verdicts
+only depend on the color, they are computed once for each color of an rgb
+cube, quantized over `bits` bits per channel, and stored as three bitmasks
+(brightness, darkness and saturation) in a file located next to the hyperplan
+files. Then, filtering a color only costs a lookup in a memory mapped array.
+
+The file's header stores a digest of the hyperplan files used to compute
+it, so that the table is regenerated when one of them changes. If the
+hyperplans' directory is not writable, the table is stored in hapycolor's
+cache directory.
+"""
+import hashlib
+import os
+import pathlib
+import struct
+
+import numpy as np
+from scipy import interpolate
+
+from hapycolor import color
+from hapycolor import config
+from hapycolor import exceptions
+
+
+# magic, version, bits, digest of the hyperplan files
+HEADER = struct.Struct("<4sHH32s")
+MAGIC = b"HLUT"
+VERSION = 1
+
+# Default quantization of the table, see :func:`get_bits`
+BITS = 8
+
+# Number of colors evaluated at once when compiling the table
+CHUNK_SIZE = 1 << 18
+
+# Order of the bitmasks in the table
+ANALYSES = ["brightness", "darkness", "saturation"]
+
+
+def get_bits():
+    """
+    Returns the number of bits per channel of the table, defined by the key
+    `table_bits` of the section `hyperplan` of the configuration file. A
+    value of 0 disables the table.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value is not an integer between 0 and 8.
+    """
+    value = config.ConfigurationManager.load("hyperplan") \
+        .get("table_bits", str(BITS))
+    if not value.isdigit() or int(value) > 8:
+        msg = "Invalid value for 'table_bits': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return int(value)
+
+
+def sources():
+    """
+    Returns the paths of the hyperplan files, with their modification times
+    and sizes.
+    """
+    from hapycolor.filters import lum_filter
+    paths = [lum_filter.hyperplan_file(f) for f in lum_filter.Filter]
+    stats = [os.stat(p) for p in paths]
+    return tuple((p, s.st_mtime_ns, s.st_size) for p, s in zip(paths, stats))
+
+
+def digest(paths):
+    """ Returns the sha256 digest of the content of the provided files """
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            sha.update(f.read())
+    return sha.digest()
+
+
+def table_paths(bits, paths):
+    """
+    Returns the candidate locations of the table: next to the hyperplan
+    files, then in the cache directory.
+    """
+    name = "lum_filter_{}.lut".format(bits)
+    return [pathlib.Path(paths[0]).parent / name,
+            config.get_cache_dir() / name]
+
+
+def rgb_to_hsl(colors):
+    """
+    Vectorized version of :func:`hapycolor.helpers.rgb_to_hsl`, which rounds
+    the hues to integers.
+
+    :arg colors: an `N x 3` array of rgb colors
+    :return: an `N x 3` float array of hsl colors
+    """
+    return color.rgb_to_hsl(colors, decimals=0)
+
+
+def polar_to_cartesian(hsl):
+    """ Vectorized version of :func:`LumFilter.polar_to_cartesian` """
+    theta = np.radians(hsl[:, 0])
+    return hsl[:, 1] * np.cos(theta), hsl[:, 1] * np.sin(theta), hsl[:, 2]
+
+
+def surface(interp):
+    """
+    Returns a vectorized version of an interpolation function generated by
+    :func:`scipy.interpolate.interp2d`. Since the hyperplans are linearly
+    interpolated, the spline is bilinear between its knots, so evaluating it
+    on the grid of its knots, then interpolating linearly this grid, yields
+    the same values. As fitpack does, the points are clamped into the
+    spline's domain.
+    """
+    tx, ty = np.unique(interp.tck[0]), np.unique(interp.tck[1])
+    grid = interpolate.RegularGridInterpolator((ty, tx), interp(tx, ty))
+
+    def evaluate(x, y):
+        points = np.stack([np.clip(y, ty[0], ty[-1]),
+                           np.clip(x, tx[0], tx[-1])], axis=1)
+        return grid(points)
+    return evaluate
+
+
+def enough_saturated(saturation_interp, x, y, z):
+    """
+    Vectorized version of :func:`LumFilter.is_enough_saturated`: the points
+    are grouped by luminosity, and for each group, the circle interpolated
+    from the saturation hyperplan is split in two and compared to the
+    points.
+    """
+    hues = np.radians(list(saturation_interp))
+    half = len(hues) // 2
+    luminosities, inverse = np.unique(z, return_inverse=True)
+    radii = np.array([saturation_interp[h](luminosities)
+                      for h in saturation_interp])
+
+    def half_circle(i, hues, radii):
+        X, Y = radii[:, i] * np.cos(hues), radii[:, i] * np.sin(hues)
+        order = np.argsort(X, kind="mergesort")
+        return X[order], Y[order]
+
+    result = np.empty(len(z), dtype=bool)
+    order = np.argsort(inverse, kind="mergesort")
+    bounds = np.searchsorted(inverse[order], np.arange(len(luminosities) + 1))
+    for i in range(len(luminosities)):
+        indices = order[bounds[i]:bounds[i + 1]]
+        up_x, up_y = half_circle(i, hues[:half], radii[:half])
+        down_x, down_y = half_circle(i, hues[half:], radii[half:])
+        px, py = x[indices], y[indices]
+
+        # If the value cannot be interpolated, it means that the point is
+        # saturated enough
+        outside = (px < up_x[0]) | (px > up_x[-1]) \
+            | (px < down_x[0]) | (px > down_x[-1])
+        above_upper_half = np.interp(px, up_x, up_y) > py
+        above_bottom_half = np.interp(px, down_x, down_y) > py
+        result[indices] = outside | ~(above_bottom_half ^ above_upper_half)
+    return result
+
+
+def evaluate(colors):
+    """
+    Evaluates the verdicts of :func:`LumFilter.analyze` for an array of
+    colors. :func:`LumFilter.initialization` must have been called.
+
+    :arg colors: an `N x 3` array of rgb colors
+    :return: an `N x 3` boolean array, whose columns are the results of the
+        analyses defined in :data:`ANALYSES`
+    """
+    from hapycolor.filters.lum_filter import LumFilter
+    x, y, z = polar_to_cartesian(rgb_to_hsl(colors))
+    bright = (z > LumFilter.bright_min) \
+        | (z > surface(LumFilter.bright_interp)(x, y))
+    dark = (z < LumFilter.dark_max) \
+        | (z < surface(LumFilter.dark_interp)(x, y))
+    unsaturated = ~enough_saturated(LumFilter.saturation_interp, x, y, z)
+    return np.stack([bright, dark, unsaturated], axis=1)
+
+
+def cube(bits):
+    """
+    Returns the centers of the cells of the rgb cube quantized over `bits`
+    bits per channel, ordered by their index in the table.
+    """
+    shift = 8 - bits
+    values = (np.arange(1 << bits, dtype=np.uint8) << shift) \
+        + ((1 << shift) >> 1)
+    r, g, b = np.meshgrid(values, values, values, indexing="ij")
+    return np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+
+class LumTable:
+    """
+    The verdicts of :class:`LumFilter` over the rgb cube, see the module's
+    documentation.
+
+    :arg bits: the number of bits per channel of the quantized cube
+    :arg masks: a `3 x 2^(3 bits) / 8` uint8 array, containing the packed
+        bitmasks of each analysis
+    :arg sources: the hyperplan files (see :func:`sources`) used to
+        compute the table
+    """
+    def __init__(self, bits, masks, sources):
+        self.bits = bits
+        self.masks = masks
+        self.sources = sources
+
+    @staticmethod
+    def compile(bits):
+        """
+        Computes the verdicts of the filter for each color of the cube.
+        """
+        from hapycolor.filters.lum_filter import LumFilter
+        LumFilter.initialization()
+        colors = cube(bits)
+        masks = np.empty((len(ANALYSES), len(colors) // 8), dtype=np.uint8)
+        for start in range(0, len(colors), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            verdicts = evaluate(colors[chunk])
+            masks[:, start // 8:(start + CHUNK_SIZE) // 8] = \
+                np.packbits(verdicts.T, axis=1)
+        return masks
+
+    @staticmethod
+    def load(bits=None):
+        """
+        Loads the table from the disk, memory mapped, and regenerates it if
+        it is missing or if it has been computed from other hyperplan files.
+        """
+        bits = get_bits() if bits is None else bits
+        files = sources()
+        paths = [p for p, _, _ in files]
+        header = HEADER.pack(MAGIC, VERSION, bits, digest(paths))
+        shape = (len(ANALYSES), (1 << (3 * bits)) // 8)
+
+        candidates = table_paths(bits, paths)
+        for path in candidates:
+            try:
+                with open(path.as_posix(), "rb") as f:
+                    if f.read(HEADER.size) != header:
+                        continue
+                masks = np.memmap(path.as_posix(), dtype=np.uint8, mode="r",
+                                  offset=HEADER.size, shape=shape)
+                return LumTable(bits, masks, files)
+            except (OSError, ValueError):
+                continue
+
+        print("Compiling the lookup table of the luminosity filter")
+        masks = LumTable.compile(bits)
+        for path in candidates:
+            try:
+                LumTable.save(path, header, masks)
+                break
+            except OSError:
+                continue
+        return LumTable(bits, masks, files)
+
+    @staticmethod
+    def save(path, header, masks):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        with open(tmp.as_posix(), "wb") as f:
+            f.write(header)
+            f.write(masks.tobytes())
+        os.replace(tmp.as_posix(), path.as_posix())
+
+    def is_valid(self):
+        """
+        Returns `True` if the hyperplan files did not change since the table
+        has been loaded.
+        """
+        try:
+            return sources() == self.sources
+        except OSError:
+            return False
+
+    def indices(self, colors):
+        colors = np.asarray(colors, dtype=np.int64) >> (8 - self.bits)
+        return (colors[:, 0] << (2 * self.bits)) \
+            | (colors[:, 1] << self.bits) | colors[:, 2]
+
+    def __call__(self, colors):
+        """
+        Returns the verdicts of the filter for the provided colors.
+
+        :arg colors: an `N x 3` array of rgb colors
+        :return: an `N x 3` boolean array, whose columns are the results of
+            the analyses defined in :data:`ANALYSES`
+        """
+        indices = self.indices(colors)
+        bytes_ = self.masks[:, indices >> 3]
+        return ((bytes_ >> (7 - (indices & 7))) & 1).astype(bool).T
@@ -1,28 +1,258 @@
+import collections
+import enum
+import time
 from . import base
-from colormath.color_conversions import convert_color
-from colormath.color_diff import delta_e_cie2000
-from colormath.color_objects import LabColor, sRGBColor
+from . import independent_set
+from hapycolor import color
+from hapycolor import config
+from hapycolor import exceptions
+from hapycolor import helpers
 import networkx as nx
-import networkx.algorithms.shortest_paths.generic as algorithms
+import numpy as np
+from scipy.sparse import csgraph
+
+
+# Maximal number of distances computed at once by
+# :func:`Reducer.distance_matrix`
+CHUNK_SIZE = 1 << 18
+
+
+def get_target_size():
+    """
+    Returns the minimal number of colors kept by the reducer, which then
+    tunes its threshold (see :func:`Reducer.reduce_to_size`), or `None` to
+    keep the constant threshold. It is defined by
+    :attr:`Reducer.target_size`, or else by the key `target_size` of the
+    section `reducer` of the configuration file, where an empty value keeps
+    the constant threshold.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value is not a positive integer.
+    """
+    if Reducer.target_size is not None:
+        return Reducer.target_size
+    try:
+        value = config.ConfigurationManager.load("reducer") \
+                .get("target_size", "")
+    except exceptions.InvalidConfigKeyError:
+        value = ""
+    if not value:
+        return None
+    if not value.isdigit() or int(value) == 0:
+        msg = "Invalid value for 'target_size': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return int(value)
+
+
+def rgb_to_lab(colors):
+    """
+    Vectorized conversion of rgb colors to the Lab space, performed as
+    :func:`Reducer.distance` does: like colormath when the channels of an
+    `sRGBColor` are not upscaled, so the values are not divided by 255.
+
+    :arg colors: an `N x 3` array of rgb colors
+    :return: an `N x 3` float array of Lab colors
+    :see: :func:`hapycolor.color.srgb_to_lab`
+    """
+    return color.srgb_to_lab(colors)
+
+
+def cie2000(lab_1, lab_2):
+    """
+    Vectorized CIEDE2000 distance between two arrays of Lab colors, whose
+    shapes are broadcast together. It follows colormath's implementation,
+    hence `cie2000(lab_1[i], lab_2[j])` matches
+    `Reducer.distance(colors[i], colors[j])`.
+
+    :arg lab_1: an `... x 3` array of Lab colors
+    :arg lab_2: an `... x 3` array of Lab colors
+    """
+    L1, a1, b1 = np.moveaxis(np.asarray(lab_1, dtype=np.float64), -1, 0)
+    L2, a2, b2 = np.moveaxis(np.asarray(lab_2, dtype=np.float64), -1, 0)
+
+    avg_Lp = (L1 + L2) / 2.0
+    C1 = np.sqrt(a1 ** 2 + b1 ** 2)
+    C2 = np.sqrt(a2 ** 2 + b2 ** 2)
+    avg_C1_C2 = (C1 + C2) / 2.0
+    G = 0.5 * (1 - np.sqrt(avg_C1_C2 ** 7.0
+                           / (avg_C1_C2 ** 7.0 + 25.0 ** 7.0)))
+
+    a1p = (1.0 + G) * a1
+    a2p = (1.0 + G) * a2
+    C1p = np.sqrt(a1p ** 2 + b1 ** 2)
+    C2p = np.sqrt(a2p ** 2 + b2 ** 2)
+    avg_C1p_C2p = (C1p + C2p) / 2.0
+
+    h1p = np.degrees(np.arctan2(b1, a1p))
+    h1p = h1p + (h1p < 0) * 360
+    h2p = np.degrees(np.arctan2(b2, a2p))
+    h2p = h2p + (h2p < 0) * 360
+
+    avg_Hp = (((np.fabs(h1p - h2p) > 180) * 360) + h1p + h2p) / 2.0
+    T = 1 - 0.17 * np.cos(np.radians(avg_Hp - 30)) \
+        + 0.24 * np.cos(np.radians(2 * avg_Hp)) \
+        + 0.32 * np.cos(np.radians(3 * avg_Hp + 6)) \
+        - 0.2 * np.cos(np.radians(4 * avg_Hp - 63))
+
+    diff_h2p_h1p = h2p - h1p
+    delta_hp = diff_h2p_h1p + (np.fabs(diff_h2p_h1p) > 180) * 360
+    delta_hp = delta_hp - (h2p > h1p) * 720
+
+    delta_Lp = L2 - L1
+    delta_Cp = C2p - C1p
+    delta_Hp = 2 * np.sqrt(C2p * C1p) * np.sin(np.radians(delta_hp) / 2.0)
+
+    S_L = 1 + ((0.015 * (avg_Lp - 50) ** 2)
+               / np.sqrt(20 + (avg_Lp - 50) ** 2.0))
+    S_C = 1 + 0.045 * avg_C1p_C2p
+    S_H = 1 + 0.015 * avg_C1p_C2p * T
+
+    delta_ro = 30 * np.exp(-(((avg_Hp - 275) / 25) ** 2.0))
+    R_C = np.sqrt(avg_C1p_C2p ** 7.0 / (avg_C1p_C2p ** 7.0 + 25.0 ** 7.0))
+    R_T = -2 * R_C * np.sin(2 * np.radians(delta_ro))
+
+    return np.sqrt((delta_Lp / S_L) ** 2 + (delta_Cp / S_C) ** 2
+                   + (delta_Hp / S_H) ** 2
+                   + R_T * (delta_Cp / S_C) * (delta_Hp / S_H))
+
+
+def lightness_windows(lab, threshold):
+    """
+    Returns, for each Lab color, the half width of the window of lightness
+    containing every color closer than `threshold`.
+
+    Since the chroma and hue terms of CIEDE2000 cannot make the distance
+    smaller than `|dL| / S_L`, and since
+    `S_L <= 1 + 0.015 |L_mean - 50| <= 1 + 0.015 (|L - 50| + |dL| / 2)`,
+    two colors closer than `threshold` satisfy
+    `|dL| < threshold (1 + 0.015 |L - 50|) / (1 - 0.0075 threshold)`.
+    """
+    slope = 0.0075 * threshold
+    if slope >= 1:
+        return np.full(len(lab), np.inf)
+    return threshold * (1 + 0.015 * np.abs(lab[:, 0] - 50)) / (1 - slope)
+
+
+def sweep_pairs(lab, threshold):
+    """
+    Returns the couples of colors closer than `threshold`, without computing
+    the whole distance matrix: the colors are sorted by lightness, and each
+    color is only compared to the following colors of its lightness window
+    (see :func:`lightness_windows`), by blocks of rows of at most about
+    :data:`CHUNK_SIZE` distances.
+
+    :arg lab: an `N x 3` array of Lab colors
+    :return: two arrays of indices `i` and `j`, where `i < j`
+    """
+    n = len(lab)
+    order = np.argsort(lab[:, 0], kind="mergesort")
+    lightness = lab[order, 0]
+    high = lightness + lightness_windows(lab[order], threshold)
+
+    rows, columns = [], []
+    start = 0
+    while start < n:
+        width = np.searchsorted(lightness, high[start], side="right") - start
+        size = max(1, CHUNK_SIZE // max(width, 1))
+        while True:
+            stop = min(n, start + size)
+            end = np.searchsorted(lightness, high[start:stop].max(),
+                                  side="right")
+            # The windows of the following rows may be wider
+            if size == 1 or (stop - start) * (end - start) <= CHUNK_SIZE:
+                break
+            size //= 2
+
+        # Indices of the couples, the smallest one first
+        i = order[start:stop, None]
+        j = order[None, start:end]
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        distances = cie2000(lab[i], lab[j])
+        upper = np.arange(start, stop)[:, None] < np.arange(start, end)[None]
+        close = upper & (distances < threshold)
+        rows.append(i[close])
+        columns.append(j[close])
+        start = stop
+
+    if not rows:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    return np.concatenate(rows), np.concatenate(columns)
+
+
+def components(adjacency):
+    """
+    Returns the indices of the nodes of each connected component of a graph
+    defined by its symmetric adjacency matrix, ordered as
+    :func:`Reducer.find_subgraphs` orders them: by their first node.
+    """
+    count, labels = csgraph.connected_components(adjacency, directed=False)
+    order = np.argsort(labels, kind="mergesort")
+    sizes = np.bincount(labels, minlength=count)
+    groups = np.split(order, np.cumsum(sizes)[:-1])
+    return sorted(groups, key=lambda group: group[0])
+
+
+class Neighbours(enum.Enum):
+    """
+    Methods searching the couples of colors that are too close, see
+    :func:`Reducer.close_pairs`.
+    """
+    MATRIX = "matrix"
+    SWEEP = "sweep"
 
 
 class Reducer(base.Filter):
     threshold = 20
 
+    # Method searching the neighbours of the colors
+    neighbours = Neighbours.MATRIX
+
+    # If defined, the threshold is tuned to keep at least this number of
+    # colors, see :func:`Reducer.reduce_to_size`. Otherwise, it is defined
+    # by the configuration file, see :func:`get_target_size`
+    target_size = None
+
+    # Settings of the search of the largest set of colors of a component,
+    # see :func:`hapycolor.filters.independent_set.maximum_independent_set`
+    exact_size = independent_set.EXACT_SIZE
+    time_budget = independent_set.TIME_BUDGET
+
     @staticmethod
     def distance(c_1, c_2):
         """
         Returns the CIEDE2000 distance of the two provided colors.
 
-        :arg c_1: a tuple representing an hsl color
-        :arg c_2: a tuple representing an hsl color
+        :arg c_1: a tuple representing an rgb color
+        :arg c_2: a tuple representing an rgb color
         :see: `<https://en.wikipedia.org/wiki/Color_difference/>`_
         """
-        rgb1 = sRGBColor(c_1[0], c_1[1], c_1[2])
-        rgb2 = sRGBColor(c_2[0], c_2[1], c_2[2])
-        lab1 = convert_color(rgb1, LabColor)
-        lab2 = convert_color(rgb2, LabColor)
-        return delta_e_cie2000(lab1, lab2)
+        return float(cie2000(*rgb_to_lab([c_1, c_2])))
+
+    @staticmethod
+    def distance_matrix(colors):
+        """
+        Returns the matrix of the CIEDE2000 distances between each couple of
+        colors: the colors are converted to the Lab space once, then the
+        distances are computed by chunks of rows, to bound the memory used
+        by the intermediate arrays.
+
+        As :func:`Reducer.distance`, colormath's implementation is slightly
+        asymmetric, so only the upper triangle, which holds the distance
+        `Reducer.distance(colors[i], colors[j])` for `i < j`, is computed and
+        then mirrored.
+
+        :arg colors: a list of rgb tuples
+        :return: an `N x N` float array
+        """
+        lab = rgb_to_lab(np.asarray(colors).reshape(-1, 3))
+        n = len(lab)
+        matrix = np.zeros((n, n))
+        rows = max(1, CHUNK_SIZE // max(n, 1))
+        for start in range(0, n, rows):
+            stop = min(start + rows, n)
+            matrix[start:stop] = cie2000(lab[start:stop, None], lab[None])
+        matrix = np.triu(matrix, 1)
+        return matrix + matrix.T
 
     @staticmethod
     def apply(palette):
@@ -38,26 +268,134 @@ class Reducer(base.Filter):
         :return: the output palette
         :rtype: an instance of :class:`hapycolor.palette.Palette`
         """
-        reduced_colors = Reducer.reduce(palette.colors)
-        palette.colors = reduced_colors
+        target_size = get_target_size()
+        if target_size is not None:
+            reduced_colors, threshold = Reducer.reduce_to_size(
+                    palette.colors, target_size)
+            palette.metadata["threshold"] = threshold
+        else:
+            reduced_colors = Reducer.reduce(palette.colors)
+        # The kept colors are selected, so that their weights are kept too
+        positions = {c: i for i, c in enumerate(palette.colors)}
+        palette.select([positions[c] for c in reduced_colors])
         return palette
 
     @staticmethod
     def reduce(colors):
+        """
+        Keeps the largest independent set of each component of the graph of
+        the colors. The components share a single time budget,
+        :attr:`Reducer.time_budget`: once it is exhausted, the remaining
+        components are solved by the greedy heuristic and its local
+        improvement only.
+        """
         global_graph = Reducer.generate_graph(colors)
         assert len(global_graph) == len(colors)
         graphs = Reducer.find_subgraphs(global_graph)
+        deadline = time.monotonic() + Reducer.time_budget
         reduced_colors = []
         for graph in graphs:
-            inverted_graph = nx.Graph()
-            inverted_graph.add_edges_from(nx.non_edges(graph))
-            reduced_graph = Reducer.get_maximum_clique(inverted_graph)
-            if not reduced_graph:
-                reduced_colors.append(list(graph.nodes)[0])
-            else:
-                reduced_colors.extend(reduced_graph)
+            reduced_colors.extend(Reducer.independent_set(graph, deadline))
         return reduced_colors
 
+    @staticmethod
+    def reduce_to_size(colors, target_size):
+        """
+        Reduces the colors with the largest threshold that keeps at least
+        `target_size` colors, or keeps every color if there are not enough
+        of them.
+
+        The distances are computed once and sorted, so that each threshold
+        probed by the binary search only selects the couples closer than it.
+        The independent sets of the components that did not change between
+        two probes are reused. The probes share a single time budget,
+        :attr:`Reducer.time_budget`: once it is exhausted, the remaining
+        components are solved by the greedy heuristic and its local
+        improvement only.
+
+        :arg colors: a list of rgb tuples
+        :arg target_size: the minimal number of colors to keep
+        :return: a tuple containing the reduced colors, and the threshold
+            producing them with :func:`Reducer.reduce`
+        """
+        n = len(colors)
+        rows, columns = np.triu_indices(n, 1)
+        distances = Reducer.distances(colors)[rows, columns]
+        order = np.argsort(distances, kind="mergesort")
+        rows, columns, distances = \
+            rows[order], columns[order], distances[order]
+
+        # Each threshold selects the couples whose distances are lower, so
+        # only the distances and a value above them need to be probed
+        thresholds = np.unique(np.append(distances, 0))
+        if len(distances):
+            thresholds = np.append(thresholds, distances[-1] + 1)
+        solutions = {}
+        deadline = time.monotonic() + Reducer.time_budget
+
+        def reduce(threshold):
+            # Same components and independent sets as :func:`Reducer.reduce`,
+            # computed from the adjacency matrix rather than a graph
+            count = np.searchsorted(distances, threshold, side="left")
+            adjacency = np.zeros((n, n), dtype=bool)
+            adjacency[rows[:count], columns[:count]] = True
+            adjacency |= adjacency.T
+            reduced = []
+            for component in components(adjacency):
+                matrix = adjacency[np.ix_(component, component)]
+                key = (tuple(component), int(matrix.sum()))
+                if key not in solutions:
+                    masks = independent_set.matrix_neighbourhoods(matrix)
+                    solution = independent_set.solve(masks, deadline,
+                                                     Reducer.exact_size)
+                    solutions[key] = [colors[component[i]] for i in
+                                      independent_set.nodes_of(solution)]
+                reduced.extend(solutions[key])
+            return reduced
+
+        low, high = 0, len(thresholds) - 1
+        best = reduce(thresholds[low])
+        while low < high:
+            middle = (low + high + 1) // 2
+            reduced = reduce(thresholds[middle])
+            if len(reduced) >= target_size:
+                low, best = middle, reduced
+            else:
+                high = middle - 1
+        return best, float(thresholds[low])
+
+    @staticmethod
+    def distances(colors):
+        """
+        Returns the matrix of the distances between the colors, see
+        :func:`Reducer.distance_matrix`. If the colors are not rgb tuples,
+        the distances are computed with :func:`Reducer.distance`.
+        """
+        if all(helpers.can_be_rgb(c) for c in colors):
+            return Reducer.distance_matrix(colors)
+        matrix = np.zeros((len(colors), len(colors)))
+        for i, c_1 in enumerate(colors[:-1]):
+            for j, c_2 in enumerate(colors[i+1:], i + 1):
+                matrix[i, j] = matrix[j, i] = Reducer.distance(c_1, c_2)
+        return matrix
+
+    @staticmethod
+    def independent_set(graph, deadline=None):
+        """
+        Returns the largest set of colors of a graph generated by
+        :func:`Reducer.generate_graph`, such that no couple of colors of the
+        set are neighbours, i.e. too close. Graphs that are larger than
+        :attr:`Reducer.exact_size` or that cannot be solved exactly before
+        the deadline are solved heuristically.
+
+        :arg deadline: the time, as returned by :func:`time.monotonic`, after
+            which the search stops, shared by the components of a palette;
+            by default, :attr:`Reducer.time_budget` seconds from now
+        """
+        return independent_set.maximum_independent_set(
+                graph, Reducer.exact_size, Reducer.time_budget,
+                deadline=deadline)
+
     @staticmethod
     def generate_graph(colors):
         """
@@ -71,12 +409,38 @@ class Reducer(base.Filter):
         for c in colors:
             graph.add_node(c)
 
-        for i, c_1 in enumerate(colors[:-1]):
-            for c_2 in colors[i+1:]:
-                if Reducer.distance(c_1, c_2) < Reducer.threshold:
-                    graph.add_edge(c_1, c_2)
+        if not all(helpers.can_be_rgb(c) for c in colors):
+            # The nodes are compared with a custom distance
+            for i, c_1 in enumerate(colors[:-1]):
+                for c_2 in colors[i+1:]:
+                    if Reducer.distance(c_1, c_2) < Reducer.threshold:
+                        graph.add_edge(c_1, c_2)
+            return graph
+
+        rows, columns = Reducer.close_pairs(colors)
+        graph.add_edges_from((colors[i], colors[j])
+                             for i, j in zip(rows, columns))
         return graph
 
+    @staticmethod
+    def close_pairs(colors):
+        """
+        Returns the indices of the couples of colors whose distance is lower
+        than the threshold, computed with the method defined by
+        :attr:`Reducer.neighbours`: either the whole distance matrix, or a
+        sweep over the colors sorted by lightness, which only computes the
+        distances of the couples of similar lightness and whose memory usage
+        does not grow quadratically.
+
+        :arg colors: a list of rgb tuples
+        :return: two arrays of indices `i` and `j`, where `i < j`
+        """
+        if Reducer.neighbours == Neighbours.SWEEP:
+            lab = rgb_to_lab(np.asarray(colors).reshape(-1, 3))
+            return sweep_pairs(lab, Reducer.threshold)
+        close = Reducer.distance_matrix(colors) < Reducer.threshold
+        return np.nonzero(np.triu(close, 1))
+
     @staticmethod
     def find_subgraphs(graph):
         """
@@ -85,20 +449,37 @@ class Reducer(base.Filter):
         (graphs) where for each couple of nodes of a graph, it exists a path
         that connects them. Furthermore, given two nodes of two differents
         subsets, there are no paths connecting them.
+
+        The components are found with a union-find over the graph's edges,
+        and each subgraph keeps the edges of the provided graph, so no
+        distance is computed again. The subgraphs are ordered by their first
+        node in the provided graph.
         """
-        subgraphs = []
+        parents = {node: node for node in graph}
+
+        def find(node):
+            while parents[node] != node:
+                # Path halving
+                parents[node] = parents[parents[node]]
+                node = parents[node]
+            return node
 
-        while graph:
-            connected = []
-            graph_iter = iter(graph)
-            n_1 = next(graph_iter)
-            connected.append(n_1)
-            for n_2 in graph_iter:
-                if algorithms.has_path(graph, n_1, n_2):
-                    connected.append(n_2)
-            for node in connected:
-                graph.remove_node(node)
-            subgraphs.append(Reducer.generate_graph(connected))
+        for n_1, n_2 in graph.edges:
+            root_1, root_2 = find(n_1), find(n_2)
+            if root_1 != root_2:
+                parents[root_2] = root_1
+
+        components = collections.OrderedDict()
+        for node in graph:
+            components.setdefault(find(node), []).append(node)
+        subgraphs = []
+        for nodes in components.values():
+            # Unlike a copy of `graph.subgraph`, whose nodes are iterated in
+            # the order of a set, the nodes keep their order in the graph
+            subgraph = nx.Graph()
+            subgraph.add_nodes_from(nodes)
+            subgraph.add_edges_from(graph.edges(nodes))
+            subgraphs.append(subgraph)
         return subgraphs
 
     def get_maximum_clique(graph):
@@ -109,8 +490,8 @@ class Reducer(base.Filter):
         CIEDE2000 distance and when this value is larger than the provided
         threshold, the colors are considered sufficently appart.
 
-        To improve the performances of the algorithm, if the graph contains
-        more than 60 colors, it will be reduced to this value.
+        A clique of a graph is an independent set of its complement, see
+        :func:`Reducer.independent_set`.
 
         :arg graph: A hash table mapping a color to a :class:Node. It
             In order to optimize the algorithm, only connected graphs should be
@@ -119,12 +500,4 @@ class Reducer(base.Filter):
         :see: :func:`Reducer.distance`
         :see: `<https://en.wikipedia.org/wiki/Color_difference/>`_
         """
-        # if len(graph) <= 1:
-        #     return [n.color for n in graph]
-
-        graph = graph.subgraph(list(graph.nodes)[:60])
-
-        cliques = list(nx.find_cliques(graph))
-        if not cliques:
-            return []
-        return max(cliques, key=len)
+        return Reducer.independent_set(nx.complement(graph))
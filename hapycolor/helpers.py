@@ -1,23 +1,33 @@
 import json
 import re
 import readline
+from hapycolor import color
 from hapycolor import exceptions
 import os
 import pathlib
-from colormath.color_conversions import convert_color
-from colormath.color_objects import LabColor, sRGBColor
+from colormath.color_objects import LabColor
 
 """ Utilitary methods to convert color types  """
 
 
 def rgb_to_lab(c):
-    rgb = sRGBColor(c[0], c[1], c[2])
-    return convert_color(rgb, LabColor)
+    """
+    Converts an rgb color to a colormath's `LabColor`. As colormath does when
+    an `sRGBColor` is not upscaled, the channels are not divided by 255.
+
+    :see: :func:`hapycolor.color.srgb_to_lab`
+    """
+    return LabColor(*color.srgb_to_lab(c).tolist())
 
 
 def lab_to_rgb(lab_c):
-    c = convert_color(lab_c, sRGBColor)
-    return (round(c.rgb_r), round(c.rgb_g), round(c.rgb_b))
+    """
+    Converts a colormath's `LabColor`, or a Lab tuple, created by
+    :func:`rgb_to_lab`, back to an rgb tuple.
+    """
+    if isinstance(lab_c, LabColor):
+        lab_c = lab_c.get_value_tuple()
+    return tuple(int(round(c)) for c in color.lab_to_srgb(lab_c).tolist())
 
 
 def bold(string):
@@ -72,61 +82,25 @@ def hsl_to_hex(colhsl):
 
 
 def rgb_to_hsl(colrgb):
+    """
+    Converts an rgb color to an hsl tuple, whose hue is rounded to an integer.
+
+    :see: :func:`hapycolor.color.rgb_to_hsl`
+    """
     if not can_be_rgb(colrgb):
         raise exceptions.ColorFormatError("The input color: " + str(colrgb)
                                           + " must be defined in the rgb base")
-    r = colrgb[0] / 255.
-    g = colrgb[1] / 255.
-    b = colrgb[2] / 255.
-    maxrgb = float(max(r, g, b))
-    minrgb = float(min(r, g, b))
-    luminosity = (minrgb + maxrgb) / 2
-    if minrgb == maxrgb:
-        return 0, 0.0, luminosity
-
-    if luminosity <= 0.5:
-        s = (maxrgb - minrgb) / (maxrgb + minrgb)
-    else:
-        s = (maxrgb - minrgb) / (2 - maxrgb - minrgb)
-
-    if maxrgb == r:
-        h = (g - b) / (maxrgb - minrgb)
-    elif maxrgb == g:
-        h = 2 + (b - r) / (maxrgb - minrgb)
-    else:
-        h = 4 + (r - g) / (maxrgb - minrgb)
-    h = int(round(h * 60)) % 360
-    return h, s, luminosity
+    h, s, luminosity = color.rgb_to_hsl(colrgb, decimals=0).tolist()
+    return int(h), s, luminosity
 
 
 def hsl_to_rgb(colhsl):
-    h, s, lum = colhsl
-    h /= 360.
-    if s == 0:
-        return (int(round(255 * lum)),) * 3
-    if lum < 0.5:
-        tmp1 = lum * (1 + s)
-    else:
-        tmp1 = lum + s - (lum * s)
-    tmp2 = 2*lum - tmp1
-    tmpr = h + 1/3. if h <= 2/3. else h - 2/3.
-    tmpg = h
-    tmpb = h - 1/3. if h >= 1/3. else h + 2/3.
-    return (_tmpcolor(tmpr, tmp1, tmp2),
-            _tmpcolor(tmpg, tmp1, tmp2),
-            _tmpcolor(tmpb, tmp1, tmp2))
-
-
-def _tmpcolor(tmpc, tmp1, tmp2):
-    if 6 * tmpc < 1:
-        c = tmp2 + tmpc*6*(tmp1 - tmp2)
-    elif 2 * tmpc < 1:
-        c = tmp1
-    elif 3 * tmpc < 2:
-        c = tmp2 + (tmp1 - tmp2)*(2/3. - tmpc) * 6
-    else:
-        c = tmp2
-    return int(round(255 * c))
+    """
+    Converts an hsl color to an rgb tuple of integers.
+
+    :see: :func:`hapycolor.color.hsl_to_rgb`
+    """
+    return tuple(int(round(c)) for c in color.hsl_to_rgb(colhsl).tolist())
 
 
 def load_json(file_path):
@@ -1,5 +1,7 @@
 from hapycolor import helpers
 from hapycolor import exceptions
+import json
+import numpy as np
 
 
 class Palette:
@@ -9,15 +11,28 @@ class Palette:
     - foreground
     - background
     - colors: an unordered list of colors. Cannot be empty
+    - weights: optionally, the population of each color in the source image,
+      as a fraction of its pixels
     - others: targets willing to enrich the palette can do this through this
       dictionary
-     """
+    - metadata: information about how the palette has been generated, for
+      instance, the scale factor applied to the source image before the
+      extraction
+
+    The colors are stored in an `N x 3` uint8 array, validated once when they
+    are assigned, and exposed without copy by :attr:`array`. The attribute
+    :attr:`colors` returns them as a list of rgb tuples, built on its first
+    access, for the targets.
+    """
+    __slots__ = ["_foreground", "_background", "_array", "_weights",
+                 "_tuples", "other", "metadata"]
 
-    def __init__(self):
+    def __init__(self, colors=None, weights=None):
         self._foreground = None
         self._background = None
-        self._colors = None
-        self.current = None
+        self._array = None
+        self._weights = None
+        self._tuples = None
 
         # This attribute is meant to be used by Target classes
         # when dealing with a configuration file (through the ConfigEditor)
@@ -29,6 +44,13 @@ class Palette:
         # 'yabar-foreground' and the color to be used as foreground.
         self.other = {}
 
+        self.metadata = {}
+
+        if colors is not None:
+            self.colors = colors
+        if weights is not None:
+            self.weights = weights
+
     @property
     def foreground(self):
         return self._foreground
@@ -53,21 +75,89 @@ class Palette:
 
     @property
     def colors(self):
-        return self._colors
+        if self._tuples is None and self._array is not None:
+            self._tuples = [tuple(c) for c in self._array.tolist()]
+        return self._tuples
+
+    @colors.setter
+    def colors(self, rgb_colors):
+        """
+        Assigns a non empty list of rgb tuples, or an `N x 3` integer array,
+        and clears the weights.
+        """
+        self._array = Palette.to_array(rgb_colors)
+        self._weights = None
+        self._tuples = None
+
+    @property
+    def array(self):
+        """ A read only `N x 3` uint8 view of the colors """
+        if self._array is None:
+            return None
+        view = self._array.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def weights(self):
+        """ A read only view of the colors' weights, or `None` """
+        if self._weights is None:
+            return None
+        view = self._weights.view()
+        view.flags.writeable = False
+        return view
+
+    @weights.setter
+    def weights(self, weights):
+        if weights is None:
+            self._weights = None
+            return
+        weights = np.array(weights, dtype=np.float64)
+        if self._array is None or weights.shape != (len(self._array),) \
+                or not np.isfinite(weights).all() or (weights < 0).any():
+            msg = "The weights must be one positive number for each color"
+            raise exceptions.PaletteFormatError(msg)
+        self._weights = weights
+
+    @staticmethod
+    def to_array(rgb_colors):
+        """
+        Returns a copy of the colors as an `N x 3` uint8 array.
+
+        :arg rgb_colors: a non empty list of rgb tuples, or an `N x 3`
+            integer array
+        :raise: :class:`hapycolor.exceptions.ColorFormatError` if the colors
+            are not valid rgb colors
+        """
+        msg = "The color must be defined in the rgb base"
+        if not isinstance(rgb_colors, (list, np.ndarray)) \
+                or len(rgb_colors) == 0:
+            raise exceptions.ColorFormatError(msg)
+        try:
+            array = np.asarray(rgb_colors)
+        except ValueError:
+            raise exceptions.ColorFormatError(msg)
+        if array.ndim != 2 or array.shape[1] != 3 \
+                or not np.issubdtype(array.dtype, np.integer) \
+                or array.min() < 0 or array.max() > 255:
+            raise exceptions.ColorFormatError(msg)
+        return array.astype(np.uint8)
+
+    def select(self, indices):
+        """
+        Keeps the colors, and their weights, designated by an array of
+        indices or a boolean mask.
+        """
+        weights = self._weights
+        self.colors = self._array[indices]
+        if weights is not None:
+            self._weights = weights[indices]
 
     @property
     def hexcolors(self):
         return (helpers.rgb_to_hex(self.foreground),
                 helpers.rgb_to_hex(self.background),
-                [helpers.rgb_to_hex(c) for c in self.colors])
-
-    @colors.setter
-    def colors(self, rgb_colors):
-        if not isinstance(rgb_colors, list) or not rgb_colors \
-                or not all([helpers.can_be_rgb(c) for c in rgb_colors]):
-            raise exceptions.ColorFormatError("The color must be defined"
-                                              + " in the rgb base")
-        self._colors = rgb_colors
+                ['#%02x%02x%02x' % c for c in self.colors])
 
     def to_json(self, file_name):
         data = {
@@ -75,11 +165,20 @@ class Palette:
                 "background": self.background,
                 "colors": self.colors
                }
+        if self._weights is not None:
+            data["weights"] = self._weights.tolist()
         print("Saving palette to: ", file_name)
         helpers.save_json(file_name, data)
 
     def from_json(json_file):
-        json_palette = helpers.load_json(json_file)
+        return Palette.from_dict(helpers.load_json(json_file))
+
+    def from_dict(json_palette):
+        """
+        Builds a palette from a dictionary holding its foreground, its
+        background, its colors and optionally their weights, as written by
+        :meth:`to_json`.
+        """
         if "foreground" not in json_palette or \
                 "background" not in json_palette or \
                 "colors" not in json_palette:
@@ -91,24 +190,61 @@ class Palette:
         palette.foreground = tuple(json_palette["foreground"])
         palette.background = tuple(json_palette["background"])
         palette.colors = [tuple(c) for c in json_palette["colors"]]
+        palette.weights = json_palette.get("weights")
         return palette
 
+    def __len__(self):
+        return 0 if self._array is None else len(self._array)
+
     def __iter__(self):
+        return PaletteIterator(self)
+
+    def is_initialized(self):
+        """ Returns 'True' if the palette has been correctly initialized,
+            else 'False' """
+        return (helpers.can_be_rgb(self._foreground)
+                and helpers.can_be_rgb(self._background)
+                and self._array is not None
+                and len(self._array) != 0)
+
+
+class PaletteIterator:
+    """
+    Endless iterator over the colors of a palette, which restarts from the
+    first color once the last one has been returned.
+    """
+    __slots__ = ["palette", "current"]
+
+    def __init__(self, palette):
+        self.palette = palette
         self.current = 0
+
+    def __iter__(self):
         return self
 
     def __next__(self):
-        color = self._colors[self.current % len(self._colors)]
+        colors = self.palette.colors
+        color = colors[self.current % len(colors)]
         self.current += 1
         return color
 
-    def is_initialized(self):
-        """ Returns 'True' if the palette has been correctly initialized,
-            else 'False' """
-        return (self._background.__class__ == tuple
-                and helpers.can_be_rgb(self._background)
-                and self._background.__class__ == tuple
-                and helpers.can_be_rgb(self._background)
-                and self._colors.__class__ == list
-                and len(self._colors) != 0
-                and all([helpers.can_be_rgb(c) for c in self._colors]))
+
+def read_jsonl(jsonl_file):
+    """
+    Reads lazily, line by line, a json-lines file written by `--dir` with
+    `--jsonl`, and yields a tuple holding the record and the palette of each
+    image. The records of the images which could not be processed, which
+    have no palette, are skipped.
+    """
+    with open(jsonl_file) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                msg = "ERROR: Invalid json record at line {} of {}".format(
+                    number, jsonl_file)
+                raise exceptions.PaletteFormatError(msg)
+            if "error" not in record:
+                yield record, Palette.from_dict(record)
@@ -1,11 +1,43 @@
 from hapycolor import palette as pltte
+from hapycolor.color import tables
 from hapycolor import helpers
 from hapycolor import exceptions
+from hapycolor import config
 
+from PIL import Image
+import enum
+import itertools
+import math
+import numpy as np
 import pathlib
 import re
 import subprocess as sp
-from ast import literal_eval as make_tuple
+
+
+# A pixel of ImageMagick's `txt:-` format, e.g.
+# `0,0: (255,255,255)  #FFFFFF  white`: its hexadecimal color, and the name
+# of its color, either a function such as `srgb(...)` or `gray(...)`, or, for
+# exact matches, a named color
+PIXEL_REGEX = re.compile(rb"^\d+,\d+:[^#\n]*#([0-9A-Fa-f]+)[ \t]+(\S+)",
+                         re.MULTILINE)
+GRAY_REGEX = re.compile(rb"graya?\(")
+
+# Default pixel budget of the extraction, see :func:`get_max_pixels`
+MAX_PIXELS = 250000
+
+BW_MESSAGE = "Found a minimalist hipster that thinks he deserves using" \
+        " Hapycolor. Fortunately, Hapycolor does not supports b&w" \
+        " images."
+
+
+class Engine(enum.Enum):
+    """
+    Extraction engines that can be selected with the key `engine` of the
+    section `extraction` of the configuration file.
+    """
+    NATIVE = "native"
+    IMAGEMAGICK = "imagemagick"
+
 
 def trolling(url):
     browsers = ["firefox",
@@ -21,11 +53,68 @@ def trolling(url):
             proc = sp.run([b, url], stdout=sp.PIPE)
             return proc
 
+
+def load_settings():
+    """
+    Returns the content of the section `extraction` of the configuration
+    file, or an empty dictionary if the section is not defined, which is the
+    case of configuration files generated by older versions of hapycolor.
+    """
+    try:
+        return config.ConfigurationManager.load("extraction")
+    except exceptions.InvalidConfigKeyError:
+        return {}
+
+
+def get_engine():
+    """
+    Returns the :class:`Engine` defined in the configuration file. If the
+    key is not defined, the native engine is used.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value does not match any engine.
+    """
+    value = load_settings().get("engine", Engine.NATIVE.value)
+    try:
+        return Engine(value.strip().lower())
+    except ValueError as e:
+        msg = "Unknown extraction engine: '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg, e)
+
+
+def get_max_pixels():
+    """
+    Returns the maximal number of pixels handed to the quantizer, defined by
+    the key `max_pixels` of the configuration file. Larger images are
+    downsampled before the extraction, and a value of 0 disables this step.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value is not a positive integer.
+    """
+    value = load_settings().get("max_pixels", str(MAX_PIXELS))
+    try:
+        max_pixels = int(value)
+    except ValueError as e:
+        msg = "Invalid value for 'max_pixels': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg, e)
+    if max_pixels < 0:
+        msg = "Invalid value for 'max_pixels': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return max_pixels
+
+
 def get(image_path, num_colors):
     """
-    Returns a palette filled with colors provided by ImageMagic.
-    The foreground (resp. background) is the brightest (resp. darkest)
-    color of them.
+    Returns a palette filled with the colors extracted by the configured
+    engine (see :func:`get_engine`). The foreground (resp. background) is the
+    brightest (resp. darkest) color of them.
+
+    The native engine also provides the population of each color, stored
+    in the palette's weights.
+
+    Images larger than :func:`get_max_pixels` are downsampled before being
+    quantized, and the scale factor that has been applied to their
+    dimensions is stored in the palette's metadata, under the key `scale`.
 
     :raise: :class:`hapycolor.exceptions.InvalidImageException` if the provided
         image uses a grayscale.
@@ -34,56 +123,235 @@ def get(image_path, num_colors):
     if pathlib.Path(image_path).suffix not in ['.jpg', '.jpeg', '.png']:
         msg = "ERROR: Image's format must be: '.jgp', '.jpeg', or '.png'"
         raise exceptions.InvalidImageException(msg)
-    magic_proc = sp.Popen(["convert", image_path, "+dither", "-colors",
-                           str(num_colors), "-unique-colors", "txt:-"],
-                          stdout=sp.PIPE)
-
-    raw_colors = magic_proc.stdout.readlines()
 
-    # Skip the first line which is not a color
-    del raw_colors[0]
-
-    # Select only the rgb colors from output
+    weights = None
     try:
-        rgb_colors = [extract_rgb(str(col)) for col in raw_colors]
+        if get_engine() == Engine.NATIVE:
+            rgb_colors, scale, weights = extract_native(
+                image_path, num_colors, get_max_pixels(), return_weights=True)
+        else:
+            rgb_colors, scale = extract_imagemagick(image_path, num_colors,
+                                                    get_max_pixels())
     except exceptions.BlackAndWhitePictureException as e:
         trolling("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
         raise exceptions.InvalidImageException(str(e))
 
-    palette = pltte.Palette()
-    palette.colors = rgb_colors
-    palette.foreground, palette.background = get_fg_and_bg(rgb_colors)
+    palette = pltte.Palette(rgb_colors, weights)
+    palette.foreground, palette.background = get_fg_and_bg(palette.array)
+    palette.metadata["scale"] = scale
 
     return palette
 
 
-def extract_rgb(raw_color):
+def downsampled_size(size, max_pixels):
+    """
+    Returns the dimensions of an image of size `size` scaled down to fit in
+    `max_pixels` pixels, while preserving its aspect ratio. If the image is
+    already small enough, or if `max_pixels` is 0, its size is returned
+    unchanged.
+    """
+    width, height = size
+    if not max_pixels or width * height <= max_pixels:
+        return size
+    ratio = math.sqrt(max_pixels / (width * height))
+    return max(1, int(width * ratio)), max(1, int(height * ratio))
+
+
+def downsample(image, max_pixels):
     """
-    Checks if the color are encoded over 8 bit (greyscale), 24bit (rgb) or
-    32bit (rgb + alpha) and returns a tuple of rgb values
+    Converts a freshly opened image to rgb and scales it down to at most
+    `max_pixels` pixels. The JPEG decoder is first asked to scale the DCT
+    coefficients (see :meth:`PIL.Image.Image.draft`), which skips most of the
+    decoding work while keeping the image at least as large as required,
+    then a box filter averages the remaining pixels.
+
+    :return: a tuple containing the rgb image and the scale factor that has
+        been applied to its dimensions
+    """
+    width = image.size[0]
+    size = downsampled_size(image.size, max_pixels)
+    if size != image.size:
+        image.draft("RGB", size)
+    image = image.convert("RGB")
+    if image.size != size:
+        image = image.resize(size, Image.BOX)
+    return image, size[0] / width
+
+
+def extract_imagemagick(image_path, num_colors, max_pixels=0):
+    """
+    Quantizes the image with ImageMagick's `convert` and returns a list of
+    rgb tuples, and the scale factor applied to the image's dimensions.
 
-    :param raw_color: en entry line of the result of the imagemagick extraction
     :raises exceptions.BlackAndWhitePictureException: if the colors are encoded
         in a greyscale format.
-    :return: A tuple of rgb values
+    :raises exceptions.InvalidImageException: if `convert` did not output any
+        color.
     """
-    if re.search("gray", raw_color):
-        msg = "Found a minimalist hipster that thinks he deserves using" \
-                " Hapycolor. Fortunately, Hapycolor does not supports b&w" \
-                " images."
+    command = ["convert", image_path]
+    scale = 1.0
+    if max_pixels:
+        # Only the header is read to get the image's dimensions
+        with Image.open(image_path) as image:
+            size = downsampled_size(image.size, max_pixels)
+            scale = size[0] / image.size[0]
+        command.extend(["-resize", "{}@>".format(max_pixels)])
+    command.extend(["+dither", "-colors", str(num_colors), "-unique-colors",
+                    "-depth", "8", "txt:-"])
+
+    magic_proc = sp.Popen(command, stdout=sp.PIPE)
+    with magic_proc.stdout:
+        colors, gray_count = parse_txt(magic_proc.stdout)
+    magic_proc.wait()
+
+    if gray_count:
+        msg = BW_MESSAGE + " ({} of {} colors are gray)".format(
+                gray_count, gray_count + len(colors))
         raise exceptions.BlackAndWhitePictureException(msg)
-    elif re.search("srgba", raw_color):
-        match = re.search("srgba\(.*\)", raw_color).group(0)
-        return make_tuple(match[5:])[:-1]
-    elif re.search("srgb", raw_color):
-        match = re.search("srgb\(.*\)", raw_color).group(0)
-        return make_tuple(match[4:])
+    if len(colors) == 0:
+        msg = "ERROR: ImageMagick failed to extract the colors of: {}" \
+                .format(image_path)
+        raise exceptions.InvalidImageException(msg)
+    return [tuple(c) for c in colors.tolist()], scale
+
+
+def parse_txt(stream, chunk_size=1 << 16):
+    """
+    Parses the output of ImageMagick's `txt:-` format. The stream is read
+    incrementally by chunks, and the hexadecimal colors of the complete lines
+    of each chunk are decoded at once, only the unfinished last line being
+    carried over to the next chunk. Since the hexadecimal column is written
+    for every pixel, the colors that ImageMagick names, e.g. `white`, are
+    decoded as the `srgb(...)` ones. The header line and the alpha channels
+    are ignored.
+
+    :arg stream: a binary file-like object, e.g. the stdout of `convert`
+    :arg chunk_size: the number of bytes read at each step
+    :return: a tuple containing an `N x 3` uint8 array of rgb colors and the
+        number of entries encoded in grayscale (`gray(...)` or
+        `graya(...)`)
+    """
+    blocks = [np.empty((0, 3), dtype=np.uint8)]
+    gray_count = 0
+    tail = b""
+    chunks = iter(lambda: stream.read(chunk_size), b"")
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            lines, tail = tail, b""
+        else:
+            lines = tail + chunk
+            end = lines.rfind(b"\n") + 1
+            lines, tail = lines[:end], lines[end:]
+        hexcolors = []
+        for hexcolor, name in PIXEL_REGEX.findall(lines):
+            if GRAY_REGEX.match(name):
+                gray_count += 1
+            elif len(hexcolor) >= 6:
+                hexcolors.append(hexcolor[:6])
+        if hexcolors:
+            data = bytes.fromhex(b"".join(hexcolors).decode())
+            blocks.append(np.frombuffer(data, dtype=np.uint8)
+                          .reshape(-1, 3))
+    return np.concatenate(blocks), gray_count
+
+
+def extract_native(image_path, num_colors, max_pixels=0,
+                   return_weights=False):
+    """
+    Decodes the image with Pillow and quantizes its pixels with
+    :func:`median_cut`, without leaving the python process. Returns a list of
+    rgb tuples, and the scale factor applied to the image's dimensions (see
+    :func:`downsample`), followed, if `return_weights` is `True`, by the
+    fraction of the pixels represented by each color.
+
+    :raises exceptions.BlackAndWhitePictureException: if the image is encoded
+        in a greyscale format, or if all its pixels are achromatic.
+    :raises exceptions.InvalidImageException: if the image cannot be decoded.
+    """
+    try:
+        with Image.open(image_path) as image:
+            if image.mode in ["1", "L", "LA", "I", "I;16", "F"]:
+                raise exceptions.BlackAndWhitePictureException(BW_MESSAGE)
+            image, scale = downsample(image, max_pixels)
+            pixels = np.asarray(image, dtype=np.uint8)
+    except (OSError, SyntaxError) as e:
+        msg = "ERROR: Unable to decode the image: {}".format(e)
+        raise exceptions.InvalidImageException(msg)
+
+    colors, counts = median_cut(pixels.reshape(-1, 3), num_colors,
+                                return_counts=True)
+    if (colors == colors[:, :1]).all():
+        raise exceptions.BlackAndWhitePictureException(BW_MESSAGE)
+    colors = [tuple(int(e) for e in c) for c in colors]
+    if return_weights:
+        return colors, scale, counts / counts.sum()
+    return colors, scale
+
+
+def median_cut(pixels, num_colors, return_counts=False):
+    """
+    Reduces an `N x 3` uint8 array of rgb pixels to at most `num_colors`
+    colors. The pixels are first collapsed into their unique colors weighted
+    by their populations, then the box having the largest product of
+    population and channel range is recursively split at the weighted median
+    of this channel. Each color of the result is the weighted mean of a box.
+
+    :arg pixels: an `N x 3` array of uint8 rgb values
+    :arg num_colors: the maximal number of colors to return
+    :arg return_counts: if `True`, the number of pixels of each color's
+        boxes is returned too
+    :return: a sorted `K x 3` uint8 array of unique colors, where
+        `K <= num_colors`, and, if requested, an array of `K` integers
+    """
+    pixels = pixels.astype(np.uint32)
+    packed = (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+    keys, counts = np.unique(packed, return_counts=True)
+    colors = np.stack([(keys >> 16) & 0xff, (keys >> 8) & 0xff, keys & 0xff],
+                      axis=1).astype(np.int64)
+
+    def score(box):
+        box_colors, box_counts = box
+        if len(box_colors) < 2:
+            return 0
+        spread = box_colors.max(axis=0) - box_colors.min(axis=0)
+        return int(spread.max()) * int(box_counts.sum())
+
+    boxes = [(colors, counts)]
+    scores = [score(boxes[0])]
+    while len(boxes) < num_colors:
+        i = int(np.argmax(scores))
+        if scores[i] == 0:
+            break
+        box_colors, box_counts = boxes.pop(i)
+        del scores[i]
+
+        spread = box_colors.max(axis=0) - box_colors.min(axis=0)
+        order = np.argsort(box_colors[:, np.argmax(spread)], kind="mergesort")
+        box_colors, box_counts = box_colors[order], box_counts[order]
+        cumulated = np.cumsum(box_counts)
+        cut = int(np.searchsorted(cumulated, cumulated[-1] / 2))
+        cut = min(max(cut, 1), len(box_colors) - 1)
+
+        for half in [(box_colors[:cut], box_counts[:cut]),
+                     (box_colors[cut:], box_counts[cut:])]:
+            boxes.append(half)
+            scores.append(score(half))
+
+    means = [np.round((c * w[:, None]).sum(axis=0) / w.sum())
+             for c, w in boxes]
+    colors, inverse = np.unique(np.array(means, dtype=np.uint8), axis=0,
+                                return_inverse=True)
+    if not return_counts:
+        return colors
+    populations = [int(w.sum()) for _, w in boxes]
+    return colors, np.bincount(inverse.ravel(), weights=populations,
+                               minlength=len(colors)).astype(np.int64)
 
 
 def get_fg_and_bg(rgb_colors):
     """ Extract the background and foreground """
-    hsl_colors = [helpers.rgb_to_hsl(c) for c in rgb_colors]
-    fg = max(hsl_colors, key=lambda c: c[2])
-    bg = min(hsl_colors, key=lambda c: c[2])
+    hsl_colors = tables.rgb_to_hsl(np.asarray(rgb_colors).reshape(-1, 3))
+    fg = hsl_colors[np.argmax(hsl_colors[:, 2])]
+    bg = hsl_colors[np.argmin(hsl_colors[:, 2])]
 
     return helpers.hsl_to_rgb(fg), helpers.hsl_to_rgb(bg)
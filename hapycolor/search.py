@@ -0,0 +1,244 @@
+"""
+Similarity search over a collection of palettes.
+
+A palette is embedded as a fixed length vector approximating the sliced
+Wasserstein distance, i.e. the Earth Mover's Distance averaged over
+projections: its colors are converted to the Lab space and projected on
+:data:`DIRECTIONS`, then, for each direction, the quantiles of the
+projections, weighted by the colors' populations, are sampled at
+:data:`QUANTILES` levels. In one dimension, the Earth Mover's Distance
+between two distributions is the mean absolute difference of their quantile
+functions, hence the L1 distance between two embeddings, divided by their
+length, approximates the mean distance, in Lab units, that the colors of a
+palette have to travel to become the other palette. Unlike a histogram, the
+embedding does not depend on a quantization of the Lab space, and two
+palettes of different sizes can be compared.
+
+The embeddings of a collection are stored in an index file: a header,
+followed by the `N x D` float32 matrix of the embeddings, memory mapped when
+the index is loaded, then the json list of the labels of the palettes,
+usually the paths of their source images. A k-nearest query computes the
+distances to the whole matrix by chunks.
+"""
+import json
+import os
+import pathlib
+import re
+import struct
+
+import numpy as np
+
+from hapycolor import exceptions
+from hapycolor import palette as pltte
+from hapycolor import store
+from hapycolor.color import tables
+
+
+# magic, version of the index, number of directions, number of quantiles,
+# number of palettes, size of the labels
+HEADER = struct.Struct("<4sHHHIQ")
+MAGIC = b"HPSI"
+VERSION = 1
+
+# The axes of the Lab space, and the diagonals of the planes (a, b), (L, a)
+# and (L, b)
+DIRECTIONS = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1],
+                       [0, 1, 1], [0, 1, -1], [1, 1, 0], [1, -1, 0],
+                       [1, 0, 1], [1, 0, -1]], dtype=np.float64)
+DIRECTIONS /= np.linalg.norm(DIRECTIONS, axis=1)[:, np.newaxis]
+QUANTILES = 16
+
+# Number of embeddings compared at once by a query
+CHUNK_SIZE = 1 << 16
+
+HEX_COLOR = re.compile(r"#([0-9a-fA-F]{6})\b")
+
+
+def embed(palette):
+    """
+    Returns the embedding of a palette, see the module's documentation. The
+    colors are weighted by the palette's weights, if any.
+
+    :arg palette: an instance of :class:`hapycolor.palette.Palette`
+    :return: a float32 array of `len(DIRECTIONS) * QUANTILES` values
+    """
+    if not len(palette):
+        msg = "ERROR: An empty palette cannot be embedded"
+        raise exceptions.PaletteFormatError(msg)
+    projections = tables.rgb_to_lab(palette.array).dot(DIRECTIONS.T)
+    weights = palette.weights
+    if weights is None or not weights.sum() > 0:
+        weights = np.ones(len(palette))
+
+    order = np.argsort(projections, axis=0)
+    projections = np.sort(projections, axis=0)
+    cumulated = np.cumsum(weights[order], axis=0)
+    levels = (np.arange(QUANTILES) + 0.5) / QUANTILES * weights.sum()
+    embedding = np.empty((len(DIRECTIONS), QUANTILES), dtype=np.float32)
+    for j in range(len(DIRECTIONS)):
+        indices = np.searchsorted(cumulated[:, j], levels)
+        embedding[j] = projections[np.minimum(indices, len(palette) - 1), j]
+    return embedding.ravel()
+
+
+def distance(embedding_1, embedding_2):
+    """
+    Returns the approximated Earth Mover's Distance between two embedded
+    palettes.
+    """
+    return float(np.abs(np.subtract(embedding_1, embedding_2,
+                                    dtype=np.float64)).mean())
+
+
+def palettes_from(source):
+    """
+    Yields the label and the palette of each palette of a collection.
+
+    :arg source: a palette store or a json-lines file written by `--dir`,
+        whose labels are the paths of the images, or a directory of json
+        palettes, whose labels are the paths of the json files
+    """
+    path = pathlib.Path(source).expanduser()
+    if path.is_dir():
+        for json_file in sorted(path.glob("*.json")):
+            json_file = json_file.as_posix()
+            yield json_file, pltte.Palette.from_json(json_file)
+        return
+    if path.suffix == ".jsonl":
+        for record, palette in pltte.read_jsonl(path.as_posix()):
+            yield record["path"], palette
+        return
+
+    # Only the last record of an image is kept
+    entries = {}
+    with store.PaletteStore(path) as palette_store:
+        for entry in palette_store:
+            entries.pop(entry.image_hash, None)
+            entries[entry.image_hash] = entry
+    for entry in entries.values():
+        yield entry.source or entry.image_hash, entry.palette
+
+
+def palette_from_file(path):
+    """
+    Reads the palette of a query: a json palette, or any text file, such as
+    a Vim colorscheme, whose hexadecimal colors, e.g. `#1d2021`, form the
+    palette.
+    """
+    path = pathlib.Path(path)
+    if path.suffix == ".json":
+        return pltte.Palette.from_json(path.as_posix())
+    with open(path.as_posix(), errors="replace") as f:
+        colors = [tuple(bytes.fromhex(c))
+                  for c in HEX_COLOR.findall(f.read())]
+    if not colors:
+        msg = "ERROR: No hexadecimal color found in {}".format(path)
+        raise exceptions.PaletteFormatError(msg)
+    return pltte.Palette(sorted(set(colors)))
+
+
+class PaletteIndex:
+    """
+    Memory mapped embeddings of a collection of palettes, see the module's
+    documentation.
+
+    :arg path: the path of the index
+    """
+    def __init__(self, path):
+        self.path = pathlib.Path(path).expanduser()
+        self.embeddings = None
+        self.labels = None
+
+    @staticmethod
+    def build(path, palettes):
+        """
+        Embeds the palettes and writes their index.
+
+        :arg palettes: an iterable of tuples holding the label of a palette,
+            and the palette, see :func:`palettes_from`
+        :return: the loaded index
+        """
+        path = pathlib.Path(path).expanduser()
+        tmp = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        labels = []
+        try:
+            with open(tmp.as_posix(), "wb") as f:
+                f.seek(HEADER.size)
+                for label, palette in palettes:
+                    f.write(embed(palette).tobytes())
+                    labels.append(label)
+                data = json.dumps(labels).encode()
+                f.write(data)
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, len(DIRECTIONS),
+                                    QUANTILES, len(labels), len(data)))
+            os.replace(tmp.as_posix(), path.as_posix())
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return PaletteIndex(path).load()
+
+    def load(self):
+        """
+        Memory maps the embeddings, read only, and reads the labels.
+
+        :raise: :class:`hapycolor.exceptions.InvalidFileError` if the file is
+            not an index, or has been built with other embedding settings
+        """
+        if self.embeddings is not None:
+            return self
+        with open(self.path.as_posix(), "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                header = HEADER.pack(b"", 0, 0, 0, 0, 0)
+            magic, version, directions, quantiles, count, size = \
+                HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION \
+                    or directions != len(DIRECTIONS) \
+                    or quantiles != QUANTILES:
+                msg = "ERROR: {} is not a palette index of this version" \
+                    " of hapycolor, it must be built again".format(self.path)
+                raise exceptions.InvalidFileError(msg)
+            dims = directions * quantiles
+            f.seek(HEADER.size + 4 * dims * count)
+            self.labels = json.loads(f.read(size).decode())
+
+        if count:
+            self.embeddings = np.memmap(self.path.as_posix(),
+                                        dtype=np.float32, mode="r",
+                                        offset=HEADER.size,
+                                        shape=(count, dims))
+        else:
+            self.embeddings = np.zeros((0, dims), dtype=np.float32)
+        return self
+
+    def __len__(self):
+        return len(self.load().labels)
+
+    def distances(self, palette):
+        """
+        Returns the distance between the palette and each indexed palette.
+        """
+        self.load()
+        query = embed(palette)
+        distances = np.empty(len(self.embeddings))
+        for start in range(0, len(distances), CHUNK_SIZE):
+            chunk = self.embeddings[start:start + CHUNK_SIZE]
+            distances[start:start + CHUNK_SIZE] = \
+                np.abs(chunk - query).mean(axis=1)
+        return distances
+
+    def query(self, palette, k=5):
+        """
+        Returns the `k` indexed palettes closest to the provided one.
+
+        :return: a list of tuples holding the label of a palette and its
+            distance to the provided palette, sorted by distance
+        """
+        distances = self.distances(palette)
+        k = min(k, len(distances))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return [(self.labels[i], float(distances[i])) for i in nearest]
@@ -0,0 +1,345 @@
+"""
+Binary palette format, and append-only store of palettes.
+
+A palette is encoded as a record made of a fixed size header, holding the
+sha256 of the source image, the number of colors and the size of the
+record's sections, followed by:
+
+- the foreground and the background, then the colors, as rgb uint8 triplets
+- optionally, the weights of the colors, as simple precision floats
+- a json object holding the source image's path, the settings of the
+  pipeline which generated the palette (see
+  :func:`hapycolor.cache.pipeline_settings`) and the palette's metadata
+
+A store is a file starting with a small header, followed by records
+appended one after the other. Its index, stored next to it in `STORE.index`,
+lists the offset of the record of each image hash, so that a palette is
+loaded by slicing the memory mapped store instead of parsing a json file,
+and the whole collection can be scanned sequentially. When the same image
+is stored twice, the last record wins.
+
+The index is only a cache of the store: the records which are missing from
+it, e.g. after an interruption, are indexed again when the store is opened,
+and an incomplete record at the end of the store is overwritten by the next
+one. A store supports a single writer.
+"""
+import collections
+import json
+import mmap
+import os
+import pathlib
+import struct
+
+import numpy as np
+
+from hapycolor import exceptions
+from hapycolor import palette as pltte
+
+
+# magic, version
+HEADER = struct.Struct("<4sH")
+MAGIC = b"HPST"
+VERSION = 1
+
+# magic, size of the record, sha256 of the image, number of colors, flags,
+# size of the json information
+RECORD_HEADER = struct.Struct("<4sI32sHHI")
+RECORD_MAGIC = b"HPAL"
+HAS_WEIGHTS = 1
+
+# sha256 of the image, offset of its record
+INDEX_ENTRY = np.dtype([("digest", np.uint8, (32,)), ("offset", "<u8")])
+
+
+Entry = collections.namedtuple("Entry", ["image_hash", "source", "settings",
+                                         "palette"])
+
+
+def pack(palette, image_hash, source=None, settings=None):
+    """
+    Encodes a palette as a record.
+
+    :arg palette: an initialized :class:`hapycolor.palette.Palette`
+    :arg image_hash: the sha256 of the source image, as an hexadecimal string
+    :arg source: the path of the source image
+    :arg settings: the settings of the pipeline which generated the palette
+    :return: the record, as bytes
+    """
+    if not palette.is_initialized():
+        msg = "ERROR: Only an initialized palette can be stored"
+        raise exceptions.PaletteFormatError(msg)
+    try:
+        digest = bytes.fromhex(image_hash)
+    except (TypeError, ValueError):
+        digest = b""
+    if len(digest) != 32:
+        msg = "ERROR: Invalid image hash: '{}'".format(image_hash)
+        raise exceptions.PaletteFormatError(msg)
+
+    colors = np.concatenate([[palette.foreground, palette.background],
+                             palette.array]).astype(np.uint8)
+    weights = palette.weights
+    flags = 0
+    sections = [colors.tobytes()]
+    if weights is not None:
+        flags |= HAS_WEIGHTS
+        sections.append(weights.astype("<f4").tobytes())
+    info = json.dumps({"source": source, "settings": settings,
+                       "metadata": palette.metadata}).encode()
+    sections.append(info)
+
+    size = RECORD_HEADER.size + sum(len(s) for s in sections)
+    header = RECORD_HEADER.pack(RECORD_MAGIC, size, digest, len(palette),
+                                flags, len(info))
+    return b"".join([header] + sections)
+
+
+def record_size(buffer, offset=0):
+    """
+    Returns the size of the record starting at `offset`, or 0 if there is no
+    complete record there.
+    """
+    if offset + RECORD_HEADER.size > len(buffer):
+        return 0
+    magic, size = RECORD_HEADER.unpack_from(buffer, offset)[:2]
+    if magic != RECORD_MAGIC or size < RECORD_HEADER.size \
+            or offset + size > len(buffer):
+        return 0
+    return size
+
+
+def unpack(buffer, offset=0):
+    """
+    Decodes the record starting at `offset` of a buffer, e.g. a memory
+    mapped store.
+
+    :return: an instance of :class:`Entry`
+    """
+    if not record_size(buffer, offset):
+        msg = "ERROR: No valid palette record at offset {}".format(offset)
+        raise exceptions.PaletteFormatError(msg)
+    _, _, digest, num_colors, flags, info_size = \
+        RECORD_HEADER.unpack_from(buffer, offset)
+    offset += RECORD_HEADER.size
+
+    colors = np.frombuffer(buffer, dtype=np.uint8, count=3 * (num_colors + 2),
+                           offset=offset).reshape(-1, 3)
+    offset += colors.nbytes
+    palette = pltte.Palette(colors[2:])
+    palette.foreground = tuple(colors[0].tolist())
+    palette.background = tuple(colors[1].tolist())
+    if flags & HAS_WEIGHTS:
+        weights = np.frombuffer(buffer, dtype="<f4", count=num_colors,
+                                offset=offset)
+        offset += weights.nbytes
+        palette.weights = weights
+    info = json.loads(bytes(buffer[offset:offset + info_size]).decode())
+    palette.metadata = info["metadata"]
+    return Entry(digest.hex(), info["source"], info["settings"], palette)
+
+
+def is_store(path):
+    """
+    Tells whether a file starts with the magic of a palette store.
+    """
+    try:
+        with open(str(pathlib.Path(path).expanduser()), "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class PaletteStore:
+    """
+    Append-only file of palette records, indexed by image hash, see the
+    module's documentation.
+
+    :arg path: the path of the store, created if it does not exist
+    """
+    def __init__(self, path):
+        self.path = pathlib.Path(path).expanduser()
+        self.index_path = self.path.with_name(self.path.name + ".index")
+        self._offsets = None
+        self._end = None
+        self._map = None
+        self._file = None
+        self._index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """
+        Creates the store if needed, then loads its index and indexes the
+        records appended since the index was last written.
+        """
+        if self._offsets is not None:
+            return
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.as_posix(), "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION))
+            if self.index_path.exists():
+                self.index_path.unlink()
+
+        buffer = self._buffer()
+        if len(buffer) < HEADER.size \
+                or HEADER.unpack_from(buffer) != (MAGIC, VERSION):
+            msg = "ERROR: {} is not a palette store".format(self.path)
+            raise exceptions.PaletteFormatError(msg)
+
+        entries = np.zeros(0, dtype=INDEX_ENTRY)
+        if self.index_path.exists():
+            entries = np.fromfile(self.index_path.as_posix(),
+                                  dtype=INDEX_ENTRY)
+        end = HEADER.size
+        if len(entries):
+            last = int(entries["offset"].max())
+            size = record_size(buffer, last)
+            if size:
+                end = last + size
+            else:
+                # The store does not match its index anymore
+                entries = entries[:0]
+        self._offsets = {e["digest"].tobytes(): int(e["offset"])
+                         for e in entries}
+
+        missing = []
+        size = record_size(buffer, end)
+        while size:
+            missing.append((bytes(buffer[end + 8:end + 40]), end))
+            end += size
+            size = record_size(buffer, end)
+        self._end = end
+        if missing or len(entries) != len(self._offsets) \
+                or not self.index_path.exists():
+            for digest, offset in missing:
+                self._offsets[digest] = offset
+            self._write_index()
+
+    def _buffer(self):
+        if self._map is None:
+            with open(self.path.as_posix(), "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _write_index(self):
+        entries = np.zeros(len(self._offsets), dtype=INDEX_ENTRY)
+        for i, (digest, offset) in enumerate(self._offsets.items()):
+            entries[i] = (np.frombuffer(digest, np.uint8), offset)
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        entries.tofile(tmp.as_posix())
+        os.replace(tmp.as_posix(), self.index_path.as_posix())
+
+    def append(self, record):
+        """
+        Appends an encoded record, see :func:`pack`, and indexes it.
+
+        :return: the offset of the record
+        """
+        self.open()
+        if not record_size(record):
+            msg = "ERROR: Invalid palette record"
+            raise exceptions.PaletteFormatError(msg)
+        if self._file is None:
+            self._file = open(self.path.as_posix(), "r+b")
+            # Discards an incomplete record left by an interruption
+            self._file.truncate(self._end)
+            self._index_file = open(self.index_path.as_posix(), "ab")
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+        offset = self._end
+        self._file.seek(offset)
+        self._file.write(record)
+        self._file.flush()
+        self._end += len(record)
+
+        digest = record[8:40]
+        entry = np.zeros(1, dtype=INDEX_ENTRY)
+        entry[0] = (np.frombuffer(digest, np.uint8), offset)
+        self._index_file.write(entry.tobytes())
+        self._index_file.flush()
+        self._offsets[digest] = offset
+        return offset
+
+    def put(self, palette, image_hash, source=None, settings=None):
+        """
+        Stores a palette, see :func:`pack`.
+
+        :return: the offset of its record
+        """
+        return self.append(pack(palette, image_hash, source, settings))
+
+    def get(self, key):
+        """
+        Returns the last palette stored for an image.
+
+        :arg key: the sha256 of the image, as an hexadecimal string, or the
+            path of the image
+        :return: an instance of :class:`Entry`
+        :raise: :class:`hapycolor.exceptions.PaletteFormatError` if the store
+            holds no palette for this image
+        """
+        self.open()
+        try:
+            digest = bytes.fromhex(key)
+        except ValueError:
+            digest = None
+        if digest is None or len(digest) != 32:
+            if not os.path.isfile(key):
+                msg = "ERROR: Invalid palette key: '{}'".format(key)
+                raise exceptions.PaletteFormatError(msg)
+            from hapycolor import cache
+            digest = bytes.fromhex(cache.hash_file(key))
+        if digest not in self._offsets:
+            msg = "ERROR: No palette stored for '{}' in {}".format(key,
+                                                                   self.path)
+            raise exceptions.PaletteFormatError(msg)
+        return unpack(self._buffer(), self._offsets[digest])
+
+    def keys(self):
+        """ Returns the hashes of the stored images """
+        self.open()
+        return [digest.hex() for digest in self._offsets]
+
+    def __contains__(self, image_hash):
+        self.open()
+        try:
+            return bytes.fromhex(image_hash) in self._offsets
+        except ValueError:
+            return False
+
+    def __len__(self):
+        self.open()
+        return len(self._offsets)
+
+    def __iter__(self):
+        """
+        Scans every record of the store sequentially, including the ones
+        superseded by a later record of the same image.
+        """
+        self.open()
+        if self._file is not None:
+            self._file.flush()
+        buffer = self._buffer()
+        offset = HEADER.size
+        while offset < self._end:
+            yield unpack(buffer, offset)
+            offset += record_size(buffer, offset)
+
+    def close(self):
+        """ Flushes the store and its index to the disk, and closes them """
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._offsets = None
@@ -0,0 +1,236 @@
+"""
+Exact k-medoids clustering of one dimensional values, used instead of
+:class:`hapycolor.targets.pam.PAM` when the colors are compared by a single
+component, such as their hue or their luminosity.
+
+Once sorted, the optimal clusters of values on a line are contiguous
+segments, and the optimal medoid of a segment is its median, so the cost of
+each segment is computed in constant time from prefix sums, and the optimal
+partition is found by dynamic programming: the best partition of the first
+`j` values into `k` segments extends the best partition of the first `i`
+values into `k - 1` segments by the segment `[i, j)`. Since the costs of the
+segments satisfy the quadrangle inequality, the best start `i` does not
+decrease with `j`, so each layer of the dynamic programming is computed by
+divide and conquer, in `O(N log N)` instead of `O(N^2)`.
+
+On a circle, for instance for the hues, the clusters are arcs, and each
+value is at most half a period away from its medoid along its arc. Hence,
+cutting the circle at a boundary of the optimal clusters and unrolling it
+gives a line whose optimal partition is the circle's one. Moreover, the
+optimal partition of the circle has a boundary within each segment of the
+optimal partition of any of its cuts, so only the cuts within the smallest
+segment of one of them, at most `N / K + 1` cuts, are tried.
+"""
+from hapycolor import exceptions
+import numpy as np
+
+
+def segment_costs(values, prefix, i, j):
+    """
+    Returns the costs of the segments `[i, j)` of the sorted values, where
+    `i < j`: the sum of the distances between the values `values[i:j]` and
+    their lower median.
+
+    :arg values: a sorted float array
+    :arg prefix: the prefix sums of the values, starting with 0
+    :arg i: an integer array of the starts of the segments
+    :arg j: an integer array of the stops of the segments, broadcast with
+        `i`
+    :return: a float array
+    """
+    median = (i + j - 1) // 2
+    return values[median] * (median - i) - (prefix[median] - prefix[i]) \
+        + (prefix[j] - prefix[median + 1]) - values[median] * (j - median - 1)
+
+
+def layer(best, costs, stops, starts):
+    """
+    Extends the best partitions into `k - 1` segments of the first values of
+    several lines into partitions into `k` segments, by divide and conquer
+    over the stops of the last segments, all the lines being processed at
+    once.
+
+    :arg best: a `C x (N + 1)` float array, where `best[c, j]` is the cost of
+        the best partition of the first `j` values of the line `c` into
+        `k - 1` segments
+    :arg costs: a function returning the costs of the segments `[i, j)` of
+        the lines `c`, see :func:`segment_costs`
+    :arg stops: a tuple of two integer arrays, the lowest and the highest
+        stops of the last segment of each line
+    :arg starts: a tuple of two integer arrays, the lowest and the highest
+        starts of the last segment of each line, where the lowest start is
+        lower than the lowest stop
+    :return: a tuple containing the costs of the best partitions into `k`
+        segments, and the starts of their last segments, both `C x (N + 1)`
+        arrays
+    """
+    result = np.full(best.shape, np.inf)
+    previous = np.zeros(best.shape, dtype=np.intp)
+
+    # Pending ranges of stops `[low, high]` of the line `c`, whose best starts
+    # are within `[first, last]`
+    c = np.arange(len(best))
+    (low, high), (first, last) = stops, starts
+    while len(c):
+        middle = (low + high) // 2
+        counts = np.minimum(middle - 1, last) - first + 1
+        offsets = np.cumsum(counts) - counts
+        task = np.repeat(np.arange(len(c)), counts)
+        i = first[task] + np.arange(counts.sum()) - offsets[task]
+        total = best[c[task], i] + costs(c[task], i, middle[task])
+
+        minima = np.minimum.reduceat(total, offsets)
+        # The first minimum of each task
+        found = np.flatnonzero(total == minima[task])
+        _, index = np.unique(task[found], return_index=True)
+        argmin = i[found[index]]
+        result[c, middle] = minima
+        previous[c, middle] = argmin
+
+        left, right = low < middle, middle < high
+        c = np.concatenate([c[left], c[right]])
+        low = np.concatenate([low[left], middle[right] + 1])
+        high = np.concatenate([middle[left] - 1, high[right]])
+        first = np.concatenate([first[left], argmin[right]])
+        last = np.concatenate([argmin[left], last[right]])
+    return result, previous
+
+
+def partition(values, K, starts=(0,), length=None, limits=None):
+    """
+    Returns the optimal partitions into `K` segments of the lines
+    `values[s:s + length]`, for each start `s`, and their costs.
+
+    :arg values: a sorted float array
+    :arg K: the number of segments
+    :arg starts: the starts of the lines
+    :arg length: the number of values of each line, by default every value
+    :arg limits: if provided, a `len(starts) x (K + 1)` increasing integer
+        array: the `k`-th bound of the partition of the line `c`, for
+        `0 < k < K`, is then only searched between `limits[c, k]` and
+        `limits[c, k + 1]`, relatively to the start of the line
+    :return: a tuple containing a `len(starts) x (K + 1)` integer array of
+        the bounds of the segments of each line, starting with `s` and
+        ending with `s + length`, and the array of the costs of the
+        partitions
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    n = len(values) if length is None else length
+    prefix = np.concatenate([[0], np.cumsum(values)])
+    lines = np.arange(len(starts))
+
+    def costs(c, i, j):
+        return segment_costs(values, prefix, starts[c] + i, starts[c] + j)
+
+    # The lowest and the highest values of each bound, each bound leaving at
+    # least one value to each segment
+    k = np.arange(K + 1)
+    low = np.tile(k, (len(starts), 1))
+    high = np.tile(n - K + k, (len(starts), 1))
+    if limits is not None:
+        low = np.maximum(low, limits)
+        high[:, :K] = np.minimum(high[:, :K], limits[:, 1:])
+
+    best = np.full((len(starts), n + 1), np.inf)
+    best[:, 1:] = costs(lines[:, np.newaxis], 0,
+                        np.arange(1, n + 1)[np.newaxis])
+    previous = []
+    for k in range(2, K):
+        best, layer_starts = layer(best, costs, (low[:, k], high[:, k]),
+                                   (low[:, k - 1], high[:, k - 1]))
+        previous.append(layer_starts)
+
+    # Only the partitions of the whole lines are needed for the last segment
+    bounds = np.zeros((len(starts), K + 1), dtype=np.intp)
+    bounds[:, K] = n
+    if K > 1:
+        total = best[:, :n] + costs(lines[:, np.newaxis],
+                                    np.arange(n)[np.newaxis], n)
+        # The bounds of the previous layer are limited too
+        total[np.arange(n)[np.newaxis] < low[:, K - 1, np.newaxis]] = np.inf
+        total[np.arange(n)[np.newaxis] > high[:, K - 1, np.newaxis]] = np.inf
+        bounds[:, K - 1] = np.argmin(total, axis=1)
+        result = total[lines, bounds[:, K - 1]]
+        for k in range(K - 2, 0, -1):
+            bounds[:, k] = previous[k - 1][lines, bounds[:, k + 1]]
+    else:
+        result = best[:, n]
+    return bounds + starts[:, np.newaxis], result
+
+
+def check(colors, K):
+    if K > len(colors):
+        msg = "Impossible to classify the provided palette into {} \
+classes, since it only has {} colors.".format(K, len(colors))
+        raise exceptions.PAMException(msg)
+    if K < 1:
+        msg = "The number of classes must be positive"
+        raise exceptions.PAMException(msg)
+
+
+def clusters(colors, order, bounds):
+    """
+    Returns the dictionary pairing each segment's median with the colors of
+    the segment, whose indices in `colors` are given by `order`.
+    """
+    result = {}
+    for start, stop in zip(bounds, bounds[1:]):
+        members = [colors[i] for i in order[start:stop]]
+        medoid = members[(stop - start - 1) // 2]
+        result[medoid] = members
+    return result
+
+
+def linear(colors, K, key):
+    """
+    Clusters the colors into `K` clusters minimizing the sum of the distances
+    `abs(key(c) - key(medoid))` between each color and its medoid.
+
+    :arg colors: a list of hashable colors
+    :arg K: the number of clusters
+    :arg key: a function returning the value of a color
+    :return: a dictionary pairing each medoid with the colors of its cluster,
+        like :class:`hapycolor.targets.pam.PAM`
+    """
+    check(colors, K)
+    values = np.array([key(c) for c in colors], dtype=np.float64)
+    order = np.argsort(values, kind="mergesort")
+    bounds, _ = partition(values[order], K)
+    return clusters(colors, order, bounds[0].tolist())
+
+
+def circular(colors, K, key, period=360):
+    """
+    Clusters the colors into `K` clusters minimizing the sum of the circular
+    distances `min(d, period - d)`, where `d = abs(key(c) - key(medoid))`,
+    between each color and its medoid.
+
+    :arg colors: a list of hashable colors
+    :arg K: the number of clusters
+    :arg key: a function returning the value of a color, between 0 and
+        `period`
+    :arg period: the period of the values, 360 for the hues
+    :return: a dictionary pairing each medoid with the colors of its cluster,
+        like :class:`hapycolor.targets.pam.PAM`
+    """
+    check(colors, K)
+    values = np.array([key(c) for c in colors], dtype=np.float64) % period
+    order = np.argsort(values, kind="mergesort")
+    n = len(values)
+
+    # The circle unrolled twice: the line cut before the value `s` is
+    # `unrolled[s:s + n]`
+    unrolled = np.concatenate([values[order], values[order] + period])
+    bounds, _ = partition(unrolled, K, [0], n)
+    smallest = np.argmin(np.diff(bounds[0]))
+    cuts = np.arange(bounds[0, smallest], bounds[0, smallest + 1] + 1)
+    # Cutting between equal values gives the same partitions
+    cuts = cuts[(cuts == 0) | (unrolled[cuts] != unrolled[cuts - 1])]
+
+    # The bounds of the partition of each cut interleave with the bounds of
+    # the first partition, which are unrolled from the smallest segment
+    first = np.concatenate([bounds[0, :-1], bounds[0] + n])
+    limits = first[smallest:smallest + K + 1] - cuts[:, np.newaxis]
+    bounds, costs = partition(unrolled, K, cuts, n, np.maximum(limits, 0))
+    best = bounds[np.argmin(costs)].tolist()
+    return clusters(colors, np.concatenate([order, order]), best)
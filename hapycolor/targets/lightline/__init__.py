@@ -4,14 +4,16 @@ Lightline module
 import enum
 import datetime
 from pathlib import Path
+import numpy as np
 
 from hapycolor import targets
 from hapycolor import exceptions
+from hapycolor.color import tables
 from hapycolor import helpers
 from hapycolor.targets import base
 from hapycolor.targets import eight_bit_colors
 from hapycolor.targets import vim
-from hapycolor.targets import pam
+from hapycolor.targets import cluster1d
 
 
 class Lightline(base.Target):
@@ -152,13 +154,10 @@ class Lightline(base.Target):
 
     @staticmethod
     def classify(colors):
-        def distance(c_1, c_2):
-            """ Evaluates the hue's distance """
-            return abs(c_1[0] - c_2[0])
-
         # There are four modes: Insert, Visual, Normal and Replace
         k = 4
-        colors = pam.PAM(colors, k, distance)()
+        hues = dict(zip(colors, tables.rgb_to_hsl(np.asarray(colors))[:, 0]))
+        colors = cluster1d.circular(colors, k, lambda c: hues[c])
 
         # Only the medoids of each cluster will used
         return [m for m in colors]
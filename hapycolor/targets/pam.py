@@ -1,9 +1,78 @@
+from hapycolor import config
 from hapycolor import exceptions
 import numpy as np
 
 
-class PAM:
+# Default number of colors above which the colors are clustered by CLARA, see
+# :func:`get_sampling_size`
+SAMPLING_SIZE = 1000
+
+
+def get_sampling_size():
+    """
+    Returns the number of colors above which :func:`clustering` samples the
+    colors, defined by the key `sampling_size` of the section `clustering` of
+    the configuration file. A value of 0 disables the sampling.
+
+    :raise: :class:`hapycolor.exceptions.InvalidConfigKeyError` if the
+        configured value is not a positive integer.
+    """
+    try:
+        value = config.ConfigurationManager.load("clustering") \
+                .get("sampling_size", str(SAMPLING_SIZE))
+    except exceptions.InvalidConfigKeyError:
+        value = str(SAMPLING_SIZE)
+    if not value.isdigit():
+        msg = "Invalid value for 'sampling_size': '{}'".format(value)
+        raise exceptions.InvalidConfigKeyError(msg)
+    return int(value)
+
+
+def clustering(colors, K, distance=None, metric=None):
+    """
+    Returns the clustering of the colors into `K` clusters: an instance of
+    :class:`PAM`, or of :class:`CLARA` when there are more colors than the
+    sampling size (see :func:`get_sampling_size`), since the memory used by
+    PAM and the cost of its swaps grow quadratically with the number of
+    colors. Calling the returned object performs the clustering, then its
+    method `total_dissimilarity` measures the quality of the result.
+
+    :arg colors: a list of hashable colors
+    :arg K: the number of clusters
+    :arg distance: a function returning the distance of two colors
+    :arg metric: optional vectorized function returning the matrix of the
+        distances between two lists of colors, used instead of `distance`
     """
+    if distance is None and metric is None:
+        msg = "Either a distance or a metric must be provided"
+        raise exceptions.PAMException(msg)
+    sampling_size = get_sampling_size()
+    if sampling_size and len(colors) > sampling_size:
+        return CLARA(colors, K, distance, metric)
+    matrix = None if metric is None else metric(colors, colors)
+    return PAM(colors, K, distance, matrix)
+
+
+def distance_matrix(colors, distance):
+    """
+    Returns the matrix of the distances between each couple of colors. The
+    distance is evaluated once per couple, for `i < j`, and the upper
+    triangle is mirrored.
+
+    :arg colors: a list of colors
+    :arg distance: a function returning the distance of two colors
+    :return: an `N x N` float array
+    """
+    n = len(colors)
+    matrix = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            matrix[i, j] = distance(colors[i], colors[j])
+    return matrix + matrix.T
+
+
+class PAM:
+    r"""
     Partition Around Medoids
 
         The goal of the algorithm is to minimize the average dissimilarity of
@@ -13,6 +82,12 @@ class PAM:
         is also contained in the picture. The algorithm is divided in two
         steps: the build phase, and the swap phase.
 
+        The distances between the objects are computed once, in a matrix, and
+        the distances of each object to its closest and second closest
+        selected objects are cached, so that the swap phase follows FastPAM1
+        (Schubert and Rousseeuw, 2019): a round of swaps costs
+        :math:`O(n^2)` instead of :math:`O(k^2 n^2)` distance evaluations.
+
     Build
 
         A collection of k objects are selected for an initial set S
@@ -27,23 +102,61 @@ class PAM:
         dissimilarities between objects and the closest selected object caused
         by swapping :math:`i` and :math:`h`, that is, by transferring :math:`i`
         from :math:`selected` to :math:`unselected` and transferring :math:`h`
-        from :math:`unselected` to :math:`selected`. The computation of
-        :math:`T_{ih}` involves the computation of the contribution
-        :math:`K_{jih}` of each object :math:`j \in unselected − {h}` to the
-        swap of :math:`i` and :math:`h`. Note that we have either
-        :math:`d(j, i) > D_j` or :math:`d(j, i) = D_j`.
+        from :math:`unselected` to :math:`selected`.
+
+        Let :math:`D_j` and :math:`E_j` be the dissimilarities between
+        :math:`j` and its closest and second closest selected objects. The
+        part of :math:`T_{ih}` that does not depend on :math:`i`,
+        :math:`\sum_j \min(d(j, h) - D_j, 0)`, is shared by all the selected
+        objects, and only the objects :math:`j` whose closest selected object
+        is :math:`i` contribute a correction, :math:`\min(d(j, h), E_j) - D_j
+        - \min(d(j, h) - D_j, 0)`. Hence, the effects of all the swaps are
+        computed at once from the cached :math:`D_j` and :math:`E_j`.
+
+    :arg colors: a list of hashable colors
+    :arg K: the number of clusters
+    :arg distance: a function returning the distance of two colors, called
+        once per couple of colors
+    :arg matrix: optional `N x N` array of the distances between the colors,
+        used instead of `distance`, for instance when the distances can be
+        computed by a vectorized function
     """
-    def __init__(self, colors, K, distance):
+
+    # Improvements of the total dissimilarity smaller than this value are
+    # ignored, so that rounding errors cannot make the swap phase cycle
+    tolerance = 1e-9
+
+    def __init__(self, colors, K, distance=None, matrix=None):
         if K > len(colors):
             msg = "Impossible to classify the provided palette into {} \
 classes, since it only has {} colors.".format(K, len(colors))
             raise exceptions.PAMException(msg)
+        if distance is None and matrix is None:
+            msg = "Either a distance or a distance matrix must be provided"
+            raise exceptions.PAMException(msg)
 
         self.colors = colors
         self.K = K
-        self.selected = []
-        self.unselected = self.colors[:]
         self.distance = distance
+        if matrix is None:
+            matrix = distance_matrix(colors, distance)
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        if self.matrix.shape != (len(colors), len(colors)):
+            msg = "The distance matrix's shape {} does not match the {} \
+colors".format(self.matrix.shape, len(colors))
+            raise exceptions.PAMException(msg)
+
+        # Indices of the selected and unselected colors
+        self.medoids = []
+        self.others = list(range(len(colors)))
+
+    @property
+    def selected(self):
+        return [self.colors[i] for i in self.medoids]
+
+    @property
+    def unselected(self):
+        return [self.colors[i] for i in self.others]
 
     def __call__(self):
         """
@@ -54,98 +167,199 @@ classes, since it only has {} colors.".format(K, len(colors))
         self._build()
         self._swap()
 
-
-        clusters = dict([(m, [m]) for m in self.selected])
-        for c in self.unselected:
-            distance_c = []
-            for s in self.selected:
-                distance_c.append(self.distance(c, s))
-            medoid_index = distance_c.index(min(distance_c))
-            medoid = self.selected[medoid_index]
-            clusters[medoid].append(c)
+        clusters = dict([(self.colors[m], [self.colors[m]])
+                         for m in self.medoids])
+        if self.others:
+            closest = np.argmin(self.matrix[np.ix_(self.others, self.medoids)],
+                                axis=1)
+            for c, medoid_index in zip(self.others, closest):
+                medoid = self.colors[self.medoids[medoid_index]]
+                clusters[medoid].append(self.colors[c])
         return clusters
 
     def _build(self):
         # Initialize `selected` by adding to it an object for which the sum
         # of the distances to all other objects is minimal.
-
-        distances = {}
-        for c_1 in self.colors:
-            distances[c_1] = []
-            for c_2 in self.colors:
-                distances[c_1].append(self.distance(c_1, c_2))
-
-        mean_distances = [np.array(distances[key]).mean()
-                          for key in distances]
-        min_index = mean_distances.index(min(mean_distances))
-        self.selected.append(self.colors[min_index])
-        del self.unselected[min_index]
+        first = int(np.argmin(self.matrix.sum(axis=1)))
+        self._select(first)
 
         for _ in range(self.K - 1):
-            g = []
-            # Consider an object i in `unselected` as a candidate for inclusion
-            # into the set of selected objects
-            for i in self.unselected:
-                g_i = 0
-                # For an object j in `unselected` − {i}. Compute D_j, the
-                # dissimilarity between j and the closest object in S
-                for j in self.unselected:
-                    if i != j:
-                        D_j = self._d_p(j)
-                        d_j_i = self.distance(i, j)
-                        g_i += max(D_j - d_j_i, 0)
-                g.append((i, g_i))
+            # For each candidate i in `unselected`, g_i is the sum over the
+            # other objects j of max(D_j - d(j, i), 0), where D_j is the
+            # dissimilarity between j and the closest selected object.
+            # Selected objects do not contribute, since D_j is null.
+            D = self._nearest()[1]
+            others = np.array(self.others)
+            gains = np.maximum(D[others] - self.matrix[np.ix_(others, others)],
+                               0)
+            np.fill_diagonal(gains, 0)
             # Choose that object i that maximizes g_i
-            max_i = max(g, key=lambda _: _[1])[0]
-            self.selected.append(max_i)
-            del self.unselected[self.unselected.index(max_i)]
+            self._select(self.others[int(np.argmax(gains.sum(axis=1)))])
+
+    def _select(self, index):
+        self.medoids.append(index)
+        self.others.remove(index)
+
+    def _nearest(self):
+        """
+        Returns, for each object, the position in `self.medoids` of its
+        closest selected object, and its dissimilarities to the closest and
+        second closest selected objects. The latter is infinite if there is
+        only one selected object, since removing it leaves no other object.
+        """
+        distances = self.matrix[:, self.medoids]
+        nearest = np.argmin(distances, axis=1)
+        if len(self.medoids) == 1:
+            return nearest, distances[:, 0], np.full(len(distances), np.inf)
+        closest = np.partition(distances, 1, axis=1)
+        return nearest, closest[:, 0], closest[:, 1]
+
+    def _swap_effects(self):
+        """
+        Returns the `K x (N - K)` matrix of the effects :math:`T_{ih}` of
+        swapping the `i`-th selected object with the `h`-th unselected one.
+        """
+        nearest, D, E = self._nearest()
+        # d(j, h) for each candidate h (row) and each object j (column)
+        d = self.matrix[self.others]
+        shared = np.minimum(d - D, 0)
+        correction = np.minimum(d, E) - D - shared
+
+        # Sum the corrections of the objects by closest selected object
+        order = np.argsort(nearest, kind="mergesort")
+        starts = np.searchsorted(nearest[order], np.arange(len(self.medoids)))
+        # The padding column keeps the starts of the trailing empty groups in
+        # range, and reduceat returns the value at `start` for empty groups
+        padded = np.pad(correction[:, order], ((0, 0), (0, 1)))
+        sums = np.add.reduceat(padded, starts, axis=1)
+        empty = np.append(starts[1:], len(order)) == starts
+        sums[:, empty] = 0
+        return (shared.sum(axis=1)[:, np.newaxis] + sums).T
 
     def _swap(self):
-        T = -1
-        while T < 0 and self.unselected:
-            swaps = [(i, h) for i in self.selected for h in self.unselected]
-            contributions = []
-            for i, h in swaps:
-                T_i_h = self._swap_i_h(i, h)
-                contributions.append(((i, h), T_i_h))
-
-            (i, h), T = min(contributions, key=lambda _: _[1])
-            if T < 0:
-                del self.selected[self.selected.index(i)]
-                del self.unselected[self.unselected.index(h)]
-                self.unselected.append(i)
-                self.selected.append(h)
-
-    def _swap_i_h(self, i, h):
-        T_i_h = 0
-        for j in self.unselected:
-            if h != j:
-                d_j_i = self.distance(j, i)
-                D_j = self._d_p(j)
-                d_j_h = self.distance(j, h)
-                if d_j_i > D_j:
-                    K_j_i_h = min(d_j_h - D_j, 0)
-                elif d_j_i == D_j:
-                    E_j = self._e_p(j)
-                    K_j_i_h = min(d_j_h, E_j) - D_j
-                T_i_h += K_j_i_h
-        return T_i_h
-
-    def _d_p(self, p):
+        while self.others:
+            effects = self._swap_effects()
+            # Keep the first best swap, i in `selected` order, then h in
+            # `unselected` order
+            i, h = np.unravel_index(np.argmin(effects), effects.shape)
+            if effects[i, h] >= -self.tolerance:
+                break
+            medoid, other = self.medoids[i], self.others[h]
+            del self.medoids[i]
+            del self.others[h]
+            self.others.append(medoid)
+            self.medoids.append(other)
+
+    def total_dissimilarity(self):
+        """
+        Returns the sum of the dissimilarities between each object and its
+        closest selected object.
+        """
+        return float(self._nearest()[1].sum())
+
+
+class CLARA:
+    """
+    Clustering LARge Applications (Kaufman and Rousseeuw, 1990)
+
+        PAM is performed on several random samples of the colors, and each
+        sample's medoids are evaluated on all the colors: the medoids whose
+        total dissimilarity is minimal are kept. Each sample contains the
+        best medoids found so far, so that the successive samples can only
+        improve the result. Hence, only the distance matrix of the samples
+        and the distances between each color and the medoids are computed.
+
+        The samples are drawn from a generator seeded by `CLARA.seed`, so the
+        clustering of a given list of colors is deterministic.
+
+    :arg colors: a list of hashable colors
+    :arg K: the number of clusters
+    :arg distance: a function returning the distance of two colors
+    :arg metric: optional vectorized function returning the matrix of the
+        distances between two lists of colors, used instead of `distance`
+    """
+
+    # Number of samples clustered by PAM
+    samples = 5
+
+    # Seed of the random generator drawing the samples
+    seed = 0
+
+    def __init__(self, colors, K, distance=None, metric=None):
+        if K > len(colors):
+            msg = "Impossible to classify the provided palette into {} \
+classes, since it only has {} colors.".format(K, len(colors))
+            raise exceptions.PAMException(msg)
+        if distance is None and metric is None:
+            msg = "Either a distance or a metric must be provided"
+            raise exceptions.PAMException(msg)
+
+        self.colors = colors
+        self.K = K
+        self.distance = distance
+        self.metric = metric
+        self.medoids = []
+        self.dissimilarity = None
+
+    def sample_size(self):
+        """ The size of the samples advised by Kaufman and Rousseeuw """
+        return min(len(self.colors), 40 + 2 * self.K)
+
+    def _distances(self, rows, columns):
+        """
+        Returns the matrix of the distances between the colors of the
+        provided indices.
         """
-        The dissimilarity between `p` and the closest object in `self.selected`
+        rows = [self.colors[i] for i in rows]
+        columns = [self.colors[i] for i in columns]
+        if self.metric is not None:
+            return np.asarray(self.metric(rows, columns), dtype=np.float64)
+        return np.array([[self.distance(r, c) for c in columns]
+                         for r in rows], dtype=np.float64).reshape(
+                             len(rows), len(columns))
+
+    def __call__(self):
+        """
+        Performs the CLARA algorithm on the provided colors and returns a
+        dictionary that pairs each cluster's medoid with the colors classified
+        as belonging to them.
         """
-        dist = map(lambda c: self.distance(p, c), self.selected)
-        return min(list(dist))
+        random = np.random.RandomState(self.seed)
+        indices = np.arange(len(self.colors))
+        best = None
+        for _ in range(self.samples):
+            kept = [] if best is None else best[0]
+            candidates = np.setdiff1d(indices, kept)
+            drawn = random.choice(candidates, self.sample_size() - len(kept),
+                                  replace=False)
+            sample = sorted(kept + drawn.tolist())
+
+            clustering = PAM([self.colors[i] for i in sample], self.K,
+                             matrix=self._distances(sample, sample))
+            clustering()
+            medoids = [sample[i] for i in clustering.medoids]
+
+            distances = self._distances(indices, medoids)
+            dissimilarity = float(distances.min(axis=1).sum())
+            if best is None or dissimilarity < best[1]:
+                best = (medoids, dissimilarity, distances)
+            if len(sample) == len(self.colors):
+                break
+
+        self.medoids, self.dissimilarity, distances = best
+        clusters = dict([(self.colors[m], [self.colors[m]])
+                         for m in self.medoids])
+        closest = np.argmin(distances, axis=1)
+        medoids = set(self.medoids)
+        for c, medoid_index in zip(indices, closest):
+            if c not in medoids:
+                medoid = self.colors[self.medoids[medoid_index]]
+                clusters[medoid].append(self.colors[c])
+        return clusters
 
-    def _e_p(self, p):
+    def total_dissimilarity(self):
         """
-        the dissimilarity between `p` and the second closest object in
-        `self.selected`.
+        Returns the sum of the dissimilarities between each color and its
+        closest medoid, once the clustering has been performed.
         """
-        dist = list(map(lambda c: self.distance(c, p), self.selected))
-        dist.sort()
-        if len(dist) > 1:
-            return dist[1]
-        else:
-            return dist[0]
+        return self.dissimilarity
@@ -1,9 +1,11 @@
 """
 TerminalColorManager module
 """
+import numpy as np
+from hapycolor.color import tables
 from hapycolor import exceptions
 from hapycolor import helpers
-from hapycolor.targets import pam
+from hapycolor.targets import cluster1d
 
 
 class TerminalColorManager:
@@ -67,11 +69,9 @@ class TerminalColorManager:
         but two are reserved for black and white.
         """
         k = 6
-
-        def hue_diff(c1, c2):
-            return abs(c1[0] - c2[0])
-        hsl_colors = [helpers.rgb_to_hsl(c) for c in colors]
-        return pam.PAM(hsl_colors, k, hue_diff)()
+        hsl_colors = tables.rgb_to_hsl(np.asarray(colors))
+        hsl_colors = [tuple(c) for c in hsl_colors.tolist()]
+        return cluster1d.circular(hsl_colors, k, lambda c: c[0])
 
     @staticmethod
     def _classify_luminosity(colors):
@@ -80,16 +80,14 @@ class TerminalColorManager:
         to their luminosity, and return the two medoids sorted by their
         luminosity.
         """
-        def luminosity_diff(c1, c2):
-            return abs(c1[2] - c2[2])
-
         medoids = []
         for medoid in colors:
             # Check if there is only one color in the cluster
             if len(colors[medoid]) == 1:
                 hue_split_cluster = [medoid] * 2
             elif len(colors[medoid]) >= 2:
-                hue_split_cluster = pam.PAM(colors[medoid], 2, luminosity_diff)()
+                hue_split_cluster = cluster1d.linear(colors[medoid], 2,
+                                                     lambda c: c[2])
             c_1, c_2 = tuple([m for m in hue_split_cluster])
             normal, light = (c_1, c_2) if c_1[2] < c_2[2] else (c_2, c_1)
             medoids.append((normal, light))
@@ -1,6 +1,6 @@
 import json
+import numpy as np
 import pathlib
-from colormath.color_diff import delta_e_cie2000
 
 from hapycolor import targets
 from hapycolor import helpers
@@ -9,6 +9,7 @@ from hapycolor import palette as pltte
 from hapycolor.targets import eight_bit_colors
 from hapycolor.targets import base
 from hapycolor.targets.vim.environment import VimEnvironments
+from hapycolor.filters import reducer
 from hapycolor.targets import pam
 import hapycolor.targets.vim.qap
 
@@ -162,8 +163,16 @@ class ColorManager:
         instance, the weight between the group "Comment" and the group
         "Statement" is the product of both their frequencies.
         Then, once the algorithms finishes, each syntactic group is assigned to
-        a cluster, which will be retrieved by calling the method
-        :func:`ColorManager.cast`.
+        a cluster.
+
+    Step 3
+
+        The colors of each cluster are distributed to the minor syntactic
+        groups of its group, cyclically. Then, the colors of the minor groups
+        belonging to the same group are swapped by a heuristic QAP algorithm,
+        :class:`hapycolor.targets.vim.qap.HeuristicQAP`, weighted by the
+        frequencies of the minor groups. The colors of the minor groups are
+        retrieved by calling the method :func:`ColorManager.cast`.
 
     .. [#] The occurrence frequencies have been previously calculated by running
         `hapycolor/targets/vim/syntax_groups.vim` on Hapycolor's codebase.
@@ -178,9 +187,11 @@ class ColorManager:
         result will be dependent on the syntax file and the active
         colorscheme file that you currently have. For instance, some
         of them do not define a specific color for minor syntactic groups and some
-        do. Currently, this class aims at defining a cluster for each 'group'
-        of syntactic groups, so it only defines frequences for the major
-        groups.
+        do. Hence, the file defines the frequencies of the major groups, used
+        to assign a cluster to each 'group' of syntactic groups, and of the
+        minor groups, found by following the links of the syntax items, used
+        to distribute the clusters' colors. The minor groups that have not
+        been encountered are given one occurrence.
 
     """
     def __init__(self, rgb_colors):
@@ -189,17 +200,27 @@ class ColorManager:
             msg = "The colors must be defined in the rgb base"
             raise exceptions.ColorFormatError(msg)
 
-        def distance(c1, c2):
-            return delta_e_cie2000(c1, c2)
-
         lab_colors = [helpers.rgb_to_lab(c) for c in rgb_colors]
-        lab_classified = pam.PAM(lab_colors, len(Vim.groups), distance)()
+        lab_classified = pam.clustering(lab_colors, len(Vim.groups),
+                                        metric=ColorManager.distances)()
         rgb_classified = {}
         for m in lab_classified:
             cluster = [helpers.lab_to_rgb(c) for c in lab_classified[m]]
             rgb_classified[helpers.lab_to_rgb(m)] = cluster
 
         self.groups_colors = ColorManager._pair_group_to_color(rgb_classified)
+        self.minor_groups_colors = ColorManager._pair_minor_group_to_color(
+            self.groups_colors)
+
+    @staticmethod
+    def distances(lab_colors_1, lab_colors_2):
+        """
+        Vectorized CIEDE2000 distances between two lists of Lab colors
+        """
+        lab_1 = np.array([c.get_value_tuple() for c in lab_colors_1])
+        lab_2 = np.array([c.get_value_tuple() for c in lab_colors_2])
+        return reducer.cie2000(lab_1.reshape(-1, 1, 3),
+                               lab_2.reshape(1, -1, 3))
 
     def _pair_group_to_color(colors):
         medoids = [m for m in colors]
@@ -207,20 +228,51 @@ class ColorManager:
         frequencies_groups = {v: k for k, v in groups_frequencies.items()}
         freq_values = [groups_frequencies[g]
                        for g in groups_frequencies]
-        medoids_freqs = qap.QAP(medoids, freq_values)()
+        medoids_freqs = qap.ExactQAP(medoids, freq_values)()
         groups_colors = {}
         for (m, freq) in medoids_freqs:
             groups_colors[frequencies_groups[freq]] = colors[m]
         return groups_colors
 
+    def _pair_minor_group_to_color(groups_colors):
+        """
+        Distributes the colors of each group's cluster to its minor groups,
+        then optimizes the distribution with
+        :class:`hapycolor.targets.vim.qap.HeuristicQAP`, when the frequencies
+        of the minor groups are known.
+        """
+        minor_frequencies = ColorManager.load_minor_frequencies()
+        minor_groups, colors, frequencies, labels = [], [], [], []
+        for group in Vim.groups:
+            cluster = groups_colors[group]
+            for i, minor_group in enumerate(Vim.groups[group]):
+                minor_groups.append(minor_group)
+                colors.append(cluster[i % len(cluster)])
+                frequencies.append(minor_frequencies.get(minor_group, 1))
+                labels.append(group)
+
+        if any(g in minor_frequencies for g in minor_groups):
+            lab_colors = [helpers.rgb_to_lab(c) for c in colors]
+            distances = ColorManager.distances(lab_colors, lab_colors)
+            distances = (distances + distances.T) / 2
+            solver = qap.HeuristicQAP(colors, frequencies, distances, labels)
+            colors = [c for c, _ in solver()]
+        return dict(zip(minor_groups, colors))
+
     def load_frequencies():
+        """ Returns the frequencies of the major syntactic groups """
+        return ColorManager._load_frequencies_file()["major"]
+
+    def load_minor_frequencies():
+        """ Returns the frequencies of the minor syntactic groups """
+        return ColorManager._load_frequencies_file()["minor"]
+
+    def _load_frequencies_file():
         frequencies_json = pathlib.Path(__file__).parent / "frequencies.json"
         with open(frequencies_json.as_posix(), 'r') as f:
             frequencies = json.load(f)
         return frequencies
 
     def cast(self, group):
-        cluster_size = len(self.groups_colors[group])
-        minor_group_size = len(Vim.groups[group])
-        return [self.groups_colors[group][i % cluster_size]
-                for i in range(minor_group_size)]
+        return [self.minor_groups_colors[minor_group]
+                for minor_group in Vim.groups[group]]
@@ -1,5 +1,44 @@
 from copy import deepcopy
+import itertools
 import math
+import time
+
+from scipy.optimize import linear_sum_assignment
+import numpy as np
+
+
+# Largest problem whose permutations are all evaluated by :class:`ExactQAP`
+EXHAUSTIVE_SIZE = 8
+
+# Maximal number of permutations evaluated at once by :class:`ExactQAP`
+CHUNK_SIZE = 1 << 14
+
+
+def hue_distances(colors):
+    """
+    Returns the matrix of the distances between the hues of the colors, as
+    defined by :func:`Node.distance`.
+    """
+    hues = np.array([c[0] for c in colors], dtype=np.float64)
+    distances = np.abs(hues[:, np.newaxis] - hues[np.newaxis])
+    return np.where(distances < 360 // 2, distances, 360 - distances)
+
+
+def flows(frequencies):
+    """
+    Returns the matrix of the flows between the syntactic groups: the inverse
+    of the product of their frequencies, and zero on the diagonal.
+    """
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    flow = 1 / np.outer(frequencies, frequencies)
+    np.fill_diagonal(flow, 0)
+    return flow
+
+
+def assignment_cost(flow, distances, assignment):
+    """ The cost of assigning the color `assignment[i]` to frequency `i` """
+    assignment = list(assignment)
+    return float(np.sum(flow * distances[np.ix_(assignment, assignment)]))
 
 
 class Node:
@@ -164,3 +203,248 @@ class QAP:
 
     def get_bounds(self):
         return deepcopy(self.bounds)
+
+
+class ExactQAP:
+    """
+    Solves the same problem as :class:`QAP`, finding an assignment of the
+    same optimal cost, from the matrices of the flows between the
+    frequencies (see :func:`flows`) and of the distances between the colors
+    (see :func:`hue_distances`), so that the cost of an assignment `p`, where
+    `p[i]` is the index of the color assigned to the `i`-th frequency, is
+    `sum(flow * distances[p][:, p])`.
+
+    Problems containing at most :data:`EXHAUSTIVE_SIZE` colors are solved by
+    evaluating the cost of all the permutations at once. Larger problems are
+    solved by a branch and bound search, which assigns the frequencies in
+    order and updates the cost incrementally. A branch is pruned when its
+    Gilmore-Lawler bound is not lower than the best cost found so far: the
+    cost of the remaining assignments is bounded by a linear assignment
+    problem whose cost of assigning the frequency `a` to the color `l` is
+    the cost of its flows with the assigned frequencies plus the minimal
+    scalar product of the remaining flows of `a` and distances of `l`.
+
+    When several assignments are optimal, e.g. if some frequencies are
+    equal, the one returned may differ from the one of :class:`QAP`; the
+    pruning, within :attr:`tolerance`, only preserves the optimal cost.
+
+    :arg colors: a list of colors
+    :arg frequencies: a list of positive frequencies, of the same length
+    :arg distances: optional matrix of the distances between the colors,
+        by default the distances between their hues
+    """
+
+    # Relative tolerance of the bounds, so that rounding errors cannot prune
+    # the optimal branch
+    tolerance = 1e-9
+
+    def __init__(self, colors, frequencies, distances=None):
+        self.colors = colors
+        self.frequencies = frequencies
+        self.flow = flows(frequencies)
+        if distances is None:
+            distances = hue_distances(colors)
+        self.distances = np.asarray(distances, dtype=np.float64)
+
+    def __call__(self):
+        if len(self.colors) <= EXHAUSTIVE_SIZE:
+            assignment = self.exhaustive()
+        else:
+            assignment = self.branch_and_bound()
+        return [(self.colors[c], self.frequencies[i])
+                for i, c in enumerate(assignment)]
+
+    def cost(self, assignment):
+        """ The cost of assigning the color `assignment[i]` to frequency `i` """
+        return assignment_cost(self.flow, self.distances, assignment)
+
+    def exhaustive(self):
+        n = len(self.colors)
+        permutations = itertools.permutations(range(n))
+        best, best_cost = None, math.inf
+        while True:
+            chunk = np.array(list(itertools.islice(permutations, CHUNK_SIZE)),
+                             dtype=np.intp).reshape(-1, n)
+            if not len(chunk):
+                break
+            distances = self.distances[chunk[:, :, np.newaxis],
+                                       chunk[:, np.newaxis, :]]
+            costs = np.sum(distances * self.flow, axis=(1, 2))
+            index = int(np.argmin(costs))
+            if costs[index] < best_cost:
+                best, best_cost = chunk[index].tolist(), costs[index]
+        return best
+
+    def lower_bound(self, assigned, linear):
+        """
+        Gilmore-Lawler bound of the cost of the remaining assignments, given
+        the colors assigned to the first frequencies and the matrix of the
+        costs of the flows between each remaining frequency and the assigned
+        ones, for each color.
+        """
+        n = len(self.colors)
+        frequencies = list(range(len(assigned), n))
+        used = set(assigned)
+        colors = [c for c in range(n) if c not in used]
+        if len(frequencies) < 2:
+            quadratic = 0
+        else:
+            # Sorted without the diagonal, which is null: the flows are
+            # positive and the distances are not negative
+            flow = np.sort(self.flow[np.ix_(frequencies, frequencies)],
+                           axis=1)[:, 1:]
+            distances = -np.sort(-self.distances[np.ix_(colors, colors)],
+                                 axis=1)[:, :-1]
+            quadratic = flow @ distances.T
+        costs = linear[np.ix_(frequencies, colors)] + quadratic
+        rows, columns = linear_sum_assignment(costs)
+        return costs[rows, columns].sum()
+
+    def branch_and_bound(self):
+        n = len(self.colors)
+        best = [None, math.inf]
+
+        def expand(assigned, cost, linear):
+            if len(assigned) == n:
+                if cost < best[1]:
+                    best[:] = [assigned, cost]
+                return
+            bound = cost + self.lower_bound(assigned, linear)
+            if bound * (1 - self.tolerance) >= best[1]:
+                return
+
+            i = len(assigned)
+            for c in range(n):
+                if c in assigned:
+                    continue
+                # Flows between the frequency i and the assigned ones
+                delta = 2 * np.dot(self.flow[i, :i],
+                                   self.distances[c, assigned])
+                # Cost of the flows with i, for each frequency and color
+                update = 2 * np.outer(self.flow[:, i], self.distances[c])
+                expand(assigned + [c], cost + delta, linear + update)
+
+        expand([], 0.0, np.zeros((n, n)))
+        return best[0]
+
+
+class HeuristicQAP:
+    """
+    Solves approximately the same problem as :class:`QAP`, for problems too
+    large to be solved exactly, such as the assignment of the colors to Vim's
+    minor syntactic groups, by a robust tabu search (Taillard, 1991).
+
+    Starting from the assignment of the color `colors[i]` to the `i`-th
+    frequency, each iteration applies the swap of two colors that decreases
+    the cost the most, or increases it the least. The effects of all the
+    swaps are computed at once, in :math:`O(n)` each, since the flows and
+    the distances are symmetric. To escape the local minima, a swap placing
+    both colors back where they were during the last iterations is
+    forbidden, unless it improves the best assignment found so far. The
+    duration of this interdiction is drawn randomly, from a generator seeded
+    by `HeuristicQAP.seed`.
+
+    The search stops after `HeuristicQAP.iterations` iterations, or when the
+    time budget is exhausted. Hence, the result is deterministic as long as
+    the time budget is not reached.
+
+    :arg colors: a list of colors, which may contain duplicates
+    :arg frequencies: a list of positive frequencies, of the same length
+    :arg distances: optional symmetric matrix of the distances between the
+        colors, by default the distances between their hues
+    :arg groups: optional list of the labels of the frequencies: only the
+        colors of frequencies sharing the same label are swapped
+    """
+
+    # Maximal number of iterations of the search
+    iterations = 500
+
+    # Maximal duration in seconds of the search
+    time_budget = 0.25
+
+    # Seed of the random generator drawing the durations of the interdictions
+    seed = 0
+
+    # Improvements smaller than this value are ignored
+    tolerance = 1e-9
+
+    def __init__(self, colors, frequencies, distances=None, groups=None):
+        self.colors = colors
+        self.frequencies = frequencies
+        self.flow = flows(frequencies)
+        if distances is None:
+            distances = hue_distances(colors)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.groups = groups if groups is not None else [0] * len(colors)
+
+    def cost(self, assignment):
+        """ The cost of assigning the color `assignment[i]` to frequency `i` """
+        return assignment_cost(self.flow, self.distances, assignment)
+
+    def moves(self):
+        """
+        Returns the arrays of the frequencies `r` and `s` of the swaps: both
+        share the same label, and their initial colors are different, since
+        swapping equal colors does not change anything.
+        """
+        moves = [(r, s) for r, s in itertools.combinations(
+                     range(len(self.colors)), 2)
+                 if self.groups[r] == self.groups[s]
+                 and self.colors[r] != self.colors[s]]
+        moves = np.array(moves, dtype=np.intp).reshape(-1, 2)
+        return moves[:, 0], moves[:, 1]
+
+    def deltas(self, assignment, rows, columns):
+        """
+        Returns the variations of the cost caused by swapping the colors of
+        the frequencies `rows[m]` and `columns[m]`, for each move `m`.
+        """
+        distances = self.distances[np.ix_(assignment, assignment)]
+        flows = self.flow[rows] - self.flow[columns]
+        variations = distances[columns] - distances[rows]
+        # The sum includes the terms of r and s themselves, which amount to
+        # -2 * flow[r, s] * d(p[r], p[s])
+        return 2 * (np.sum(flows * variations, axis=1)
+                    + 2 * self.flow[rows, columns]
+                    * distances[rows, columns])
+
+    def __call__(self):
+        assignment = self.search()
+        return [(self.colors[c], self.frequencies[i])
+                for i, c in enumerate(assignment)]
+
+    def search(self):
+        n = len(self.colors)
+        assignment = np.arange(n)
+        rows, columns = self.moves()
+        if not len(rows):
+            return assignment.tolist()
+
+        random = np.random.RandomState(self.seed)
+        deadline = time.monotonic() + self.time_budget
+        # tabu[i, c]: first iteration where the color c can be assigned to
+        # the frequency i again
+        tabu = np.zeros((n, n), dtype=np.intp)
+        cost = self.cost(assignment)
+        best, best_cost = assignment.copy(), cost
+        for iteration in range(self.iterations):
+            if time.monotonic() > deadline:
+                break
+            deltas = self.deltas(assignment, rows, columns)
+            forbidden = (tabu[rows, assignment[columns]] > iteration) \
+                & (tabu[columns, assignment[rows]] > iteration)
+            aspiration = cost + deltas < best_cost - self.tolerance
+            deltas[forbidden & ~aspiration] = np.inf
+            move = int(np.argmin(deltas))
+            if deltas[move] == np.inf:
+                continue
+
+            r, s = rows[move], columns[move]
+            for i in (r, s):
+                tabu[i, assignment[i]] = iteration \
+                    + random.randint(max(1, (9 * n) // 10), (11 * n) // 10 + 2)
+            assignment[r], assignment[s] = assignment[s], assignment[r]
+            cost += deltas[move]
+            if cost < best_cost - self.tolerance:
+                best, best_cost = assignment.copy(), cost
+        return best.tolist()
@@ -1,35 +1,68 @@
 :" Usage:
 :"   vim -s syntax_groups.vim
 :"
-:" This script generates an output file "./frequencies.json" which defines a
-:" dictionary, linking each syntaxic group to its frequency.
+:" This script generates an output file "./frequencies.json" which defines two
+:" dictionaries: "major" links each syntaxic group to its frequency, and
+:" "minor" links each minor syntactic group to its frequency. The minor group
+:" of a character is the first group of the list below found by following the
+:" links of its syntax item, e.g. "pythonString" links to "String", whatever
+:" the colorscheme.
 :" To do so, it requires a file named "./input_files.txt", located in the
 :" current directory, listing the paths of files for which vim is able perform
 :" a syntaxic analisis.
 :" If the generated file containes an empty dictionary, make sure that the paths
 :" are reachable from were you run the script.
+:filetype on
+:syntax on
+:let s:minor_groups = ["Comment", "Constant", "String", "Character", "Number",
+            \ "Boolean", "Float", "Identifier", "Function", "Statement",
+            \ "Conditional", "Repeat", "Label", "Operator", "Keyword",
+            \ "Exception", "PreProc", "Include", "Define", "Macro", "PreCondit",
+            \ "Type", "StorageClass", "Structure", "Typedef", "Special",
+            \ "SpecialChar", "Tag", "Delimiter", "SpecialComment", "Debug"]
+:let s:minor_cache = {}
+:function! MinorGroup(id)
+:    let name = synIDattr(a:id, 'name')
+:    if has_key(s:minor_cache, name)
+:        return s:minor_cache[name]
+:    endif
+:    let group = name
+:    while group != '' && index(s:minor_groups, group) < 0
+:        let group = matchstr(execute('highlight ' . group),
+                    \ 'links to \zs\w\+')
+:    endwhile
+:    let s:minor_cache[name] = group
+:    return group
+:endfunction
+:function! Count(frequencies, group)
+:    if a:group != ''
+:        let a:frequencies[a:group] = get(a:frequencies, a:group, 0) + 1
+:    endif
+:endfunction
+:function! Dump(frequencies)
+:    let entries = []
+:    for [key, value] in sort(items(a:frequencies))
+:        let entries += ['        "' . key . '" : ' . value]
+:    endfor
+:    return join(entries, ",\n")
+:endfunction
 :function! Frequencies()
 :    let filenames = readfile("input_files.txt")
-:    let dic_string = ['{']
-:    let frequencies = {}
+:    let major = {}
+:    let minor = {}
 :    for f in filenames
 :        execute 'edit' f
-:        for l in range(line('$'))
-:            for c in range(col('$'))
-:                let group = synIDattr(synIDtrans(synID(l+1, c+1, 1)), 'name')
-:                if has_key(frequencies, group)
-:                    let frequencies[group] += 1
-:                else
-:                    let frequencies[group] = 1
-:                endif
+:        for l in range(1, line('$'))
+:            for c in range(1, col([l, '$']) - 1)
+:                let id = synID(l, c, 1)
+:                call Count(major, synIDattr(synIDtrans(id), 'name'))
+:                call Count(minor, MinorGroup(id))
 :            endfor
 :        endfor
 :    endfor
-:    for [key, value] in items(frequencies)
-:        let dic_string += ['"' . key . '" : ' . value . ',']
-:    endfor
-:    let dic_string += ['}']
-:    let a =  writefile(dic_string, "frequencies.json")
+:    let dic_string = ['{', '    "major" : {', Dump(major), '    },',
+                \ '    "minor" : {', Dump(minor), '    }', '}']
+:    let a =  writefile(split(join(dic_string, "\n"), "\n"), "frequencies.json")
 :    quit
 :endfunction
 :call Frequencies()
@@ -4,6 +4,7 @@ import os
 import re
 import PIL.Image
 import numpy as np
+from hapycolor.color import tables
 from hapycolor import helpers
 from hapycolor import exceptions
 from hapycolor import targets
@@ -75,6 +76,6 @@ class Yabar(base.Target):
         height, width = im.size
         cropped_height = int(height * crop_ratio)
         im = im.crop((0, 0, width, cropped_height))
-        pixels = list(im.getdata())
-        luminosities = [helpers.rgb_to_hsl(rgb)[2] for rgb in pixels]
+        pixels = np.asarray(im.getdata())
+        luminosities = tables.rgb_to_hsl(pixels)[:, 2]
         return np.average(luminosities)
@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from hapycolor import batch
+from hapycolor import cache
+from hapycolor import palette
+from hapycolor import store
+from tests.helpers import configurationtesting, disableprints
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        self.images = []
+        for name in ["firewatch.jpg", "greyscale.png", "taipei.jpg"]:
+            self.images.append(os.path.join(self.input_dir, name))
+            shutil.copyfile(os.path.join("./images", name), self.images[-1])
+        self.images.append(os.path.join(self.input_dir, "corrupted.png"))
+        with open(self.images[-1], "wb") as f:
+            f.write(b"not an image")
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir)
+        shutil.rmtree(self.output_dir)
+
+    def run_batch(self, jobs, palette_cache=None, palette_store=None,
+                  deduplicate=False, jsonl_file=None):
+        with mock.patch("hapycolor.filters.apply", lambda p: p), \
+                mock.patch("hapycolor.raw_colors.trolling"), \
+                mock.patch("hapycolor.filters.lum_table.get_bits",
+                           return_value=0), \
+                disableprints():
+            return batch.run(self.images, self.output_dir, 15, jobs,
+                             palette_cache, palette_store, deduplicate,
+                             jsonl_file)
+
+    def assert_outputs(self, failures):
+        self.assertEqual(failures, [self.images[1], self.images[3]])
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         ["firewatch.json", "taipei.json"])
+
+    @configurationtesting()
+    def test_serial(self):
+        self.assert_outputs(self.run_batch(1))
+
+    @configurationtesting()
+    def test_parallel(self):
+        self.assert_outputs(self.run_batch(2))
+
+    @configurationtesting()
+    def test_unexpected_errors(self):
+        """
+        An unexpected error, while generating or saving a palette, is
+        reported as the failure of the image
+        """
+        generate_palette = batch.generate_palette
+
+        def failing(image_path, *args, **kwargs):
+            if image_path == self.images[0]:
+                raise ValueError("unexpected")
+            return generate_palette(image_path, *args, **kwargs)
+
+        with mock.patch("hapycolor.batch.generate_palette", failing):
+            failures = self.run_batch(1)
+        self.assertEqual(failures, [self.images[0], self.images[1],
+                                    self.images[3]])
+        self.assertEqual(os.listdir(self.output_dir), ["taipei.json"])
+
+        with mock.patch("hapycolor.batch.save_result",
+                        side_effect=KeyError("key")):
+            failures = self.run_batch(1)
+        self.assertEqual(failures, self.images)
+
+    @configurationtesting()
+    def test_cache_statistics(self):
+        palette_cache = cache.PaletteCache(self.output_dir + "/cache",
+                                           max_size=2**20)
+        self.run_batch(2, palette_cache)
+        self.assertEqual((palette_cache.hits, palette_cache.misses), (0, 2))
+        self.run_batch(2, palette_cache)
+        self.assertEqual((palette_cache.hits, palette_cache.misses), (2, 2))
+
+    @configurationtesting()
+    def test_store(self):
+        """ The palettes must be appended to the store by the parent """
+        path = os.path.join(self.output_dir, "palettes.hps")
+        with store.PaletteStore(path) as palette_store:
+            failures = self.run_batch(2, palette_store=palette_store)
+        self.assertEqual(failures, [self.images[1], self.images[3]])
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         ["palettes.hps", "palettes.hps.index"])
+        with store.PaletteStore(path) as palette_store:
+            self.assertEqual(len(palette_store), 2)
+            entry = palette_store.get(self.images[2])
+        self.assertEqual(entry.source, os.path.realpath(self.images[2]))
+        self.assertEqual(entry.settings["num_colors"], 15)
+        self.assertTrue(entry.palette.is_initialized())
+
+    @configurationtesting()
+    def test_deduplicate(self):
+        """
+        The palette of a near-duplicate must be copied from its group's
+        representative instead of being generated
+        """
+        duplicate = os.path.join(self.input_dir, "firewatch_small.png")
+        with Image.open(self.images[0]) as image:
+            image.resize((image.size[0] // 4, image.size[1] // 4)) \
+                .save(duplicate)
+        self.images.insert(2, duplicate)
+        with mock.patch("hapycolor.batch.generate_palette",
+                        side_effect=batch.generate_palette) as generate:
+            failures = self.run_batch(1, deduplicate=True)
+        self.assertEqual(failures, [self.images[1], self.images[4]])
+        self.assertEqual([c[0][0] for c in generate.call_args_list],
+                         [self.images[0], self.images[1], self.images[3],
+                          self.images[4]])
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         ["firewatch.json", "firewatch_small.json",
+                          "taipei.json"])
+        with open(os.path.join(self.output_dir, "firewatch.json")) as f, \
+                open(os.path.join(self.output_dir,
+                                  "firewatch_small.json")) as g:
+            self.assertEqual(f.read(), g.read())
+
+    @configurationtesting()
+    def test_deduplicate_store(self):
+        path = os.path.join(self.output_dir, "palettes.hps")
+        duplicate = os.path.join(self.input_dir, "firewatch_copy.jpg")
+        with Image.open(self.images[0]) as image:
+            image.save(duplicate, quality=50)
+        self.images.append(duplicate)
+        with store.PaletteStore(path) as palette_store:
+            self.run_batch(2, palette_store=palette_store, deduplicate=True)
+        with store.PaletteStore(path) as palette_store:
+            self.assertEqual(len(palette_store), 3)
+            original = palette_store.get(self.images[0])
+            copy = palette_store.get(duplicate)
+        self.assertEqual(copy.source, os.path.realpath(duplicate))
+        self.assertEqual(copy.palette.colors, original.palette.colors)
+
+    @configurationtesting()
+    def test_jsonl(self):
+        """
+        A record must be written for each image, in order, and read back
+        lazily
+        """
+        duplicate = os.path.join(self.input_dir, "firewatch_copy.jpg")
+        shutil.copyfile(self.images[0], duplicate)
+        self.images.append(duplicate)
+        path = os.path.join(self.output_dir, "palettes.jsonl")
+        with open(path, "w") as jsonl_file:
+            failures = self.run_batch(2, deduplicate=True,
+                                      jsonl_file=jsonl_file)
+        self.assertEqual(failures, [self.images[1], self.images[3]])
+        self.assertEqual(os.listdir(self.output_dir), ["palettes.jsonl"])
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["path"] for r in records],
+                         [os.path.realpath(self.images[i])
+                          for i in [0, 4, 1, 2, 3]])
+        self.assertIn("error", records[2])
+        self.assertEqual(records[0]["hash"], cache.hash_file(self.images[0]))
+        self.assertEqual(set(records[0]["timings"]),
+                         {"extraction", "filters", "total"})
+        self.assertEqual(records[1]["duplicate_of"], records[0]["path"])
+        self.assertEqual(records[1]["colors"], records[0]["colors"])
+
+        palettes = list(palette.read_jsonl(path))
+        self.assertEqual([r["path"] for r, _ in palettes],
+                         [records[i]["path"] for i in [0, 1, 3]])
+        self.assertEqual(palettes[2][1].colors,
+                         [tuple(c) for c in records[3]["colors"]])
+
+    def test_output_path(self):
+        self.assertEqual(batch.output_path("dir/image.jpg", "/tmp"),
+                         "/tmp/image.json")
@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from hapycolor import cache
+from hapycolor import config
+from hapycolor import exceptions
+from tests.helpers import configurationtesting, generate_palette
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.image = os.path.join(self.directory, "image.jpg")
+        shutil.copyfile("./images/firewatch.jpg", self.image)
+        self.settings = {"num_colors": 150, "threshold": 20}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_and_put(self):
+        palette_cache = cache.PaletteCache(self.directory, max_size=2**20)
+        self.assertIsNone(palette_cache.get(self.image, self.settings))
+
+        palette = generate_palette(10)
+        palette.metadata["scale"] = 0.5
+        palette_cache.put(self.image, self.settings, palette)
+        cached = palette_cache.get(self.image, self.settings)
+        self.assertEqual(cached.colors, palette.colors)
+        self.assertEqual(cached.foreground, palette.foreground)
+        self.assertEqual(cached.background, palette.background)
+        self.assertEqual(cached.metadata, {"scale": 0.5})
+
+        other_settings = dict(self.settings, threshold=10)
+        self.assertIsNone(palette_cache.get(self.image, other_settings))
+        self.assertEqual((palette_cache.hits, palette_cache.misses), (1, 2))
+
+    def test_image_hash(self):
+        palette_cache = cache.PaletteCache(self.directory, max_size=2**20)
+        image_hash = palette_cache.image_hash(self.image)
+        self.assertEqual(image_hash, cache.hash_file(self.image))
+
+        # Unchanged mtime and size: the stored hash is trusted
+        with mock.patch("hapycolor.cache.hash_file") as hash_file:
+            self.assertEqual(palette_cache.image_hash(self.image), image_hash)
+            hash_file.assert_not_called()
+
+        with open(self.image, "ab") as f:
+            f.write(b"\0")
+        self.assertNotEqual(palette_cache.image_hash(self.image), image_hash)
+
+    def test_lru_eviction(self):
+        palette_cache = cache.PaletteCache(self.directory, max_size=2**20)
+        palette = generate_palette(10)
+        for i in range(3):
+            palette_cache.put(self.image, {"num_colors": i}, palette)
+        entries = palette_cache.entries()
+        entry_size = entries[0][1]
+
+        # Marks the first entry as the most recently used one
+        last_use = os.stat(entries[-1][0]).st_mtime_ns
+        os.utime(entries[0][0], ns=(0, last_use + 1))
+
+        # The stored hash of the image is kept
+        hint_size = sum(s for _, s in palette_cache.files()) - 3 * entry_size
+        palette_cache.max_size = 2 * entry_size + hint_size
+        palette_cache.evict()
+        self.assertEqual(len(palette_cache.entries()), 2)
+        self.assertIsNotNone(palette_cache.get(self.image, {"num_colors": 0}))
+        self.assertEqual(palette_cache.stats()["entries"], 2)
+
+    def test_hints_eviction(self):
+        """ The stored hashes of the images are counted and evicted too """
+        palette_cache = cache.PaletteCache(self.directory, max_size=2**20)
+        images = [self.image]
+        for i in range(3):
+            images.append(os.path.join(self.directory, "{}.jpg".format(i)))
+            with open(images[-1], "wb") as f:
+                f.write(bytes([i]))
+        for image in images:
+            palette_cache.image_hash(image)
+        files = palette_cache.files()
+        self.assertEqual(len(files), 4)
+        self.assertEqual(palette_cache.entries(), [])
+        self.assertEqual(palette_cache.stats()["size"],
+                         sum(s for _, s in files))
+
+        palette_cache.max_size = sum(s for _, s in files[2:])
+        palette_cache.evict()
+        self.assertEqual(palette_cache.files(), files[2:])
+
+    def test_running_size(self):
+        """
+        The cache is only measured by the first write, and by the evictions
+        """
+        palette_cache = cache.PaletteCache(self.directory, max_size=2**20)
+        palette = generate_palette(10)
+        with mock.patch.object(palette_cache, "files",
+                               wraps=palette_cache.files) as files:
+            for i in range(5):
+                palette_cache.put(self.image, {"num_colors": i}, palette)
+            self.assertEqual(files.call_count, 1)
+            self.assertEqual(palette_cache.size,
+                             sum(s for _, s in palette_cache.files()))
+
+            # Rewriting an entry and a hash hint only adds their difference
+            files.reset_mock()
+            bigger = generate_palette(20)
+            palette_cache.put(self.image, {"num_colors": 0}, bigger)
+            os.utime(self.image, ns=(0, 0))
+            palette_cache.put(self.image, {"num_colors": 0}, bigger)
+            self.assertEqual(files.call_count, 0)
+            self.assertEqual(palette_cache.size,
+                             sum(s for _, s in palette_cache.files()))
+
+            entry_size = palette_cache.entries()[0][1]
+            palette_cache.max_size = 3 * entry_size
+            files.reset_mock()
+            palette_cache.put(self.image, {"num_colors": 5}, palette)
+            self.assertEqual(files.call_count, 1)
+        self.assertLessEqual(palette_cache.size,
+                             cache.LOW_WATER * palette_cache.max_size)
+        self.assertEqual(palette_cache.size,
+                         sum(s for _, s in palette_cache.files()))
+
+    @configurationtesting()
+    def test_max_size(self):
+        self.assertEqual(cache.get_max_size(), cache.MAX_SIZE * 2**20)
+        config.ConfigurationManager.save("cache", {"max_size": "0.5"})
+        self.assertEqual(cache.get_max_size(), 2**19)
+        config.ConfigurationManager.save("cache", {"max_size": "big"})
+        with self.assertRaises(exceptions.InvalidConfigKeyError):
+            cache.get_max_size()
+
+    @configurationtesting()
+    def test_pipeline_settings(self):
+        settings = cache.pipeline_settings(150)
+        self.assertEqual(settings["num_colors"], 150)
+        self.assertEqual(settings["filters"], ["LumFilter", "Reducer"])
+        self.assertEqual(len(settings["hyperplans"]), 3)
+        self.assertEqual(settings["table_bits"], 8)
+
+        configuration = config.ConfigurationManager.load("hyperplan")
+        configuration["table_bits"] = "6"
+        config.ConfigurationManager.save("hyperplan", configuration)
+        self.assertNotEqual(cache.pipeline_settings(150), settings)
@@ -0,0 +1,96 @@
+import itertools
+import random
+import unittest
+
+import numpy as np
+
+from hapycolor import exceptions
+from hapycolor.targets import cluster1d
+
+
+class TestCluster1D(unittest.TestCase):
+    @staticmethod
+    def brute_force(values, K, distance):
+        """ The cost of the optimal medoids """
+        return min(sum(min(distance(v, m) for m in medoids) for v in values)
+                   for medoids in itertools.combinations(values, K))
+
+    @staticmethod
+    def cost(clusters, distance):
+        return sum(distance(m[0], c[0]) for m in clusters for c in clusters[m])
+
+    def test_linear(self):
+        colors = [(1,), (22,), (2,), (8,), (3,), (7,), (21,), (9,), (20,)]
+        res = cluster1d.linear(colors, 3, lambda c: c[0])
+        self.assertDictEqual(res, {(2,): [(1,), (2,), (3,)],
+                                   (8,): [(7,), (8,), (9,)],
+                                   (21,): [(20,), (21,), (22,)]})
+
+    def test_circular(self):
+        """ The clusters wrap around the period """
+        colors = [(350,), (355,), (5,), (10,), (170,), (180,), (190,)]
+        res = cluster1d.circular(colors, 2, lambda c: c[0])
+        self.assertEqual(len(res), 2)
+        self.assertEqual(sorted(res[(180,)]), [(170,), (180,), (190,)])
+        wrapped = [members for m, members in res.items() if m != (180,)][0]
+        self.assertEqual(sorted(wrapped), [(5,), (10,), (350,), (355,)])
+
+    def test_optimal(self):
+        rng = random.Random(0)
+
+        def linear(v_1, v_2):
+            return abs(v_1 - v_2)
+
+        def circular(v_1, v_2):
+            return min(abs(v_1 - v_2), 360 - abs(v_1 - v_2))
+
+        for _ in range(100):
+            n = rng.randint(1, 8)
+            K = rng.randint(1, n)
+            colors = [(rng.randint(0, 359), i) for i in range(n)]
+            values = [c[0] for c in colors]
+            for method, distance in [(cluster1d.linear, linear),
+                                     (cluster1d.circular, circular)]:
+                res = method(colors, K, lambda c: c[0])
+                self.assertEqual(len(res), K)
+                self.assertEqual(sorted(c for m in res for c in res[m]),
+                                 sorted(colors))
+                for m in res:
+                    self.assertIn(m, res[m])
+                self.assertEqual(TestCluster1D.cost(res, distance),
+                                 TestCluster1D.brute_force(values, K,
+                                                           distance))
+
+    def test_large(self):
+        """
+        The dynamic programming by divide and conquer finds the cost of the
+        exhaustive one, and trying the cuts within the smallest segment of a
+        cut finds the best cut
+        """
+        rng = np.random.RandomState(0)
+        for _ in range(30):
+            n = rng.randint(2, 120)
+            K = rng.randint(1, min(n, 12) + 1)
+            values = np.sort(rng.randint(0, 60, n)).astype(np.float64)
+
+            prefix = np.concatenate([[0], np.cumsum(values)])
+            best = np.full(n + 1, np.inf)
+            best[0] = 0
+            for _ in range(K):
+                best = np.array([min([best[i] + cluster1d.segment_costs(
+                    values, prefix, i, j) for i in range(j)] or [np.inf])
+                    for j in range(n + 1)])
+            self.assertEqual(cluster1d.partition(values, K)[1][0], best[n])
+
+            colors = [(v, i) for i, v in enumerate(values * 6)]
+            res = cluster1d.circular(colors, K, lambda c: c[0])
+            unrolled = np.concatenate([values, values + 60]) * 6
+            _, costs = cluster1d.partition(unrolled, K, range(n), n)
+            self.assertEqual(sum(min(abs(m[0] - c[0]), 360 - abs(m[0] - c[0]))
+                                 for m in res for c in res[m]), costs.min())
+
+    def test_too_many_clusters(self):
+        with self.assertRaises(exceptions.PAMException):
+            cluster1d.linear([(1,), (2,)], 3, lambda c: c[0])
+        with self.assertRaises(exceptions.PAMException):
+            cluster1d.circular([(1,), (2,)], 0, lambda c: c[0])
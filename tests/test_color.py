@@ -0,0 +1,95 @@
+from colormath.color_conversions import convert_color
+from colormath.color_objects import LabColor, LCHabColor, sRGBColor
+from hapycolor import color
+from hapycolor import helpers
+import numpy as np
+import unittest
+
+
+class TestColor(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.colors = np.concatenate([random.randint(0, 256, (200, 3)),
+                                      [[0, 0, 0], [255, 255, 255],
+                                       [128, 128, 128], [33, 9, 12]]])
+
+    def test_gamma_table(self):
+        """
+        The table must hold the linear value of each channel, and be used for
+        the integer colors
+        """
+        self.assertEqual(color.GAMMA_TABLE.shape, (256,))
+        np.testing.assert_allclose(
+            color.GAMMA_TABLE,
+            color.srgb_to_linear(np.arange(256) / 255.))
+        np.testing.assert_allclose(color.rgb_to_linear(self.colors),
+                                   color.rgb_to_linear(self.colors * 1.))
+
+    def test_rgb_to_lab(self):
+        """ The conversion must match colormath's one """
+        lab = color.rgb_to_lab(self.colors)
+        self.assertEqual(lab.shape, self.colors.shape)
+        for c, l in zip(self.colors, lab):
+            expected = convert_color(sRGBColor(*c, is_upscaled=True),
+                                     LabColor)
+            np.testing.assert_allclose(l, expected.get_value_tuple(),
+                                       atol=1e-9)
+
+    def test_lab_to_lch(self):
+        """ The conversion must match colormath's one """
+        lch = color.rgb_to_lch(self.colors)
+        for l, c in zip(color.rgb_to_lab(self.colors), lch):
+            expected = convert_color(LabColor(*l), LCHabColor)
+            if expected.lch_c > 1e-6:
+                np.testing.assert_allclose(c, expected.get_value_tuple(),
+                                           atol=1e-9)
+
+    def test_round_trips(self):
+        """ Converting a color back and forth must give the same color """
+        round_trips = [(color.rgb_to_xyz, color.xyz_to_rgb, 1e-2),
+                       (color.rgb_to_lab, color.lab_to_rgb, 1e-2),
+                       (color.rgb_to_lch, color.lch_to_rgb, 1e-2),
+                       (color.rgb_to_oklab, color.oklab_to_rgb, 1e-6),
+                       (color.rgb_to_hsl, color.hsl_to_rgb, 1e-6)]
+        for forward, backward, tolerance in round_trips:
+            np.testing.assert_allclose(backward(forward(self.colors)),
+                                       self.colors, atol=tolerance)
+
+    def test_oklab_white(self):
+        """ The white must have a unit lightness and no chroma """
+        np.testing.assert_allclose(color.rgb_to_oklab([[255, 255, 255]]),
+                                   [[1, 0, 0]], atol=1e-6)
+
+    def test_shapes(self):
+        """ A single color, or a grid of colors, must be converted """
+        self.assertEqual(color.rgb_to_lab((12, 34, 56)).shape, (3,))
+        grid = self.colors[:200].reshape(10, 20, 3)
+        np.testing.assert_allclose(color.rgb_to_oklab(grid),
+                                   color.rgb_to_oklab(self.colors[:200])
+                                   .reshape(10, 20, 3))
+
+    def test_rgb_to_hsl_decimals(self):
+        """
+        The rounded hues must match the scalar helper, which rounds the hues
+        before bringing them back between 0 and 360
+        """
+        hsl = color.rgb_to_hsl(self.colors, decimals=0)
+        for c, h in zip(self.colors, hsl):
+            expected = helpers.rgb_to_hsl(tuple(int(e) for e in c))
+            self.assertEqual(tuple(h), expected)
+        # -7.5 is rounded to -8, and not 352.5 to 352
+        self.assertEqual(helpers.rgb_to_hsl((33, 9, 12))[0], 353)
+
+    def test_legacy_lab(self):
+        """
+        The helpers must keep converting the rgb colors as colormath does
+        when the channels of an `sRGBColor` are not upscaled
+        """
+        for c in self.colors[:50]:
+            c = tuple(int(e) for e in c)
+            lab = helpers.rgb_to_lab(c)
+            self.assertIsInstance(lab, LabColor)
+            expected = convert_color(sRGBColor(*c), LabColor)
+            np.testing.assert_allclose(lab.get_value_tuple(),
+                                       expected.get_value_tuple(), rtol=1e-12)
+            self.assertEqual(helpers.lab_to_rgb(lab), c)
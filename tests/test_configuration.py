@@ -9,5 +9,6 @@ class TestConfiguration(unittest.TestCase):
 
         configuration = configparser.ConfigParser()
         configuration.read(config.get_default_config())
-        expected_sections = ["hyperplan"]
+        expected_sections = ["hyperplan", "extraction", "clustering", "cache",
+                             "dedup", "reducer"]
         self.assertEqual(set(expected_sections), set(configuration.sections()))
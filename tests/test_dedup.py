@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from hapycolor import config
+from hapycolor import dedup
+from hapycolor import exceptions
+from tests.helpers import configurationtesting
+
+
+class TestDedup(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_perceptual_hash(self):
+        """
+        A resized, re-encoded or slightly cropped copy of an image must have
+        a close hash, unlike another image
+        """
+        original = dedup.perceptual_hash("./images/firewatch.jpg")
+        with Image.open("./images/firewatch.jpg") as image:
+            width, height = image.size
+            copies = [image.resize((width // 3, height // 3)),
+                      image.crop((width // 50, 0, width, height))]
+        paths = [os.path.join(self.directory, "resized.png"),
+                 os.path.join(self.directory, "cropped.jpg")]
+        for copy, path in zip(copies, paths):
+            copy.save(path, quality=60)
+            self.assertLessEqual(
+                dedup.hamming(original, dedup.perceptual_hash(path)),
+                dedup.MAX_DISTANCE)
+        self.assertGreater(
+            dedup.hamming(original,
+                          dedup.perceptual_hash("./images/taipei.jpg")),
+            dedup.MAX_DISTANCE)
+
+        path = os.path.join(self.directory, "corrupted.png")
+        with open(path, "wb") as f:
+            f.write(b"not an image")
+        self.assertIsNone(dedup.perceptual_hash(path))
+        with mock.patch("hapycolor.dedup.Image.open",
+                        side_effect=Image.DecompressionBombError("bomb")):
+            self.assertIsNone(dedup.perceptual_hash("./images/taipei.jpg"))
+
+    def test_multi_index(self):
+        """ The search must find the same hashes as an exhaustive search """
+        random = np.random.RandomState(0)
+        hashes = [int(h) for h in random.randint(0, 2**62, 500)]
+        # Hashes differing from the first ones by 9 bits, spread over the
+        # chunks so that none of them differs by less than 2 bits
+        hashes += [h ^ 0x0007000300030003 for h in hashes[:20]]
+        index = dedup.MultiIndex(9)
+        for i, h in enumerate(hashes):
+            index.add(h, i)
+        for query in hashes[:20]:
+            expected = sorted((dedup.hamming(query, h), i)
+                              for i, h in enumerate(hashes)
+                              if dedup.hamming(query, h) <= 9)
+            self.assertEqual(len(expected), 2)
+            self.assertEqual(sorted(index.search(query)), expected)
+
+    def test_group(self):
+        """
+        An image must join the group of its closest representative, and the
+        images without hash must be left alone
+        """
+        images = ["a", "b", "c", "d", "e"]
+        hashes = [0b0, 0b1111, 0b0011, None, 0b1110]
+        groups = dedup.group(images, hashes, 2)
+        self.assertEqual(list(groups.items()),
+                         [("a", ["c"]), ("b", ["e"]), ("d", [])])
+
+    @configurationtesting()
+    def test_get_max_distance(self):
+        self.assertEqual(dedup.get_max_distance(), 8)
+        for value in ["-1", "65", "many"]:
+            configuration = config.ConfigurationManager.load("dedup")
+            configuration["max_distance"] = value
+            config.ConfigurationManager.save("dedup", configuration)
+            with self.assertRaises(exceptions.InvalidConfigKeyError):
+                dedup.get_max_distance()
@@ -0,0 +1,137 @@
+import itertools
+import random
+import time
+import unittest
+
+import networkx as nx
+
+from hapycolor.filters import independent_set as mis
+
+
+class TestIndependentSet(unittest.TestCase):
+    def assert_independent(self, graph, nodes):
+        self.assertEqual(len(set(nodes)), len(nodes))
+        for n_1, n_2 in itertools.combinations(nodes, 2):
+            self.assertFalse(graph.has_edge(n_1, n_2))
+
+    def assert_maximal(self, graph, nodes):
+        for node in set(graph) - set(nodes):
+            self.assertTrue(any(graph.has_edge(node, n) for n in nodes))
+
+    @staticmethod
+    def brute_force(graph):
+        nodes = list(graph)
+        for size in range(len(nodes), 0, -1):
+            for subset in itertools.combinations(nodes, size):
+                if not any(graph.has_edge(n_1, n_2) for n_1, n_2
+                           in itertools.combinations(subset, 2)):
+                    return size
+        return 0
+
+    def test_exact(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            graph = nx.gnp_random_graph(rng.randint(1, 12), rng.random(),
+                                        seed=rng.randint(0, 1000))
+            result = mis.maximum_independent_set(graph)
+            self.assert_independent(graph, result)
+            self.assertEqual(len(result), TestIndependentSet.brute_force(graph))
+
+    def test_empty_and_complete(self):
+        self.assertEqual(mis.maximum_independent_set(nx.Graph()), [])
+        self.assertEqual(mis.maximum_independent_set(nx.complete_graph(5)),
+                         [0])
+        graph = nx.Graph()
+        graph.add_nodes_from([(1, 2, 3), (4, 5, 6)])
+        self.assertEqual(mis.maximum_independent_set(graph),
+                         [(1, 2, 3), (4, 5, 6)])
+
+    def test_self_loops(self):
+        graph = nx.Graph([(0, 0), (0, 1), (2, 2)])
+        self.assertEqual(mis.maximum_independent_set(graph), [0, 2])
+
+    def test_no_truncation(self):
+        """ Large graphs are not truncated, whatever their size """
+        graph = nx.cycle_graph(300)
+        for exact_size in [0, 300]:
+            result = mis.maximum_independent_set(graph, exact_size,
+                                                 time_budget=0.2)
+            self.assert_independent(graph, result)
+            self.assertEqual(len(result), 150)
+
+    def test_local_search(self):
+        """
+        The local search improves the greedy solution and respects the time
+        budget
+        """
+        graph = nx.random_geometric_graph(600, 0.08, seed=1)
+        masks = mis.neighbourhoods(graph, list(graph))
+        greedy = mis.popcount(mis.greedy(masks, (1 << len(masks)) - 1))
+
+        start = time.monotonic()
+        result = mis.maximum_independent_set(graph, exact_size=0,
+                                             time_budget=0.3)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assert_independent(graph, result)
+        self.assert_maximal(graph, result)
+        self.assertGreaterEqual(len(result), greedy)
+        self.assertEqual(result, sorted(result))
+
+    def test_exact_timeout(self):
+        """
+        When the exact search exceeds the time budget, the best set found is
+        returned
+        """
+        graph = nx.gnp_random_graph(60, 0.1, seed=3)
+        result = mis.maximum_independent_set(graph, time_budget=0)
+        self.assert_independent(graph, result)
+        self.assert_maximal(graph, result)
+
+    def test_matrix_neighbourhoods(self):
+        graph = nx.gnp_random_graph(70, 0.2, seed=5)
+        graph.add_edge(3, 3)
+        matrix = nx.to_numpy_array(graph, nodelist=range(70)) > 0
+        self.assertEqual(mis.matrix_neighbourhoods(matrix),
+                         mis.neighbourhoods(graph, list(range(70))))
+
+    def test_clique_cover(self):
+        masks = mis.neighbourhoods(nx.complete_graph(4), list(range(4)))
+        self.assertEqual(mis.clique_cover(masks, 0b1111), 1)
+        graph = nx.Graph()
+        graph.add_nodes_from(range(3))
+        masks = mis.neighbourhoods(graph, list(range(3)))
+        self.assertEqual(mis.clique_cover(masks, 0b111), 3)
+
+    def test_stalls(self):
+        """
+        The local search stops once it stops improving, well before a large
+        time budget, and its result only depends on the seed
+        """
+        graph = nx.random_geometric_graph(300, 0.1, seed=2)
+        start = time.monotonic()
+        result = mis.maximum_independent_set(graph, exact_size=0,
+                                             time_budget=60)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assert_independent(graph, result)
+        self.assert_maximal(graph, result)
+        for _ in range(2):
+            self.assertEqual(mis.maximum_independent_set(graph, exact_size=0,
+                                                         time_budget=60),
+                             result)
+
+    def test_improve_pending(self):
+        """
+        Once a node left a locally optimal solution, checking the nodes
+        around it is enough to find a maximal solution again
+        """
+        graph = nx.random_geometric_graph(200, 0.12, seed=4)
+        masks = mis.neighbourhoods(graph, list(graph))
+        adjacency = [mis.nodes_of(mask) for mask in masks]
+        solution = mis.improve(masks, mis.greedy(masks, (1 << 200) - 1))
+        self.assertEqual(mis.improve(masks, solution), solution)
+        for node in mis.nodes_of(solution)[:10]:
+            removed = solution & ~(1 << node)
+            pending = mis.touched(masks, adjacency, removed, 1 << node)
+            result = mis.improve(masks, removed, pending, adjacency)
+            self.assertEqual(mis.popcount(result), mis.popcount(solution))
+            self.assertEqual(mis.improve(masks, result), result)
@@ -5,6 +5,8 @@ from tests.helpers import configurationtesting
 from hapycolor.filters import lum_filter as lf
 from scipy import interpolate
 import os
+import pickle
+import threading
 import unittest
 import numpy as np
 from unittest.mock import patch
@@ -221,3 +223,57 @@ class TestLumFilter(unittest.TestCase):
         not_dark = [(0, 0, 1), (0, 1, 1), (300, 0.5, 0.7), (0, 0, 0.5), (200, 0.2, 0.6)]
         for c in [helpers.hsl_to_rgb(c) for c in not_dark]:
             self.assertFalse(lf.LumFilter.analyze(c, kind="darkness"))
+
+    @configurationtesting()
+    def test_initialization_reuse(self):
+        """ The hyperplans are only interpolated when their files change """
+        lf.LumFilter.hyperplans = None
+        with patch("hapycolor.filters.lum_filter.Hyperplans",
+                   wraps=lf.Hyperplans) as hyperplans:
+            threads = [threading.Thread(target=lf.LumFilter.initialization)
+                       for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            first = lf.LumFilter.initialization()
+            self.assertEqual(hyperplans.call_count, 1)
+
+            key = tuple((p, m + 1) for p, m in lf.hyperplans_key())
+            with patch("hapycolor.filters.lum_filter.hyperplans_key",
+                       return_value=key):
+                second = lf.LumFilter.initialization()
+            self.assertEqual(hyperplans.call_count, 2)
+        self.assertIsNot(first, second)
+        self.assertIs(lf.LumFilter.dark_interp, second.dark_interp)
+
+    @configurationtesting()
+    def test_hyperplans_pickle(self):
+        hyperplans = lf.LumFilter.initialization()
+        colors = [(12, 200, 99), (250, 250, 250), (10, 10, 10), (90, 80, 85)]
+        kinds = ["brightness", "darkness", "saturation"]
+        expected = [[lf.LumFilter.analyze(c, k) for k in kinds]
+                    for c in colors]
+
+        lf.LumFilter.install(pickle.loads(pickle.dumps(hyperplans)))
+        self.assertEqual(lf.LumFilter.hyperplans.key, hyperplans.key)
+        self.assertEqual([[lf.LumFilter.analyze(c, k) for k in kinds]
+                          for c in colors], expected)
+
+    @configurationtesting()
+    def test_mask(self):
+        colors = np.random.RandomState(0).randint(0, 256, (200, 3))
+        kinds = ["brightness", "darkness", "saturation"]
+        with patch("hapycolor.filters.lum_table.get_bits", return_value=0):
+            mask = lf.LumFilter.mask(colors)
+        self.assertEqual(mask.shape, (200, 3))
+        for c, verdicts in zip(colors, mask):
+            c = tuple(int(e) for e in c)
+            self.assertEqual([bool(lf.LumFilter.analyze(c, k))
+                              for k in kinds], list(verdicts))
+        self.assertEqual(lf.LumFilter.mask([]).shape, (0, 3))
+
+        for colors in [[(0, 0.5, 1)], [(256, 0, 0)], [(-1, 0, 0)],
+                       [(0, 0)], (0, 0, 0)]:
+            with self.assertRaises(exceptions.ColorFormatError):
+                lf.LumFilter.mask(colors)
@@ -0,0 +1,142 @@
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from hapycolor import config
+from hapycolor import exceptions
+from hapycolor import palette as pltte
+from hapycolor.filters import lum_filter as lf
+from hapycolor.filters import lum_table as lt
+from tests.helpers import configurationtesting, disableprints
+
+
+class TestLumTable(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        paths = [pathlib.Path(self.directory) / "hyperplan" / "lum.lut",
+                 pathlib.Path(self.directory) / "cache" / "lum.lut"]
+        self.paths = paths
+        self.table_paths = mock.patch(
+                "hapycolor.filters.lum_table.table_paths",
+                lambda bits, p: paths)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        lf.LumFilter.table = None
+
+    def scalar_verdicts(self, colors):
+        return [[bool(lf.LumFilter.analyze(tuple(int(e) for e in c), kind))
+                 for kind in lt.ANALYSES] for c in colors]
+
+    @configurationtesting()
+    def test_evaluate(self):
+        """ The vectorized evaluation must match :func:`LumFilter.analyze` """
+        lf.LumFilter.initialization()
+        colors = np.random.RandomState(0).randint(0, 256, (300, 3))
+        colors = np.vstack([colors, lt.cube(2), [[0, 0, 0], [255, 255, 255]]])
+        self.assertEqual(lt.evaluate(colors).tolist(),
+                         self.scalar_verdicts(colors))
+
+    def test_rgb_to_hsl(self):
+        colors = [(0, 0, 0), (255, 255, 255), (255, 0, 0), (12, 200, 99),
+                  (250, 12, 255), (30, 30, 31)]
+        hsl = lt.rgb_to_hsl(np.array(colors))
+        for c, h in zip(colors, hsl):
+            for i, e in enumerate(lf.helpers.rgb_to_hsl(c)):
+                self.assertAlmostEqual(h[i], e)
+
+    def test_cube(self):
+        cube = lt.cube(1)
+        self.assertEqual(cube.tolist(),
+                         [[64, 64, 64], [64, 64, 192], [64, 192, 64],
+                          [64, 192, 192], [192, 64, 64], [192, 64, 192],
+                          [192, 192, 64], [192, 192, 192]])
+        self.assertEqual(len(lt.cube(8)), 2**24)
+
+    @configurationtesting()
+    def test_lookup(self):
+        """
+        The verdicts stored in the table are those of the centers of the
+        cells of the cube
+        """
+        with self.table_paths, disableprints():
+            table = lt.LumTable.load(4)
+        colors = lt.cube(4)
+        np.testing.assert_array_equal(table(colors), lt.evaluate(colors))
+
+        samples = colors[::37]
+        self.assertEqual(table(samples).tolist(),
+                         self.scalar_verdicts(samples))
+        # Every color of a cell shares the verdicts of its center
+        np.testing.assert_array_equal(table(samples - 8), table(samples))
+        np.testing.assert_array_equal(table(samples + 7), table(samples))
+
+    @configurationtesting()
+    def test_load(self):
+        with self.table_paths, disableprints():
+            table = lt.LumTable.load(3)
+            self.assertTrue(self.paths[0].exists())
+
+            with mock.patch("hapycolor.filters.lum_table.LumTable.compile") \
+                    as compile_:
+                loaded = lt.LumTable.load(3)
+                compile_.assert_not_called()
+            self.assertIsInstance(loaded.masks, np.memmap)
+            np.testing.assert_array_equal(loaded.masks, table.masks)
+
+            # The hyperplans changed
+            with mock.patch("hapycolor.filters.lum_table.digest",
+                            return_value=b"0" * 32):
+                lt.LumTable.load(3)
+            with open(self.paths[0].as_posix(), "rb") as f:
+                header = lt.HEADER.unpack(f.read(lt.HEADER.size))
+            self.assertEqual(header, (lt.MAGIC, lt.VERSION, 3, b"0" * 32))
+
+    @configurationtesting()
+    def test_load_read_only(self):
+        """
+        The table is stored in the cache directory if the hyperplans'
+        directory is not writable
+        """
+        # The table cannot be written in a file
+        self.paths[0].parent.touch()
+        with self.table_paths, disableprints():
+            lt.LumTable.load(2)
+        self.assertTrue(self.paths[1].exists())
+
+    @configurationtesting()
+    def test_get_bits(self):
+        self.assertEqual(lt.get_bits(), lt.BITS)
+        config.ConfigurationManager.save("hyperplan", {"table_bits": 0})
+        self.assertEqual(lt.get_bits(), 0)
+        for value in ["9", "-1", "six"]:
+            config.ConfigurationManager.save("hyperplan",
+                                             {"table_bits": value})
+            with self.assertRaises(exceptions.InvalidConfigKeyError):
+                lt.get_bits()
+
+    @configurationtesting()
+    def test_apply(self):
+        """
+        Filtering with the table yields the same palette as filtering
+        without it, for colors located at the center of the table's cells
+        """
+        colors = [tuple(int(e) for e in c) for c in lt.cube(5)[::53]]
+
+        palettes = []
+        for bits in [5, 0]:
+            palette = pltte.Palette()
+            palette.foreground = (250, 250, 250)
+            palette.background = (8, 8, 40)
+            palette.colors = list(colors)
+            with self.table_paths, disableprints(), \
+                    mock.patch("hapycolor.filters.lum_table.get_bits",
+                               return_value=bits):
+                palettes.append(lf.LumFilter.apply(palette))
+        self.assertEqual(palettes[0].colors, palettes[1].colors)
+        self.assertEqual(palettes[0].background, palettes[1].background)
+        self.assertLess(len(palettes[0].colors), len(colors))
@@ -1,4 +1,5 @@
 from hapycolor import palette, exceptions, helpers
+import numpy as np
 import unittest
 from tests.helpers import disableprints
 import os
@@ -61,3 +62,85 @@ class TestPalette(unittest.TestCase):
             self.assertEqual(new_palette.background, pltte.background)
             self.assertEqual(new_palette.colors, pltte.colors)
         os.remove(json_file)
+
+    def test_array(self):
+        """ The colors must be stored once, and exposed without copy """
+        pltte = palette.Palette([(0, 1, 2), (255, 128, 3)])
+        array = pltte.array
+        self.assertEqual(array.dtype, np.uint8)
+        self.assertEqual(array.tolist(), [[0, 1, 2], [255, 128, 3]])
+        self.assertTrue(np.shares_memory(array, pltte.array))
+        with self.assertRaises(ValueError):
+            array[0, 0] = 1
+        self.assertEqual(pltte.colors, [(0, 1, 2), (255, 128, 3)])
+        self.assertEqual(len(pltte), 2)
+
+        pltte.colors = np.array([[1, 2, 3]])
+        self.assertEqual(pltte.colors, [(1, 2, 3)])
+        for invalid in [np.array([[1., 2., 3.]]), np.array([[1, 2, 256]]),
+                        np.array([1, 2, 3]), [(1, 2, 3), (1, 2)]]:
+            with self.subTest(line=invalid):
+                with self.assertRaises(exceptions.ColorFormatError):
+                    pltte.colors = invalid
+        with self.assertRaises(AttributeError):
+            pltte.attribute = None
+
+    def test_weights(self):
+        pltte = palette.Palette([(0, 0, 0), (1, 1, 1), (2, 2, 2)],
+                                [0.5, 0.2, 0.3])
+        self.assertEqual(pltte.weights.tolist(), [0.5, 0.2, 0.3])
+        for invalid in [[1, 2], [1, -1, 2], [1, float("nan"), 2]]:
+            with self.subTest(line=invalid):
+                with self.assertRaises(exceptions.PaletteFormatError):
+                    pltte.weights = invalid
+
+        pltte.select(np.array([True, False, True]))
+        self.assertEqual(pltte.colors, [(0, 0, 0), (2, 2, 2)])
+        self.assertEqual(pltte.weights.tolist(), [0.5, 0.3])
+        pltte.select([1])
+        self.assertEqual(pltte.colors, [(2, 2, 2)])
+        self.assertEqual(pltte.weights.tolist(), [0.3])
+
+        pltte.colors = [(3, 3, 3)]
+        self.assertIsNone(pltte.weights)
+
+    def test_iterator(self):
+        """ Each iterator must cycle over the colors independently """
+        pltte = palette.Palette([(0, 0, 0), (1, 1, 1)])
+        first, second = iter(pltte), iter(pltte)
+        self.assertEqual([next(first) for _ in range(3)],
+                         [(0, 0, 0), (1, 1, 1), (0, 0, 0)])
+        self.assertEqual(next(second), (0, 0, 0))
+        self.assertIs(first.palette, pltte)
+
+    @disableprints()
+    def test_json_weights(self):
+        pltte = palette.Palette([(12, 12, 12), (15, 15, 15)], [0.25, 0.75])
+        pltte.foreground = (255, 255, 255)
+        pltte.background = (0, 0, 0)
+        json_file = "./tests/test_palette_weights.json"
+        pltte.to_json(json_file)
+        new_palette = palette.Palette.from_json(json_file)
+        os.remove(json_file)
+        self.assertEqual(new_palette.colors, pltte.colors)
+        self.assertEqual(new_palette.weights.tolist(), [0.25, 0.75])
+
+    def test_read_jsonl(self):
+        """
+        The palettes must be read line by line, without the failed images
+        """
+        jsonl_file = "./tests/test_palette.jsonl"
+        with open(jsonl_file, "w") as f:
+            f.write('{"path":"/a.jpg","foreground":[255,255,255],'
+                    '"background":[0,0,0],"colors":[[1,2,3],[4,5,6]]}\n'
+                    '{"path":"/b.png","error":"grayscale"}\n'
+                    '\n'
+                    'not json\n')
+        records = palette.read_jsonl(jsonl_file)
+        record, pltte = next(records)
+        self.assertEqual(record["path"], "/a.jpg")
+        self.assertEqual(pltte.colors, [(1, 2, 3), (4, 5, 6)])
+        self.assertEqual(pltte.background, (0, 0, 0))
+        with self.assertRaises(exceptions.PaletteFormatError):
+            next(records)
+        os.remove(jsonl_file)
@@ -1,10 +1,17 @@
 import contextlib
+import itertools
+import random
 import unittest
 from unittest import mock
 from colormath.color_diff import delta_e_cie2000
+import numpy as np
 
+from hapycolor import config
+from hapycolor import exceptions
 from hapycolor import helpers
-from hapycolor.targets.pam import PAM
+from hapycolor.targets import pam
+from hapycolor.targets.pam import CLARA, PAM
+from tests.helpers import configurationtesting
 
 class TestPAM(unittest.TestCase):
     def distance(c_1, c_2):
@@ -55,6 +62,122 @@ class TestPAM(unittest.TestCase):
         res = PAM(colors, k, TestPAM.distance)()
         self.assertDictEqual(res, expected)
 
+    def test_1_cluster_swap(self):
+        """ The swap phase terminates with a single medoid """
+        colors = [5, 1, 2, 3, 9]
+        res = PAM(colors, 1, TestPAM.distance)()
+        self.assertEqual(list(res), [3])
+        self.assertEqual(sorted(res[3]), sorted(colors))
+
+    def test_matrix(self):
+        colors = [1, 2, 3, 7, 8, 9, 20, 21, 22]
+        matrix = pam.distance_matrix(colors, TestPAM.distance)
+        self.assertEqual(matrix[0, 3], 6)
+        self.assertEqual(matrix[3, 0], 6)
+        self.assertDictEqual(PAM(colors, 3, matrix=matrix)(),
+                             PAM(colors, 3, TestPAM.distance)())
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(exceptions.PAMException):
+            PAM([1, 2, 3], 2)
+        with self.assertRaises(exceptions.PAMException):
+            PAM([1, 2, 3], 2, matrix=[[0, 1], [1, 0]])
+
+    def test_swap_effects(self):
+        """
+        The effects of the swaps, computed from the cached dissimilarities,
+        match the variations of the total dissimilarity
+        """
+        rng = random.Random(0)
+        colors = [(rng.random(), rng.random()) for _ in range(30)]
+
+        def distance(c_1, c_2):
+            return ((c_1[0] - c_2[0]) ** 2 + (c_1[1] - c_2[1]) ** 2) ** .5
+
+        for k in [1, 2, 5]:
+            clustering = PAM(colors, k, distance)
+            clustering._build()
+            effects = clustering._swap_effects()
+            total = clustering.total_dissimilarity()
+            medoids, others = clustering.medoids, clustering.others
+            for (i, m), (h, o) in itertools.product(enumerate(medoids),
+                                                    enumerate(others)):
+                swapped = [o if c == m else c for c in medoids]
+                expected = clustering.matrix[:, swapped].min(axis=1).sum()
+                self.assertAlmostEqual(effects[i, h], expected - total)
+
+    def test_optimal(self):
+        """ PAM finds the optimal medoids of small sets of points """
+        rng = random.Random(1)
+        colors = [(rng.randint(0, 50), rng.randint(0, 50)) for _ in range(12)]
+
+        def distance(c_1, c_2):
+            return abs(c_1[0] - c_2[0]) + abs(c_1[1] - c_2[1])
+
+        clustering = PAM(colors, 3, distance)
+        clustering()
+        best = min(clustering.matrix[:, list(medoids)].min(axis=1).sum()
+                   for medoids in itertools.combinations(range(12), 3))
+        self.assertEqual(clustering.total_dissimilarity(), best)
+
+    @configurationtesting()
+    def test_sampling_size(self):
+        self.assertEqual(pam.get_sampling_size(), pam.SAMPLING_SIZE)
+        config.ConfigurationManager.save("clustering",
+                                         {"sampling_size": "0"})
+        self.assertEqual(pam.get_sampling_size(), 0)
+        config.ConfigurationManager.save("clustering",
+                                         {"sampling_size": "-1"})
+        with self.assertRaises(exceptions.InvalidConfigKeyError):
+            pam.get_sampling_size()
+
+    def test_clustering(self):
+        colors = list(range(20))
+        with mock.patch("hapycolor.targets.pam.get_sampling_size",
+                        return_value=10):
+            self.assertIsInstance(pam.clustering(colors, 2, TestPAM.distance),
+                                  CLARA)
+            self.assertIsInstance(pam.clustering(colors[:10], 2,
+                                                 TestPAM.distance), PAM)
+        with mock.patch("hapycolor.targets.pam.get_sampling_size",
+                        return_value=0):
+            self.assertIsInstance(pam.clustering(colors, 2, TestPAM.distance),
+                                  PAM)
+
+    def test_clara(self):
+        """
+        CLARA finds well separated clusters, deterministically, and its
+        total dissimilarity is the one of the returned clusters
+        """
+        rng = random.Random(0)
+        centers = [0, 1000, 2000]
+        colors = [c + rng.randint(-50, 50) for c in centers for _ in range(200)]
+        colors = list(set(colors))
+
+        def metric(colors_1, colors_2):
+            return abs(np.subtract.outer(colors_1, colors_2))
+
+        clustering = CLARA(colors, 3, metric=metric)
+        res = clustering()
+        self.assertEqual(res, CLARA(colors, 3, TestPAM.distance)())
+        self.assertEqual(sorted(len(c) for c in res.values()),
+                         sorted(sum(abs(c - x) <= 50 for c in colors)
+                                for x in centers))
+        self.assertEqual(sum(len(c) for c in res.values()), len(colors))
+        self.assertAlmostEqual(clustering.total_dissimilarity(),
+                               sum(abs(m - c) for m in res for c in res[m]))
+
+    def test_clara_small(self):
+        """ A sample containing all the colors gives PAM's result """
+        colors = [1, 2, 3, 7, 8, 9, 20, 21, 22]
+        clustering = CLARA(colors, 3, TestPAM.distance)
+        res = clustering()
+        for k in res:
+            res[k] = sorted(res[k])
+        self.assertDictEqual(res, {2: [1, 2, 3], 8: [7, 8, 9],
+                                   21: [20, 21, 22]})
+        self.assertEqual(clustering.total_dissimilarity(), 6)
+
     @unittest.skip("fixed in the next pull request")
     def test_3_clusters_3_colors_rgb(self):
         colors = [(0, 0, 0), (100, 100, 100), (255, 255, 255)]
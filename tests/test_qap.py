@@ -1,5 +1,11 @@
+import itertools
+import random
+import time
 import unittest
-from hapycolor.targets.vim.qap import QAP, Node
+from unittest import mock
+import numpy as np
+from hapycolor.targets.vim import qap as qap_module
+from hapycolor.targets.vim.qap import QAP, ExactQAP, HeuristicQAP, Node
 from hapycolor import helpers
 
 class TestQAP(unittest.TestCase):
@@ -68,3 +74,121 @@ class TestQAP(unittest.TestCase):
         self.assertIn(expected_1, res)
         expected_2 = (colors[2], 0.4)
         self.assertIn(expected_2, res)
+
+
+class TestExactQAP(TestQAP):
+    """ Runs the tests of :class:`QAP` with :class:`ExactQAP` """
+    def setUp(self):
+        patcher = mock.patch(__name__ + ".QAP", ExactQAP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hue_distances(self):
+        colors = [(50, 0.2, 0.5), (100, 0.2, 0.5), (359, 0.2, 0.5),
+                  (0, 0.2, 0.5)]
+        distances = qap_module.hue_distances(colors)
+        for i, j in itertools.product(range(4), repeat=2):
+            self.assertEqual(distances[i, j],
+                             Node.distance(colors[i], colors[j]))
+
+    def test_optimal(self):
+        """
+        The exhaustive evaluation and the branch and bound search find the
+        optimal assignment
+        """
+        rng = random.Random(0)
+        for n in range(1, 7):
+            colors = [(h, 0.5, 0.5) for h in rng.sample(range(360), n)]
+            frequencies = [rng.randint(1, 100) for _ in range(n)]
+            solver = ExactQAP(colors, frequencies)
+            best = min(solver.cost(p)
+                       for p in itertools.permutations(range(n)))
+            self.assertAlmostEqual(solver.cost(solver.exhaustive()), best)
+            self.assertAlmostEqual(solver.cost(solver.branch_and_bound()),
+                                   best)
+
+    def test_same_as_qap(self):
+        rng = random.Random(1)
+        colors = [(h, 0.5, 0.5) for h in rng.sample(range(360), 6)]
+        frequencies = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
+        self.assertEqual(ExactQAP(colors, frequencies)(),
+                         qap_module.QAP(colors, frequencies)())
+
+    def test_branch_and_bound(self):
+        """ Problems larger than the exhaustive size are searched """
+        rng = random.Random(2)
+        colors = [(h, 0.5, 0.5) for h in rng.sample(range(360), 9)]
+        frequencies = [rng.randint(1, 100) for _ in range(9)]
+        solver = ExactQAP(colors, frequencies)
+        with mock.patch.object(solver, "exhaustive") as exhaustive:
+            res = solver()
+        exhaustive.assert_not_called()
+        self.assertEqual(sorted(c for c, _ in res), sorted(colors))
+        self.assertEqual([f for _, f in res], frequencies)
+        with mock.patch.object(qap_module, "EXHAUSTIVE_SIZE", 9):
+            self.assertEqual(solver(), res)
+
+
+class TestHeuristicQAP(unittest.TestCase):
+    @staticmethod
+    def problem(n, seed):
+        rng = random.Random(seed)
+        colors = [(h, 0.5, 0.5) for h in rng.sample(range(360), n)]
+        frequencies = [rng.randint(1, 100) for _ in range(n)]
+        return colors, frequencies
+
+    def test_deltas(self):
+        colors, frequencies = TestHeuristicQAP.problem(8, 0)
+        solver = HeuristicQAP(colors, frequencies)
+        assignment = [3, 1, 4, 0, 7, 5, 2, 6]
+        rows, columns = solver.moves()
+        deltas = solver.deltas(np.array(assignment), rows, columns)
+        for r, s, delta in zip(rows, columns, deltas):
+            swapped = assignment[:]
+            swapped[r], swapped[s] = swapped[s], swapped[r]
+            self.assertAlmostEqual(solver.cost(swapped),
+                                   solver.cost(assignment) + delta)
+
+    def test_optimal(self):
+        """ Small problems are solved optimally """
+        for seed in range(5):
+            colors, frequencies = TestHeuristicQAP.problem(7, seed)
+            exact = ExactQAP(colors, frequencies)
+            solver = HeuristicQAP(colors, frequencies)
+            self.assertAlmostEqual(solver.cost(solver.search()),
+                                   exact.cost(exact.exhaustive()))
+
+    def test_groups(self):
+        """
+        Only the colors of the same group are swapped, and the result is
+        deterministic
+        """
+        colors, frequencies = TestHeuristicQAP.problem(12, 1)
+        groups = [i % 3 for i in range(12)]
+        solver = HeuristicQAP(colors, frequencies, groups=groups)
+        res = solver()
+        self.assertEqual(res, HeuristicQAP(colors, frequencies,
+                                           groups=groups)())
+        self.assertEqual([f for _, f in res], frequencies)
+        for i, (color, _) in enumerate(res):
+            self.assertEqual(groups[colors.index(color)], groups[i])
+
+        identity = list(range(12))
+        assignment = [colors.index(c) for c, _ in res]
+        self.assertLess(solver.cost(assignment), solver.cost(identity))
+
+    def test_duplicates(self):
+        """ Equal colors are never swapped """
+        colors = [(10, 0.5, 0.5)] * 3
+        solver = HeuristicQAP(colors, [1, 2, 3])
+        self.assertEqual(len(solver.moves()[0]), 0)
+        self.assertEqual(solver(), [(colors[0], 1), (colors[0], 2),
+                                    (colors[0], 3)])
+
+    def test_time_budget(self):
+        colors, frequencies = TestHeuristicQAP.problem(60, 2)
+        with mock.patch.object(HeuristicQAP, "iterations", 10 ** 6), \
+                mock.patch.object(HeuristicQAP, "time_budget", 0.1):
+            start = time.monotonic()
+            HeuristicQAP(colors, frequencies)()
+        self.assertLess(time.monotonic() - start, 1)
@@ -1,6 +1,11 @@
+import io
 import unittest
+from unittest import mock
+import numpy as np
+from hapycolor import config
 from hapycolor import exceptions
 from hapycolor import raw_colors
+from tests.helpers import configurationtesting
 
 
 class TestRawColors(unittest.TestCase):
@@ -12,11 +17,6 @@ class TestRawColors(unittest.TestCase):
             print(str(e))
             self.fail(str(e))
 
-    def test_no_failures_greyscale(self):
-        with self.assertRaises(exceptions.BlackAndWhitePictureException):
-            raw = "b'0,0: (1194.25)  #050505  gray(5)\n'"
-            raw_colors.extract_rgb(raw)
-
     def test_no_failures_alpha(self):
         try:
             image = "./images/alpha.png"
@@ -31,3 +31,92 @@ class TestRawColors(unittest.TestCase):
         proc = raw_colors.trolling("--version")
         regex = "(Google Chrome)|(Firefox)|(Chromium)"
         self.assertRegex(proc.stdout.decode(), regex)
+
+    @configurationtesting()
+    def test_native_engine(self):
+        palette = raw_colors.get("./images/firewatch.jpg", 15)
+        self.assertLessEqual(len(palette.colors), 15)
+        self.assertTrue(palette.is_initialized())
+        self.assertIn(palette.foreground, palette.colors)
+        self.assertIn(palette.background, palette.colors)
+
+    @configurationtesting()
+    def test_native_greyscale(self):
+        with mock.patch("hapycolor.raw_colors.trolling"):
+            with self.assertRaises(exceptions.InvalidImageException):
+                raw_colors.get("./images/greyscale.png", 15)
+
+    def test_median_cut(self):
+        pixels = np.array([(250, 0, 0)] * 10 + [(254, 4, 4)] * 10
+                          + [(0, 0, 250)] * 5 + [(0, 0, 254)] * 5,
+                          dtype=np.uint8)
+        self.assertEqual(raw_colors.median_cut(pixels, 2).tolist(),
+                         [[0, 0, 252], [252, 2, 2]])
+        self.assertEqual(len(raw_colors.median_cut(pixels, 150)), 4)
+        colors, counts = raw_colors.median_cut(pixels, 2, return_counts=True)
+        self.assertEqual(counts.tolist(), [10, 20])
+
+    @configurationtesting()
+    def test_engine_selection(self):
+        self.assertEqual(raw_colors.get_engine(), raw_colors.Engine.NATIVE)
+        config.ConfigurationManager.save("extraction",
+                                         {"engine": "imagemagick"})
+        self.assertEqual(raw_colors.get_engine(),
+                         raw_colors.Engine.IMAGEMAGICK)
+        config.ConfigurationManager.save("extraction", {"engine": "gimp"})
+        with self.assertRaises(exceptions.InvalidConfigKeyError):
+            raw_colors.get_engine()
+
+    def test_parse_txt(self):
+        output = b"# ImageMagick pixel enumeration: 5,1,255,srgb\n" \
+                 b"0,0: (5,6,7)  #050607  srgb(5,6,7)\n" \
+                 b"1,0: (8,9,10,1)  #08090A01  srgba(8,9,10,0.5)\n" \
+                 b"2,0: (5)  #050505  gray(5)\n" \
+                 b"3,0: (255,0,0)  #FF0000  srgb(255,0,0)\n" \
+                 b"4,0: (255,255,255)  #FFFFFF  white\n"
+        expected = [[5, 6, 7], [8, 9, 10], [255, 0, 0], [255, 255, 255]]
+        colors, gray_count = raw_colors.parse_txt(io.BytesIO(output),
+                                                  chunk_size=16)
+        self.assertEqual(colors.dtype, np.uint8)
+        self.assertEqual(colors.tolist(), expected)
+        self.assertEqual(gray_count, 1)
+
+        # Entries split between chunks, and a last line without newline
+        for chunk_size in [1, 7, 50, len(output)]:
+            colors, gray_count = raw_colors.parse_txt(
+                io.BytesIO(output.rstrip()), chunk_size=chunk_size)
+            self.assertEqual(colors.tolist(), expected)
+            self.assertEqual(gray_count, 1)
+
+    def test_imagemagick_greyscale(self):
+        output = b"# ImageMagick pixel enumeration: 2,1,255,gray\n" \
+                 b"0,0: (5)  #050505  gray(5)\n" \
+                 b"1,0: (9)  #090909  gray(9)\n"
+        process = mock.Mock(stdout=io.BytesIO(output))
+        with mock.patch("subprocess.Popen", return_value=process):
+            with self.assertRaisesRegex(
+                    exceptions.BlackAndWhitePictureException, "2 of 2"):
+                raw_colors.extract_imagemagick("image.png", 15)
+
+    def test_downsampled_size(self):
+        self.assertEqual(raw_colors.downsampled_size((100, 50), 0), (100, 50))
+        self.assertEqual(raw_colors.downsampled_size((100, 50), 10000),
+                         (100, 50))
+        self.assertEqual(raw_colors.downsampled_size((400, 200), 20000),
+                         (200, 100))
+
+    @configurationtesting()
+    def test_downsampling_metadata(self):
+        palette = raw_colors.get("./images/taipei.jpg", 15)
+        self.assertAlmostEqual(palette.metadata["scale"], 0.2194, 3)
+
+        config.ConfigurationManager.save("extraction", {"max_pixels": 0})
+        max_pixels = raw_colors.get_max_pixels()
+        colors, scale = raw_colors.extract_native("./images/firewatch.jpg",
+                                                  15, max_pixels)
+        self.assertEqual(scale, 1)
+        self.assertLessEqual(len(colors), 15)
+
+        config.ConfigurationManager.save("extraction", {"max_pixels": -1})
+        with self.assertRaises(exceptions.InvalidConfigKeyError):
+            raw_colors.get_max_pixels()
@@ -1,10 +1,19 @@
+import itertools
 import unittest
 from  unittest import mock
+from hapycolor.filters import reducer
 from hapycolor.filters.reducer import Reducer
 import subprocess as sp
 import networkx as nx
 from networkx import convert_node_labels_to_integers as cnlti
+from hapycolor import config
+from hapycolor import exceptions
 from hapycolor import palette as pltte
+from colormath.color_conversions import convert_color
+from colormath.color_diff_matrix import delta_e_cie2000
+from colormath.color_objects import LabColor, sRGBColor
+import numpy as np
+from tests.helpers import configurationtesting
 
 
 class TestReducer(unittest.TestCase):
@@ -79,6 +88,49 @@ class TestReducer(unittest.TestCase):
         graph = Reducer.generate_graph(colors)
         self.assertDictEqual(dict(graph.adj), expected)
 
+    def test_distance_matrix(self):
+        """
+        The matrix must match colormath's distances, for each couple (i, j)
+        where i < j
+        """
+        colors = [(0, 0, 0), (255, 255, 255), (0, 0, 1), (12, 200, 99),
+                  (250, 12, 255), (30, 30, 31), (31, 30, 30), (128, 0, 64)]
+        labs = [convert_color(sRGBColor(*c), LabColor) for c in colors]
+        labs = np.array([(c.lab_l, c.lab_a, c.lab_b) for c in labs])
+        np.testing.assert_allclose(reducer.rgb_to_lab(colors), labs)
+
+        with mock.patch("hapycolor.filters.reducer.CHUNK_SIZE", 10):
+            matrix = Reducer.distance_matrix(colors)
+        self.assertEqual(matrix.shape, (len(colors), len(colors)))
+        for i in range(len(colors)):
+            expected = delta_e_cie2000(labs[i], labs[i + 1:])
+            np.testing.assert_allclose(matrix[i, i + 1:], expected)
+            np.testing.assert_allclose(matrix[i + 1:, i], expected)
+        self.assertEqual(Reducer.distance_matrix([]).shape, (0, 0))
+
+    def test_sweep_pairs(self):
+        """
+        The sweep over the lightness must find the same couples as the
+        distance matrix
+        """
+        colors = np.random.RandomState(0).randint(0, 256, (300, 3))
+        colors = np.vstack([colors, colors[:5], [[0, 0, 0], [0, 0, 1]]])
+        for threshold in [0, 5, 20, 150]:
+            with mock.patch("hapycolor.filters.reducer.Reducer.threshold",
+                            threshold):
+                expected = Reducer.close_pairs(colors)
+                with mock.patch("hapycolor.filters.reducer.Reducer"
+                                + ".neighbours", reducer.Neighbours.SWEEP), \
+                        mock.patch("hapycolor.filters.reducer.CHUNK_SIZE",
+                                   1000):
+                    result = Reducer.close_pairs(colors)
+            self.assertSetEqual(set(zip(*result)), set(zip(*expected)))
+            self.assertTrue((result[0] < result[1]).all())
+
+        with mock.patch("hapycolor.filters.reducer.Reducer.neighbours",
+                        reducer.Neighbours.SWEEP):
+            self.assertEqual(len(Reducer.close_pairs([])[0]), 0)
+
     def test_get_maximum_clique_0_colors(self):
         graph = nx.Graph()
         result = Reducer.get_maximum_clique(graph)
@@ -132,6 +184,19 @@ class TestReducer(unittest.TestCase):
         self.assertIn(result[3], [16, 17, 18])
         self.assertIn(result[4], [21, 22, 23])
 
+    def test_reduce_deadline(self):
+        """ The components of a palette must share a single deadline """
+        values = [1, 2, 3, 6, 7, 8, 11, 12, 13]
+        solve = reducer.independent_set.solve
+        with mock.patch("hapycolor.filters.reducer.Reducer.threshold", 3), \
+                mock.patch("hapycolor.filters.reducer.Reducer.distance",
+                           TestReducer.mock_distance), \
+                mock.patch("hapycolor.filters.independent_set.solve",
+                           wraps=solve) as solve:
+            Reducer.reduce(values)
+        self.assertEqual(solve.call_count, 3)
+        self.assertEqual(len({c[0][1] for c in solve.call_args_list}), 1)
+
     def test_find_subgraphs(self):
         """
         Asserts that the function
@@ -159,6 +224,89 @@ class TestReducer(unittest.TestCase):
         for graph, exp in zip(graphs, expected):
             self.assertEqual(graph.nodes, exp.nodes)
 
+    def test_find_subgraphs_reuses_edges(self):
+        """
+        The subgraphs keep the edges of the provided graph, without
+        computing any distance
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from([9, 0, 5, 3, 7])
+        graph.add_edges_from([(i, i + 1) for i in range(10, 3000)])
+        graph.add_edges_from([(0, 3), (3, 7), (0, 7)])
+
+        with mock.patch("hapycolor.filters.reducer.Reducer.distance") \
+                as distance, \
+                mock.patch("hapycolor.filters.reducer.Reducer.generate_graph") \
+                as generate_graph:
+            graphs = Reducer.find_subgraphs(graph)
+            distance.assert_not_called()
+            generate_graph.assert_not_called()
+
+        self.assertEqual([list(g.nodes) for g in graphs[:3]],
+                         [[9], [0, 3, 7], [5]])
+        self.assertEqual(set(graphs[1].edges), {(0, 3), (3, 7), (0, 7)})
+        self.assertEqual(len(graphs), 4)
+        self.assertEqual(len(graphs[3]), 2991)
+        self.assertEqual(len(graph), 2996)
+
+    def test_reduce_to_size(self):
+        colors = [tuple(int(e) for e in c) for c in
+                  np.random.RandomState(0).randint(0, 256, (60, 3))]
+        matrix = Reducer.distance_matrix(colors)
+        for target_size in [1, 6, 7, 20, 60]:
+            with mock.patch("hapycolor.filters.reducer.Reducer.distance_matrix",
+                            return_value=matrix) as distance_matrix:
+                result, threshold = Reducer.reduce_to_size(colors,
+                                                           target_size)
+                distance_matrix.assert_called_once_with(colors)
+            self.assertGreaterEqual(len(result), target_size)
+
+            # The threshold is the largest one keeping enough colors
+            with mock.patch("hapycolor.filters.reducer.Reducer.threshold",
+                            threshold):
+                self.assertEqual(Reducer.reduce(colors), result)
+            larger = matrix[matrix > threshold]
+            if len(larger):
+                with mock.patch("hapycolor.filters.reducer.Reducer"
+                                + ".threshold", larger.min() + 1e-9):
+                    self.assertLess(len(Reducer.reduce(colors)), target_size)
+
+        result, threshold = Reducer.reduce_to_size(colors[:3], 5)
+        self.assertEqual((result, threshold), (colors[:3], 0))
+
+    def test_apply_target_size(self):
+        palette = pltte.Palette()
+        palette.colors = [(1, 2, 3), (1, 2, 4), (200, 10, 10), (10, 200, 10)]
+        with mock.patch("hapycolor.filters.reducer.Reducer.target_size", 3):
+            result = Reducer.apply(palette)
+        self.assertEqual(len(result.colors), 3)
+        self.assertIn("threshold", result.metadata)
+
+    @configurationtesting()
+    def test_get_target_size(self):
+        self.assertIsNone(reducer.get_target_size())
+        configuration = config.ConfigurationManager.load("reducer")
+        configuration["target_size"] = "12"
+        config.ConfigurationManager.save("reducer", configuration)
+        self.assertEqual(reducer.get_target_size(), 12)
+        with mock.patch("hapycolor.filters.reducer.Reducer.target_size", 3):
+            self.assertEqual(reducer.get_target_size(), 3)
+        for value in ["0", "-1", "many"]:
+            configuration["target_size"] = value
+            config.ConfigurationManager.save("reducer", configuration)
+            with self.assertRaises(exceptions.InvalidConfigKeyError):
+                reducer.get_target_size()
+
+    def test_reduce_to_size_integers(self):
+        values = [1, 2, 3, 6, 7, 8, 11, 12, 13, 16, 17, 18, 21, 22, 23]
+        with mock.patch("hapycolor.filters.reducer.Reducer.distance",
+                        TestReducer.mock_distance):
+            result, threshold = Reducer.reduce_to_size(values, 5)
+        self.assertEqual(threshold, 5)
+        self.assertEqual(len(result), 5)
+        for v_1, v_2 in itertools.combinations(result, 2):
+            self.assertGreaterEqual(abs(v_1 - v_2), 5)
+
     @staticmethod
     def mock_distance(value_1, value_2):
         return abs(value_1 - value_2)
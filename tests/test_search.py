@@ -0,0 +1,147 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from hapycolor import config
+from hapycolor import exceptions
+from hapycolor import palette as pltte
+from hapycolor import search
+from hapycolor import store
+from hapycolor.color import tables
+from tests.helpers import configurationtesting, disableprints
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        random = np.random.RandomState(0)
+        self.palettes = []
+        for i in range(20):
+            palette = pltte.Palette(random.randint(0, 256, (10 + i, 3)))
+            palette.foreground = (255, 255, 255)
+            palette.background = (0, 0, 0)
+            palette.weights = random.rand(10 + i)
+            self.palettes.append(palette)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_embed(self):
+        """
+        The embedding must not depend on the order of the colors, and its
+        distance must be the Earth Mover's Distance along the lightness
+        """
+        embedding = search.embed(self.palettes[0])
+        self.assertEqual(embedding.shape,
+                         (len(search.DIRECTIONS) * search.QUANTILES,))
+        shuffled = pltte.Palette(self.palettes[0].array[::-1])
+        shuffled.weights = self.palettes[0].weights[::-1]
+        np.testing.assert_array_equal(search.embed(shuffled), embedding)
+        self.assertEqual(search.distance(embedding, embedding), 0)
+
+        # Two grays, moved by 10 along the lightness axis only
+        gray = pltte.Palette([(119, 119, 119), (119, 119, 119)])
+        lighter = pltte.Palette([(119, 119, 119), (145, 145, 145)])
+        embeddings = [search.embed(gray), search.embed(lighter)]
+        lightness = embeddings[1][:search.QUANTILES] \
+            - embeddings[0][:search.QUANTILES]
+        self.assertAlmostEqual(lightness.mean(), 5, delta=0.1)
+
+    def test_weights(self):
+        """ A palette must be closer to the palette of its main color """
+        palette = pltte.Palette([(200, 30, 30), (30, 30, 200)])
+        palette.weights = [0.9, 0.1]
+        reds = search.embed(pltte.Palette([(200, 30, 30)]))
+        blues = search.embed(pltte.Palette([(30, 30, 200)]))
+        embedding = search.embed(palette)
+        self.assertLess(search.distance(embedding, reds),
+                        search.distance(embedding, blues))
+
+    def test_index(self):
+        """
+        A query must return the nearest palettes, sorted by distance, from
+        the memory mapped index
+        """
+        path = os.path.join(self.directory, "palettes.hpi")
+        labels = [str(i) for i in range(len(self.palettes))]
+        search.PaletteIndex.build(path, zip(labels, self.palettes))
+
+        index = search.PaletteIndex(path).load()
+        self.assertIsInstance(index.embeddings, np.memmap)
+        self.assertEqual(len(index), len(self.palettes))
+        results = index.query(self.palettes[3], 4)
+        self.assertEqual(results[0], ("3", 0))
+
+        expected = sorted((search.distance(search.embed(p),
+                                           search.embed(self.palettes[3])), l)
+                          for l, p in zip(labels, self.palettes))[:4]
+        self.assertEqual([r[0] for r in results], [e[1] for e in expected])
+        for (_, actual), (distance, _) in zip(results, expected):
+            self.assertAlmostEqual(actual, distance, places=4)
+        self.assertEqual(len(index.query(self.palettes[3], 100)), 20)
+
+    @configurationtesting()
+    def test_build_configuration(self):
+        """
+        Building an index must read the enabled lookup tables once, not once
+        per palette
+        """
+        path = os.path.join(self.directory, "palettes.hpi")
+        labels = [str(i) for i in range(len(self.palettes))]
+        tables.enabled.cache_clear()
+        try:
+            with mock.patch("hapycolor.config.ConfigurationManager.load",
+                            wraps=config.ConfigurationManager.load) as load:
+                search.PaletteIndex.build(path, zip(labels, self.palettes))
+            self.assertLessEqual(load.call_count, 1)
+        finally:
+            tables.enabled.cache_clear()
+
+    def test_invalid_index(self):
+        path = os.path.join(self.directory, "palettes.hpi")
+        with open(path, "wb") as f:
+            f.write(b"HPSI")
+        with self.assertRaises(exceptions.InvalidFileError):
+            search.PaletteIndex(path).load()
+
+    @disableprints()
+    def test_palettes_from(self):
+        """
+        The palettes of a json directory and the last palettes of a store
+        must be indexed
+        """
+        for i, palette in enumerate(self.palettes[:3]):
+            palette.to_json(os.path.join(self.directory, "{}.json".format(i)))
+        labels = [l for l, _ in search.palettes_from(self.directory)]
+        self.assertEqual(labels, [os.path.join(self.directory, "0.json"),
+                                  os.path.join(self.directory, "1.json"),
+                                  os.path.join(self.directory, "2.json")])
+
+        path = os.path.join(self.directory, "palettes.hps")
+        image_hash = hashlib.sha256(b"a").hexdigest()
+        with store.PaletteStore(path) as palette_store:
+            palette_store.put(self.palettes[0], image_hash, "/a.jpg")
+            palette_store.put(self.palettes[1], image_hash, "/a.jpg")
+        palettes = list(search.palettes_from(path))
+        self.assertEqual(len(palettes), 1)
+        self.assertEqual(palettes[0][0], "/a.jpg")
+        self.assertEqual(palettes[0][1].colors, self.palettes[1].colors)
+
+    def test_palette_from_file(self):
+        path = os.path.join(self.directory, "scheme.vim")
+        with open(path, "w") as f:
+            f.write("hi Normal guifg=#EBDBB2 guibg=#1d2021\n"
+                    "hi Comment guifg=#928374 ctermfg=245\n"
+                    "hi Visual guibg=#1d2021\n")
+        palette = search.palette_from_file(path)
+        self.assertEqual(palette.colors, [(29, 32, 33), (146, 131, 116),
+                                          (235, 219, 178)])
+        with open(path, "w") as f:
+            f.write("colorscheme default\n")
+        with self.assertRaises(exceptions.PaletteFormatError):
+            search.palette_from_file(path)
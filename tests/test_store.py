@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from hapycolor import exceptions
+from hapycolor import palette as pltte
+from hapycolor import store
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "palettes.hps")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_palette(self, seed, weights=True):
+        random = np.random.RandomState(seed)
+        palette = pltte.Palette(random.randint(0, 256, (5 + seed, 3)))
+        palette.foreground = (255, 255, 255)
+        palette.background = (seed, 0, 0)
+        if weights:
+            palette.weights = random.rand(5 + seed)
+        palette.metadata = {"scale": 0.5}
+        return palette
+
+    def image_hash(self, name):
+        return hashlib.sha256(name.encode()).hexdigest()
+
+    def assert_palette_equal(self, actual, expected):
+        self.assertEqual(actual.foreground, expected.foreground)
+        self.assertEqual(actual.background, expected.background)
+        self.assertEqual(actual.colors, expected.colors)
+        self.assertEqual(actual.metadata, expected.metadata)
+        if expected.weights is None:
+            self.assertIsNone(actual.weights)
+        else:
+            np.testing.assert_allclose(actual.weights, expected.weights,
+                                       rtol=1e-6)
+
+    def test_pack(self):
+        """ A record must be decoded as the palette it encodes """
+        for weights in [True, False]:
+            palette = self.make_palette(3, weights)
+            record = store.pack(palette, self.image_hash("a"), "/a.jpg",
+                                {"num_colors": 15})
+            self.assertEqual(store.record_size(record), len(record))
+            entry = store.unpack(b"\0" + record, 1)
+            self.assertEqual(entry.image_hash, self.image_hash("a"))
+            self.assertEqual(entry.source, "/a.jpg")
+            self.assertEqual(entry.settings, {"num_colors": 15})
+            self.assert_palette_equal(entry.palette, palette)
+
+    def test_invalid(self):
+        with self.assertRaises(exceptions.PaletteFormatError):
+            store.pack(pltte.Palette(), self.image_hash("a"))
+        with self.assertRaises(exceptions.PaletteFormatError):
+            store.pack(self.make_palette(0), "abc")
+        record = store.pack(self.make_palette(0), self.image_hash("a"))
+        self.assertEqual(store.record_size(record[:-1]), 0)
+        with self.assertRaises(exceptions.PaletteFormatError):
+            store.unpack(record[:-1])
+
+    def test_store(self):
+        """
+        The palettes must be found by hash after reopening the store, and the
+        last palette of an image must win
+        """
+        palettes = [self.make_palette(i) for i in range(3)]
+        with store.PaletteStore(self.path) as palette_store:
+            palette_store.put(palettes[0], self.image_hash("a"), "/a.jpg")
+            palette_store.put(palettes[1], self.image_hash("b"), "/b.jpg")
+            palette_store.put(palettes[2], self.image_hash("a"), "/a.jpg")
+
+        with store.PaletteStore(self.path) as palette_store:
+            self.assertEqual(len(palette_store), 2)
+            self.assertEqual(sorted(palette_store.keys()),
+                             sorted([self.image_hash("a"),
+                                     self.image_hash("b")]))
+            self.assertIn(self.image_hash("b"), palette_store)
+            self.assert_palette_equal(
+                palette_store.get(self.image_hash("a")).palette, palettes[2])
+            self.assert_palette_equal(
+                palette_store.get(self.image_hash("b")).palette, palettes[1])
+            self.assertEqual([e.source for e in palette_store],
+                             ["/a.jpg", "/b.jpg", "/a.jpg"])
+            with self.assertRaises(exceptions.PaletteFormatError):
+                palette_store.get(self.image_hash("c"))
+
+    def test_get_by_path(self):
+        image = os.path.join(self.directory, "image.png")
+        with open(image, "wb") as f:
+            f.write(b"image")
+        palette = self.make_palette(1)
+        with store.PaletteStore(self.path) as palette_store:
+            palette_store.put(palette, hashlib.sha256(b"image").hexdigest())
+            self.assert_palette_equal(palette_store.get(image).palette,
+                                      palette)
+
+    def test_recovery(self):
+        """
+        The records missing from the index must be indexed again, and an
+        incomplete record must be overwritten
+        """
+        palettes = [self.make_palette(i) for i in range(3)]
+        with store.PaletteStore(self.path) as palette_store:
+            palette_store.put(palettes[0], self.image_hash("a"))
+        with open(self.path, "ab") as f:
+            f.write(store.pack(palettes[1], self.image_hash("b")))
+            f.write(store.pack(palettes[2], self.image_hash("c"))[:-3])
+
+        with store.PaletteStore(self.path) as palette_store:
+            self.assertEqual(len(palette_store), 2)
+            self.assert_palette_equal(
+                palette_store.get(self.image_hash("b")).palette, palettes[1])
+            palette_store.put(palettes[2], self.image_hash("c"))
+
+        os.remove(self.path + ".index")
+        with store.PaletteStore(self.path) as palette_store:
+            self.assertEqual(len(list(palette_store)), 3)
+            self.assert_palette_equal(
+                palette_store.get(self.image_hash("c")).palette, palettes[2])
+
+    def test_not_a_store(self):
+        with open(self.path, "wb") as f:
+            f.write(b"{}")
+        with self.assertRaises(exceptions.PaletteFormatError):
+            store.PaletteStore(self.path).get(self.image_hash("a"))
+
+    def test_is_store(self):
+        self.assertFalse(store.is_store(self.path))
+        with store.PaletteStore(self.path) as palette_store:
+            palette_store.open()
+        self.assertTrue(store.is_store(self.path))
+        json_path = os.path.join(self.directory, "palette.json")
+        with open(json_path, "w") as f:
+            f.write("{}")
+        self.assertFalse(store.is_store(json_path))
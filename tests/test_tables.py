@@ -0,0 +1,107 @@
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from hapycolor import color
+from hapycolor import config
+from hapycolor import exceptions
+from hapycolor.color import tables
+from tests.helpers import configurationtesting, disableprints
+
+
+class TestTables(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = mock.patch("hapycolor.config.get_cache_dir",
+                                    lambda: pathlib.Path(self.directory))
+        self.colors = np.random.RandomState(0).randint(0, 256, (300, 3))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        for table in tables.TABLES.values():
+            table.values = None
+        tables.enabled.cache_clear()
+
+    def enable(self, value):
+        configuration = config.ConfigurationManager.load("cache")
+        configuration["lookup_tables"] = value
+        config.ConfigurationManager.save("cache", configuration)
+        tables.enabled.cache_clear()
+
+    def test_cube(self):
+        self.assertEqual(tables.cube(1).tolist(),
+                         [[64, 64, 64], [64, 64, 192], [64, 192, 64],
+                          [64, 192, 192], [192, 64, 64], [192, 64, 192],
+                          [192, 192, 64], [192, 192, 192]])
+        self.assertEqual(tables.cube(8, 5, 7).tolist(),
+                         [[0, 0, 5], [0, 0, 6]])
+
+    def test_table(self):
+        """
+        The table must be generated once, then hold the conversion of the
+        colors of the cube
+        """
+        table = tables.Table("test", color.rgb_to_lab, np.float32, 3, bits=4)
+        with self.cache_dir, disableprints(), \
+                mock.patch.object(tables, "CHUNK_SIZE", 1000):
+            values = table(self.colors)
+            path = table.path()
+            mtime = path.stat().st_mtime_ns
+            table.values = None
+            np.testing.assert_array_equal(table(self.colors), values)
+        self.assertEqual(path.stat().st_mtime_ns, mtime)
+        self.assertEqual(path.stat().st_size,
+                         tables.HEADER.size + 4 * 3 * 4096)
+        self.assertFalse(table.values.flags.writeable)
+
+        centers = (self.colors >> 4 << 4) + 8
+        np.testing.assert_allclose(values, color.rgb_to_lab(centers),
+                                   rtol=1e-6, atol=1e-4)
+
+    def test_version(self):
+        """ A table generated by another version must be regenerated """
+        with self.cache_dir, disableprints():
+            table = tables.Table("test", lambda c: c[:, 0], np.uint8, 1,
+                                 bits=2)
+            np.testing.assert_array_equal(table([[255, 0, 0]]), [224])
+            table = tables.Table("test", lambda c: c[:, 1], np.uint8, 1,
+                                 version=2, bits=2)
+            np.testing.assert_array_equal(table([[255, 0, 0]]), [32])
+
+    @configurationtesting()
+    def test_get_enabled(self):
+        self.assertEqual(tables.get_enabled(), set())
+        self.enable("hsl, lab")
+        self.assertEqual(tables.get_enabled(), {"hsl", "lab"})
+        self.enable("hsl, rgb")
+        with self.assertRaises(exceptions.InvalidConfigKeyError):
+            tables.get_enabled()
+
+    @configurationtesting()
+    def test_lookup(self):
+        """
+        The enabled tables must be used, and must match the conversions
+        """
+        colors = np.concatenate([self.colors, [[0, 0, 0], [255, 255, 255],
+                                               [10, 10, 10], [255, 0, 1]]])
+        with self.cache_dir, disableprints():
+            expected = tables.rgb_to_hsl(colors)
+            self.assertFalse(any(pathlib.Path(self.directory).iterdir()))
+
+            self.enable("hsl")
+            np.testing.assert_array_equal(tables.rgb_to_hsl(colors),
+                                          expected)
+            self.assertTrue(tables.TABLES["hsl"].path().exists())
+
+    @configurationtesting()
+    def test_enabled_once(self):
+        """ The configuration file is only read by the first lookup """
+        with mock.patch("hapycolor.config.ConfigurationManager.load",
+                        wraps=config.ConfigurationManager.load) as load:
+            for _ in range(3):
+                tables.rgb_to_lab(self.colors)
+        self.assertEqual(load.call_count, 1)
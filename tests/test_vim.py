@@ -167,6 +167,39 @@ class TestVim(unittest.TestCase):
         self.assertNotEqual(result, not_expected)
 
 
+    def test_color_manager_minor_groups(self):
+        """
+        The minor groups are given colors of their group's cluster, and their
+        distribution improves the cyclic one
+        """
+        colors = generate_palette(40).colors
+        color_manager = ColorManager(colors)
+        frequencies = ColorManager.load_minor_frequencies()
+        self.assertIn("String", frequencies)
+
+        minor_groups, assigned, cyclic, labels = [], [], [], []
+        for group in Vim.groups:
+            cluster = color_manager.groups_colors[group]
+            casted_colors = color_manager.cast(group)
+            self.assertEqual(len(casted_colors), len(Vim.groups[group]))
+            for i, color in enumerate(casted_colors):
+                self.assertIn(color, cluster)
+                assigned.append(color)
+                cyclic.append(cluster[i % len(cluster)])
+                labels.append(group)
+            minor_groups.extend(Vim.groups[group])
+            self.assertEqual(sorted(casted_colors),
+                             sorted(cyclic[-len(casted_colors):]))
+
+        def cost(colors):
+            lab_colors = [helpers.rgb_to_lab(c) for c in colors]
+            distances = ColorManager.distances(lab_colors, lab_colors)
+            return sum(distances[i, j] / (frequencies.get(g_i, 1)
+                                          * frequencies.get(g_j, 1))
+                       for i, g_i in enumerate(minor_groups)
+                       for j, g_j in enumerate(minor_groups) if i != j)
+        self.assertLessEqual(cost(assigned), cost(cyclic) + 1e-9)
+
     @unittest.skip("TODO(yann): Still not supported")
     def test_color_manager_duplicate_frequency(self, mock_frequencies):
         colors = [(150, 10, 10), (160, 10, 10), (10, 10, 200)]